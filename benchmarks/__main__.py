@@ -0,0 +1,72 @@
+from argparse import ArgumentParser
+import json
+import os
+import platform
+import sys
+from benchmarks.corpus import CORPUS, counted_loop, hello
+from benchmarks.harness import benchmark, compare, measure_scaling, measure_startup
+from numscript.vm import Engine
+
+
+def main() -> None:
+    arg_parser = ArgumentParser(prog='benchmarks', description='Benchmark the NumScript parser and interpreter')
+    arg_parser.add_argument('--program', action='append', choices=list(CORPUS), help='Program of the corpus to run, can be repeated, all by default')
+    arg_parser.add_argument('--engine', choices=[engine.value for engine in Engine], default=Engine.DECODED.value, help='Execution engine')
+    arg_parser.add_argument('--scale', type=float, default=1.0, help='Multiply the size of every program')
+    arg_parser.add_argument('--repeat', type=int, default=3, help='Number of timed runs, the best one is reported')
+    arg_parser.add_argument('--no-startup', action='store_true', help='Skip the interpreter process startup measurements')
+    arg_parser.add_argument('--scaling', type=int, nargs='+', metavar='WORKERS', help='Also measure the runs per second of concurrent runs in pools of these many threads and processes')
+    arg_parser.add_argument('--output', help='Save the results as JSON to this file')
+    arg_parser.add_argument('--baseline', help='Compare the results against the JSON results saved in this file')
+    arg_parser.add_argument('--threshold', type=float, default=0.1, help='Relative slowdown reported as a regression')
+    args = arg_parser.parse_args()
+
+    results = {}
+    for name in args.program or CORPUS:
+        program = CORPUS[name](args.scale)
+        print(f'{name}: {program.description}', file=sys.stderr)
+        results[name] = benchmark(program, args.repeat, Engine(args.engine))
+
+    if not args.no_startup:
+        print('startup: Python startup, parsing and running a trivial program', file=sys.stderr)
+        results['startup'] = {
+            'process_time': measure_startup(hello(), args.repeat, cached=False),
+            'cached_process_time': measure_startup(hello(), args.repeat, cached=True),
+        }
+
+    scaling = None
+    if args.scaling:
+        print('scaling: concurrent runs of a small counted loop in threads and processes', file=sys.stderr)
+        scaling = measure_scaling(counted_loop(int(10_000 * args.scale)), Engine(args.engine), args.scaling, max(args.scaling) * 8)
+
+    report = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        # Threads only run in parallel without the GIL
+        'gil_enabled': getattr(sys, '_is_gil_enabled', lambda: True)(),
+        'cpu_count': os.cpu_count(),
+        'engine': args.engine,
+        'scale': args.scale,
+        'results': results,
+    }
+    if scaling is not None:
+        report['scaling'] = scaling
+    json.dump(report, sys.stdout, indent=4)
+    print()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        for regression in regressions:
+            print(f'Regression {regression}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List
+
+
+# NumScript has no arithmetic, so loops count down by indexing a table that maps every value to its predecessor
+def countdown_table(size: int) -> str:
+    return '0 ' + ' '.join(map(str, range(size)))
+
+
+@dataclass
+class Program:
+    name: str
+    source: str
+    # Data fed to the INPUT operator
+    input: bytes = b''
+    description: str = ''
+
+
+def counted_loop(iterations: int) -> Program:
+    source = '\n'.join((
+        f'0 1 0 {countdown_table(iterations)}',
+        f'0 0 1 {iterations}',
+        '2 1',
+        '10 3 1 1 0',
+        '6',
+        '11 1 1 1',
+        '5 0 0',
+    ))
+    return Program('counted_loop', source, description='Tight loop counting down with an array lookup')
+
+
+def label_calls(iterations: int) -> Program:
+    source = '\n'.join((
+        f'0 1 0 {countdown_table(iterations)}',
+        f'0 0 1 {iterations}',
+        '0 0 2 0',
+        '3 3',
+        '2 2',
+        '1 2 2 1',
+        '4',
+        '2 3',
+        '3 2',
+        '3 2',
+        '3 2',
+        '10 3 1 1 0',
+        '11 1 1 3',
+        '5 0 0',
+    ))
+    return Program('label_calls', source, description='Loop calling a label subroutine three times per iteration')
+
+
+def array_indexing(iterations: int, array_size: int) -> Program:
+    source = '\n'.join((
+        f'0 1 0 {countdown_table(iterations)}',
+        f'0 0 1 {iterations}',
+        f'0 1 2 {" ".join(str(i * 7 % 1000) for i in range(array_size))}',
+        '0 0 3 0',
+        '2 1',
+        f'10 2 {array_size // 2} 3 2',
+        f'10 0 {array_size - 1} 3 {" ".join(map(str, range(array_size)))}',
+        '10 3 1 1 0',
+        '11 1 1 1',
+        '5 0 0',
+    ))
+    return Program('array_indexing', source, description=f'Loop indexing arrays of {array_size} elements')
+
+
+def print_heavy(iterations: int) -> Program:
+    source = '\n'.join((
+        f'0 1 0 {countdown_table(iterations)}',
+        f'0 0 1 {iterations}',
+        '0 1 2 104 101 108 108 111',
+        '2 1',
+        '8 2 1',
+        '9 2 2',
+        '9 1 119 111 114 108 100',
+        '8 0 42',
+        '10 3 1 1 0',
+        '11 1 1 1',
+        '5 0 0',
+    ))
+    return Program('print_heavy', source, description='Loop printing integers, arrays and strings')
+
+
+def input_heavy(iterations: int) -> Program:
+    source = '\n'.join((
+        f'0 1 0 {countdown_table(iterations)}',
+        f'0 0 1 {iterations}',
+        '0 0 2 0',
+        '0 0 3 0',
+        '2 1',
+        '12 0 2',
+        '12 1 3',
+        '12 3 3',
+        '10 3 1 1 0',
+        '11 1 1 1',
+        '5 0 0',
+    ))
+    data = b''.join(b'%d\n1 2 3 4 5 6 7 8\nhello world\n' % i for i in range(iterations))
+    return Program('input_heavy', source, data, description='Loop reading integers, arrays and strings')
+
+
+def bulk_arrays(iterations: int, array_size: int) -> Program:
+    source = '\n'.join((
+        f'0 1 0 {countdown_table(iterations)}',
+        f'0 0 1 {iterations}',
+        '0 0 2 0',
+        '0 0 3 0',
+        '0 0 4 0',
+        '0 0 5 0',
+        '12 1 2',
+        '12 1 3',
+        '2 1',
+        '13 3 4 2 3',
+        '13 5 4 4 2',
+        '13 7 4 4 3',
+        '13 6 5 4',
+        '13 8 5 2 5',
+        '10 3 1 1 0',
+        '11 1 1 1',
+        '8 2 5',
+        '5 0 0',
+    ))
+    data = b'%s\n%s\n' % (
+        ' '.join(str(i * 7 % 1000) for i in range(array_size)).encode(),
+        ' '.join(str(i * 13 % 1000) for i in range(array_size)).encode(),
+    )
+    return Program('bulk_arrays', source, data, description=f'Loop of element-wise operations on arrays of {array_size} elements')
+
+
+def generated(statements: int) -> Program:
+    # Straight-line code with the mix of statements emitted by code generators
+    lines: List[str] = [
+        '0 0 0 0',
+        '0 1 1 ' + ' '.join(map(str, range(64))),
+        '0 0 2 0',
+    ]
+    for i in range(statements):
+        match i % 8:
+            case 0:
+                lines.append(f'1 0 0 {i}')
+            case 1:
+                lines.append(f'1 1 1 {" ".join(str((i + j) % 1000) for j in range(32))}')
+            case 2:
+                lines.append(f'10 2 {i % 32} 2 1')
+            case 3:
+                lines.append('1 2 0 2')
+            case 4:
+                lines.append(f'2 {i}')
+            case 5:
+                lines.append(f'11 2 0 {i + 2}')
+            case 6:
+                lines.append('6')
+            case 7:
+                lines.append(f'2 {i}')
+    lines.append('5 0 0')
+    return Program('generated', '\n'.join(lines), description=f'Generated straight-line script of {statements} statements')
+
+
+def hello() -> Program:
+    return Program('hello', '9 1 104 105\n5 0 0', description='Trivial program measuring startup')
+
+
+# Programs of the corpus with their default size, scaled by the runner
+CORPUS: Dict[str, Callable[[float], Program]] = {
+    'counted_loop': lambda scale: counted_loop(int(200_000 * scale)),
+    'label_calls': lambda scale: label_calls(int(50_000 * scale)),
+    'array_indexing': lambda scale: array_indexing(int(50_000 * scale), 100_000),
+    'print_heavy': lambda scale: print_heavy(int(50_000 * scale)),
+    'input_heavy': lambda scale: input_heavy(int(30_000 * scale)),
+    'bulk_arrays': lambda scale: bulk_arrays(int(50 * scale), 100_000),
+    'generated': lambda scale: generated(int(200_000 * scale)),
+}
@@ -0,0 +1,166 @@
+from io import BytesIO
+from multiprocessing import Pool
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Sequence
+from numscript import parser
+from numscript.api import Program as CompiledProgram, run_in_threads
+from numscript.code import Instruction
+from numscript.decoder import decode
+from numscript.io import InputSource, OutputSink
+from numscript.labels import index_labels
+from numscript.vm import VM, Engine
+from benchmarks.corpus import Program
+
+
+# Metrics where a higher value is better, every other metric is better when lower
+HIGHER_IS_BETTER = {'statements_per_second'}
+
+
+def best_time(function: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_vm(program: Program, engine: Engine = Engine.DECODED) -> VM:
+    return VM(engine, output=OutputSink(BytesIO()), input_source=InputSource(None, data=bytearray(program.input)))
+
+
+def run_program(program: Program, engine: Engine) -> None:
+    make_vm(program, engine).run(parser.parse(program.source))
+
+
+def count_executed(program: Program) -> int:
+    """
+        Run the program with every instruction wrapped in a counter.
+    """
+    executed = 0
+
+    def counted(vm: VM, handler: Callable[..., None], operands: tuple) -> None:
+        nonlocal executed
+        executed += 1
+        handler(vm, *operands)
+
+    script = parser.parse(program.source)
+    script.labels = index_labels(script)
+    instructions: List[Instruction] = decode(script, script.labels)
+    script.instructions = [(counted, instruction) for instruction in instructions]
+    make_vm(program).run(script)
+    return executed
+
+
+def measure_run(program: Program, repeat: int, engine: Engine) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        # Parsing is measured separately
+        script = parser.parse(program.source)
+        vm = make_vm(program, engine)
+        start = time.perf_counter()
+        vm.run(script)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_peak_memory(program: Program, engine: Engine) -> int:
+    tracemalloc.start()
+    try:
+        run_program(program, engine)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def measure_startup(program: Program, repeat: int, cached: bool) -> float:
+    """
+        Time a whole interpreter process running the program, including Python startup.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        script_path = os.path.join(directory, f'{program.name}.ns')
+        with open(script_path, 'w') as f:
+            f.write(program.source)
+
+        command = [sys.executable, '-m', 'numscript', '--cache-dir', os.path.join(directory, 'cache'), script_path]
+        if not cached:
+            command.insert(3, '--no-cache')
+        else:
+            # Fill the cache
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+
+        return best_time(lambda: subprocess.run(command, input=program.input, stdout=subprocess.DEVNULL, check=True), repeat)
+
+
+# Program compiled once by every worker process of the scaling benchmark
+worker_program: CompiledProgram | None = None
+
+
+def compile_worker_program(source: str, engine: Engine) -> None:
+    global worker_program
+    worker_program = CompiledProgram.compile(source, engine)
+
+
+def run_worker_program(input_data: bytes) -> int | None:
+    status = worker_program.run(input_data).status
+    return None if status is None else int(status)
+
+
+def measure_scaling(program: Program, engine: Engine, worker_counts: Sequence[int], runs: int) -> Dict[str, Dict[str, float]]:
+    """
+        Measure the runs per second of the program in pools of threads and of processes of increasing size.
+    """
+    compiled = CompiledProgram.compile(program.source, engine)
+    inputs = [program.input] * runs
+    results: Dict[str, Dict[str, float]] = {}
+    for workers in worker_counts:
+        thread_time = best_time(lambda: run_in_threads(compiled, inputs, workers), 1)
+        with Pool(workers, compile_worker_program, (program.source, engine)) as pool:
+            # Start every worker before timing
+            pool.map(run_worker_program, [b''] * workers)
+            process_time = best_time(lambda: pool.map(run_worker_program, inputs, 1), 1)
+        results[str(workers)] = {
+            'thread_runs_per_second': runs / thread_time,
+            'process_runs_per_second': runs / process_time,
+        }
+    return results
+
+
+def benchmark(program: Program, repeat: int, engine: Engine = Engine.DECODED) -> Dict[str, float]:
+    parse_time = best_time(lambda: parser.parse(program.source), repeat)
+    run_time = measure_run(program, repeat, engine)
+    executed = count_executed(program)
+    return {
+        'source_bytes': len(program.source),
+        'parse_time': parse_time,
+        'run_time': run_time,
+        'executed_statements': executed,
+        'statements_per_second': executed / run_time if run_time else 0.0,
+        'peak_memory': measure_peak_memory(program, engine),
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """
+        Return a description of every timing and memory metric that is worse than the baseline by more than threshold.
+    """
+    regressions: List[str] = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            if metric in ('source_bytes', 'executed_statements'):
+                continue
+            base = baseline.get(name, {}).get(metric)
+            if not base or not value:
+                continue
+            ratio = value / base
+            if metric in HIGHER_IS_BETTER:
+                ratio = 1 / ratio
+            if ratio > 1 + threshold:
+                regressions.append(f'{name}.{metric}: {base:.6g} -> {value:.6g} ({(ratio - 1) * 100:+.1f}%)')
+    return regressions
@@ -1,23 +1,183 @@
-from sys import argv
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+import signal
+import sys
+from numscript import batch
+from numscript import cache
+from numscript import checkpoint
 from numscript import io
+from numscript import lazy
+from numscript import optimizer
 from numscript import parser
-from numscript.vm import VM
+from numscript import server
+from numscript import verifier
+from numscript.errors import ScriptError
+from numscript.governor import DEFAULT_CHECK_INTERVAL, Limits
+from numscript.profiler import DEFAULT_SAMPLE_INTERVAL, Profiler, SamplingProfiler
+from numscript.transpiler import compile_blocks
+from numscript.vm import VM, Engine
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError(f'must be at least 1, not {number}')
+    return number
 
 
 def main() -> None:
-    if len(argv) != 2:
-        print("Usage: numscript <script>")
-        exit(1)
-    
-    script_string = io.load_file(argv[1])
-    script = parser.parse(script_string)
-    
-    vm = VM()
-    status = vm.run(script)
+    if sys.argv[1:2] == ['batch']:
+        batch.main(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['serve']:
+        server.main(sys.argv[2:])
+        return
+
+    arg_parser = ArgumentParser(prog='numscript')
+    arg_parser.add_argument('script', help='Path to the NumScript source file')
+    arg_parser.add_argument('--engine', choices=[engine.value for engine in Engine], default=Engine.DECODED.value, help='Execution engine')
+    arg_parser.add_argument('--output', help='Write the program output to this file instead of stdout')
+    arg_parser.add_argument('--output-buffer', type=int, default=io.DEFAULT_OUTPUT_BUFFER_SIZE, help='Size in bytes of the output buffer')
+    arg_parser.add_argument('--flush-on', nargs='+', choices=[name.lower() for name in io.FlushPoint.__members__], default=['all'], help='When the output buffer is flushed')
+    arg_parser.add_argument('--input', help='Read the program input from this file instead of stdin')
+    arg_parser.add_argument('--input-mmap', action='store_true', help='Memory-map the input file instead of reading it in chunks')
+    arg_parser.add_argument('--record-input', help='Write every line of input read by the program to this file, to replay the session later')
+    arg_parser.add_argument('--replay', help='Replay a session recorded with --record-input on the virtual clock')
+    arg_parser.add_argument('--virtual-clock', action='store_true', help='Advance a simulated time when sleeping instead of blocking, and report it at exit')
+    arg_parser.add_argument('--input-chunk', type=int, default=io.DEFAULT_INPUT_CHUNK_SIZE, help='Size in bytes of the chunks read from the input')
+    arg_parser.add_argument('--no-verify', action='store_true', help='Only report invalid statements when they are executed, instead of checking the whole script before running it')
+    arg_parser.add_argument('--no-cache', action='store_true', help='Always parse the source instead of using the compiled script cache')
+    arg_parser.add_argument('--cache-dir', help='Directory of the compiled script cache')
+    arg_parser.add_argument('--cache-size', type=int, default=cache.DEFAULT_CACHE_SIZE, help='Maximum size in bytes of the compiled script cache')
+    arg_parser.add_argument('--lazy', action='store_true', help='Memory-map the source and only tokenize and decode the statements the program executes, without verifying, optimizing or caching the script')
+    arg_parser.add_argument('--lazy-cache-entries', type=int, default=lazy.DEFAULT_CACHE_ENTRIES, help='Number of statements kept tokenized and decoded by --lazy')
+    arg_parser.add_argument('-O', '--optimize', type=int, choices=[optimizer.NONE, optimizer.FOLD, optimizer.FUSE], default=optimizer.DEFAULT_LEVEL, help='Optimization level. From 1, gotos to labels that never return keep no return address')
+    arg_parser.add_argument('--dump-optimizations', action='store_true', help='Print the statements rewritten by the optimizer')
+    arg_parser.add_argument('--max-call-depth', type=int, help='Stop the program when gotos keep more return addresses, they are not limited by default. From -O 1, gotos to labels that never return keep none, use --max-statements to bound loops through them')
+    arg_parser.add_argument('--max-statements', type=int, help='Stop the program after executing this many statements')
+    arg_parser.add_argument('--max-stack-slots', type=int, help='Stop the program when it holds more variables')
+    arg_parser.add_argument('--max-array-elements', type=int, help='Stop the program when its variables hold more array elements')
+    arg_parser.add_argument('--max-output-bytes', type=int, help='Stop the program when it writes more output')
+    arg_parser.add_argument('--max-time', type=float, help='Stop the program after this many seconds')
+    arg_parser.add_argument('--limit-check-interval', type=positive_int, default=DEFAULT_CHECK_INTERVAL, help='Number of statements executed between two checks of the limits')
+    arg_parser.add_argument('--checkpoint', help='Write the state of the program to this file periodically and on SIGUSR1, to resume it later')
+    arg_parser.add_argument('--checkpoint-interval', type=float, default=checkpoint.DEFAULT_CHECKPOINT_INTERVAL, help='Seconds between two checkpoints')
+    arg_parser.add_argument('--resume', help='Resume the program from this checkpoint, skipping the input it read and truncating the output file to what it wrote')
+    arg_parser.add_argument('--profile', action='store_true', help='Print the hot spots of the program per line, operation and label when it exits')
+    arg_parser.add_argument('--profile-json', help='Write the profile as JSON to this file')
+    arg_parser.add_argument('--profile-top', type=int, default=20, help='Number of hot spots printed per section of the profile')
+    arg_parser.add_argument('--sample', help='Sample the label call stack of the program and write it to this file as collapsed stacks for flame graph tools')
+    arg_parser.add_argument('--sample-interval', type=float, default=DEFAULT_SAMPLE_INTERVAL, help='Milliseconds between two samples of the call stack')
+    args = arg_parser.parse_args()
+    if args.lazy and (args.engine == Engine.COMPILED.value or args.profile or args.profile_json):
+        # Both need every statement of the script
+        arg_parser.error('--lazy cannot be used with the compiled engine or --profile')
+
+    try:
+        status = execute(args)
+    except ScriptError as error:
+        print(error.message, file=sys.stderr)
+        sys.exit(1)
 
     print(f"\nProgram finished with status code {status}")
 
 
+def execute(args: Namespace) -> int:
+    flush_points = io.FlushPoint(0)
+    for point in args.flush_on:
+        flush_points |= io.FlushPoint[point.upper()]
+
+    level = args.optimize
+    if args.engine == Engine.COMPILED.value:
+        # Compiled blocks already execute sequences of statements at once
+        level = min(level, optimizer.FOLD)
+
+    if args.lazy:
+        script = lazy.load(args.script, args.lazy_cache_entries)
+    elif args.no_cache:
+        script = parser.parse(io.load_file_bytes(args.script))
+        if not args.no_verify:
+            verifier.verify(script)
+    else:
+        # Cached scripts are already optimized, unless the rewrites must be described
+        cached_level = level if args.engine != Engine.MATCH.value and not args.dump_optimizations else optimizer.NONE
+        script = cache.load_script(args.script, args.cache_dir, args.cache_size, not args.no_verify, cached_level)
+
+    if args.engine != Engine.MATCH.value and not args.lazy and (script.instructions is None or script.optimization != level):
+        rewrites = optimizer.optimize(script, level)
+        if args.dump_optimizations:
+            optimizer.dump(script, rewrites, sys.stderr)
+
+    if args.engine == Engine.COMPILED.value and not args.no_cache and not (args.profile or args.profile_json):
+        # Cache the generated code beside the compiled script
+        script.blocks = compile_blocks(script, args.cache_dir or cache.cache_directory(), args.cache_size)
+
+    # Checkpoints belong to the source they were taken from
+    digest = b''
+    if args.checkpoint or args.resume:
+        digest = checkpoint.script_digest(script.statements.source if args.lazy else io.load_file_bytes(args.script))
+    resumed = checkpoint.load(args.resume, digest) if args.resume else None
+
+    if args.output and resumed is not None:
+        # Continue after the output written before the checkpoint
+        output_stream = open(args.output, 'r+b')
+        output_stream.truncate(resumed.output_size)
+        output_stream.seek(resumed.output_size)
+    else:
+        output_stream = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    output = io.OutputSink(output_stream, args.output_buffer, flush_points)
+
+    # A replayed session reads the recorded input, and doesn't wait for the recorded sleeps
+    input_path = args.replay or args.input
+    virtual_clock = args.virtual_clock or args.replay is not None
+    if input_path:
+        input_source = io.InputSource.from_file(input_path, args.input_mmap, args.input_chunk)
+    else:
+        input_source = io.InputSource(sys.stdin.buffer, args.input_chunk)
+    if resumed is not None:
+        input_source.skip(resumed.input_position)
+    if args.record_input:
+        input_source.log = open(args.record_input, 'wb')
+
+    profiler = Profiler() if args.profile or args.profile_json else None
+    limits = Limits(args.max_statements, args.max_stack_slots, args.max_array_elements, args.max_output_bytes, args.max_time, args.max_call_depth, args.limit_check_interval)
+    if limits == Limits(check_interval=args.limit_check_interval):
+        limits = None
+    checkpointer = None
+    if args.checkpoint:
+        checkpointer = checkpoint.Checkpointer(args.checkpoint, digest, args.checkpoint_interval)
+        signal.signal(signal.SIGUSR1, lambda signal_number, frame: checkpointer.request())
+    vm = VM(Engine(args.engine), output, input_source, profiler, virtual_clock=virtual_clock, limits=limits, checkpointer=checkpointer)
+    sampler = SamplingProfiler(vm, args.sample_interval) if args.sample else None
+    if sampler is not None:
+        sampler.start()
+    try:
+        status = vm.run(script, resumed)
+    finally:
+        if sampler is not None:
+            sampler.stop()
+        if checkpointer is not None:
+            checkpointer.close()
+        if input_source.log is not None:
+            input_source.log.close()
+    output.flush()
+    if args.output:
+        output_stream.close()
+
+    if virtual_clock:
+        print(f'Virtual time elapsed: {vm.virtual_time} ms', file=sys.stderr)
+
+    if sampler is not None:
+        with open(args.sample, 'w') as f:
+            sampler.write_collapsed(f)
+
+    if profiler is not None:
+        if args.profile:
+            profiler.report(sys.stderr, args.profile_top)
+        if args.profile_json:
+            profiler.write_json(args.profile_json)
+
+    return status
+
+
 if __name__ == '__main__':
     main()
-
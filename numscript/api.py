@@ -0,0 +1,94 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+import threading
+from typing import Iterable, List
+from numscript import optimizer
+from numscript import parser
+from numscript import verifier
+from numscript.code import Script
+from numscript.errors import ScriptError
+from numscript.governor import Limits
+from numscript.io import FlushPoint, InputSource, OutputSink
+from numscript.transpiler import compile_blocks
+from numscript.vm import VM, Engine
+
+
+@dataclass
+class Result:
+    # The status the script exited with, None if an error stopped it
+    status: int | None
+    output: bytes
+    # The error that stopped the script, None if it finished
+    error: ScriptError | None = None
+
+
+class Program:
+    """
+        A script compiled once and run any number of times, with its input and output held in memory.
+    """
+
+    def __init__(self, script: Script, engine: Engine = Engine.DECODED) -> None:
+        self.script = script
+        self.engine = engine
+
+
+    @staticmethod
+    def compile(source: str | bytes, engine: Engine = Engine.DECODED, level: int = optimizer.DEFAULT_LEVEL) -> Program:
+        """
+            Parse, verify and optimize the source for the given engine.
+            Raise ScriptError if the script is invalid.
+        """
+        script = parser.parse(source)
+        verifier.verify(script)
+        if engine == Engine.COMPILED:
+            # Compiled blocks already execute sequences of statements at once
+            level = min(level, optimizer.FOLD)
+        if engine != Engine.MATCH:
+            optimizer.optimize(script, level)
+        if engine == Engine.COMPILED:
+            script.blocks = compile_blocks(script)
+        return Program(script, engine)
+
+
+    def make_vm(self, max_call_depth: int | None = None, virtual_clock: bool = False, limits: Limits | None = None) -> VM:
+        return VM(self.engine, max_call_depth=max_call_depth, virtual_clock=virtual_clock, limits=limits)
+
+
+    def run(self, input_data: bytes = b'', vm: VM | None = None) -> Result:
+        """
+            Run the script on the given input, reusing the VM if one is given.
+            Errors raised by the script are returned in the result instead of being raised, without a status.
+        """
+        stream = BytesIO()
+        output = OutputSink(stream, flush_points=FlushPoint.EXIT)
+        input_source = InputSource(None, data=bytearray(input_data))
+        if vm is None:
+            vm = VM(self.engine, output, input_source)
+        else:
+            vm.reset(output, input_source)
+
+        try:
+            status = vm.run(self.script)
+        except ScriptError as error:
+            return Result(None, stream.getvalue(), error)
+        return Result(status, stream.getvalue())
+
+
+def run_in_threads(program: Program, inputs: Iterable[bytes], workers: int | None = None) -> List[Result]:
+    """
+        Run the program on every input in a pool of threads, each with its own VM, and return the results in order.
+        A VM keeps all the state of a run, so the threads only share the compiled program, which runs don't modify.
+        They run in parallel on free-threaded builds of Python.
+    """
+    local = threading.local()
+
+    def run(input_data: bytes) -> Result:
+        vm = getattr(local, 'vm', None)
+        if vm is None:
+            vm = local.vm = program.make_vm()
+        return program.run(input_data, vm)
+
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(run, inputs))
@@ -0,0 +1,133 @@
+from array import array
+import operator
+from typing import Any, Callable, Sequence
+from numscript.object import make_array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Arrays shorter than this are processed in Python, where calling NumPy costs more than it saves
+MIN_VECTORIZED_LENGTH = 32
+INT64_MAX = (1 << 63) - 1
+# Longest array a script can create, 2 GiB of 64-bit elements
+MAX_ARRAY_LENGTH = 1 << 28
+
+
+# Bulk operations on the elements of arrays.
+#
+# Arrays are stored in 64-bit buffers, unless their elements don't fit, in which case they are tuples.
+# When NumPy is installed, the arithmetic operations run on views of the buffers instead of iterating
+# over the elements, and write their results straight into the buffer of a new array.
+
+
+def vectorized(values: Sequence[int]) -> bool:
+    return numpy is not None and type(values) is not tuple and len(values) >= MIN_VECTORIZED_LENGTH
+
+
+def view(values: Sequence[int]) -> Any:
+    # Shares the memory of the buffer
+    return numpy.frombuffer(values, dtype=numpy.int64)
+
+
+def magnitude(elements: Any) -> int:
+    # Computed on Python ints, since the absolute value of the lowest int64 doesn't fit in 64 bits
+    return max(int(elements.max()), -int(elements.min()))
+
+
+def vector_operand(operand: int | Sequence[int]) -> Any:
+    """
+        Return the operand as a NumPy scalar or view, or None if it doesn't fit in 64 bits.
+    """
+    if type(operand) is int:
+        return operand if -INT64_MAX <= operand <= INT64_MAX else None
+    return None if type(operand) is tuple else view(operand)
+
+
+def slice_elements(values: Sequence[int], start: int, end: int) -> Sequence[int]:
+    return values[start:end]
+
+
+def concatenate(first: Sequence[int], second: Sequence[int]) -> Sequence[int]:
+    if type(first) is tuple or type(second) is tuple:
+        return tuple(first) + tuple(second)
+    # Literal arrays of cached scripts are views of the cache file, which are copied as bytes
+    if type(first) is not array:
+        first = array('q', bytes(first))
+    return first + (second if type(second) is array else array('q', bytes(second)))
+
+
+def fill(value: int, length: int) -> Sequence[int]:
+    return make_array((value,)) * length
+
+
+def elementwise(values: Sequence[int], operand: int | Sequence[int], function: Callable[[int, int], int], ufunc_name: str, bound: Callable[[int, int], int]) -> Sequence[int]:
+    """
+        Apply the function to every element and the operand, or the element of the operand array at the same index.
+        Bound computes the highest magnitude of a result from the highest magnitudes of the operands.
+    """
+    right = vector_operand(operand) if vectorized(values) else None
+    if right is not None:
+        left = view(values)
+        right_magnitude = abs(right) if type(right) is int else magnitude(right)
+        # NumPy wraps around on overflow, so results that may not fit in 64 bits are computed in Python
+        if bound(magnitude(left), right_magnitude) <= INT64_MAX:
+            result = array('q', [0]) * len(values)
+            getattr(numpy, ufunc_name)(left, right, out=view(result))
+            return result
+
+    if type(operand) is int:
+        return make_array([function(element, operand) for element in values])
+    return make_array(list(map(function, values, operand)))
+
+
+def add(values: Sequence[int], operand: int | Sequence[int]) -> Sequence[int]:
+    return elementwise(values, operand, operator.add, 'add', operator.add)
+
+
+def subtract(values: Sequence[int], operand: int | Sequence[int]) -> Sequence[int]:
+    return elementwise(values, operand, operator.sub, 'subtract', operator.add)
+
+
+def multiply(values: Sequence[int], operand: int | Sequence[int]) -> Sequence[int]:
+    return elementwise(values, operand, operator.mul, 'multiply', operator.mul)
+
+
+def total(values: Sequence[int]) -> int:
+    if vectorized(values):
+        elements = view(values)
+        if len(values) * magnitude(elements) <= INT64_MAX:
+            return int(elements.sum())
+    return sum(values)
+
+
+def compare(values: Sequence[int], operand: int | Sequence[int]) -> Sequence[int]:
+    """
+        Return -1, 0 or 1 for every element lower than, equal to or greater than the operand.
+    """
+    right = vector_operand(operand) if vectorized(values) else None
+    if right is not None:
+        left = view(values)
+        result = array('q', [0]) * len(values)
+        signs = view(result)
+        signs[:] = left > right
+        signs -= left < right
+        return result
+
+    if type(operand) is int:
+        return array('q', [(element > operand) - (element < operand) for element in values])
+    return array('q', [(element > other) - (element < other) for element, other in zip(values, operand)])
+
+
+def find(values: Sequence[int], value: int) -> int:
+    """
+        Return the index of the first element equal to the value, or -1.
+    """
+    if type(values) is memoryview:
+        values = values.tolist()
+    try:
+        return values.index(value)
+    except ValueError:
+        return -1
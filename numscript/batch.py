@@ -0,0 +1,153 @@
+from argparse import ArgumentParser
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+from numscript import io
+from numscript import optimizer
+from numscript.api import Program
+from numscript.errors import ScriptError
+from numscript.vm import VM, Engine
+
+
+SCRIPT_SUFFIX = '.ns'
+
+# Programs compiled once per process, inherited by forked workers and compiled again by spawned ones
+programs: List[Program | None] = []
+# VMs of the worker thread, reused across the runs of every program
+local = threading.local()
+
+
+def expand(paths: Sequence[str], suffix: str = '') -> List[str]:
+    # Directories are replaced by the files they contain
+    files: List[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(entry.path for entry in os.scandir(path) if entry.is_file() and entry.name.endswith(suffix)))
+        else:
+            files.append(path)
+    return files
+
+
+def compile_programs(sources: List[bytes], engine: Engine, level: int) -> List[Program | ScriptError]:
+    compiled: List[Program | ScriptError] = []
+    for source in sources:
+        try:
+            compiled.append(Program.compile(source, engine, level))
+        except ScriptError as error:
+            compiled.append(error)
+    return compiled
+
+
+def initialize_worker(sources: List[bytes], engine: Engine, level: int) -> None:
+    global programs
+    if not programs:
+        programs = [program if isinstance(program, Program) else None for program in compile_programs(sources, engine, level)]
+
+
+def run_job(job: Tuple[int, str | None, str | None]) -> Dict[str, Any]:
+    """
+        Run a program on an input file, in a worker. The output is returned, or written to the given path.
+        Any failure is returned as the record of the job, so that it doesn't stop the other jobs.
+    """
+    index, input_path, output_file = job
+    vms: Dict[int, VM] = local.__dict__.setdefault('vms', {})
+    start = time.perf_counter()
+    try:
+        return run_program(index, input_path, output_file, vms, start)
+    except Exception as error:
+        # The VM may have been left in the middle of a run
+        vms.pop(index, None)
+        return {'status': 1, 'time': time.perf_counter() - start, 'error': f'{type(error).__name__}: {error}'}
+
+
+def run_program(index: int, input_path: str | None, output_file: str | None, vms: Dict[int, VM], start: float) -> Dict[str, Any]:
+    program = programs[index]
+    input_data = io.load_file_bytes(input_path) if input_path is not None else b''
+    vm = vms.get(index)
+    if vm is None:
+        vm = vms[index] = program.make_vm()
+
+    result = program.run(input_data, vm)
+    elapsed = time.perf_counter() - start
+
+    # Like the command line, a script error exits with status 1
+    record: Dict[str, Any] = {'status': 1 if result.status is None else int(result.status), 'time': elapsed}
+    if result.error is not None:
+        record['error'] = result.error.message.strip()
+        record['line'] = result.error.line_number
+    if output_file is not None:
+        with open(output_file, 'wb') as f:
+            f.write(result.output)
+        record['output_file'] = output_file
+    else:
+        record['output'] = result.output.decode('utf-8', 'backslashreplace')
+    return record
+
+
+def output_path(directory: str | None, script_path: str, input_path: str | None) -> str | None:
+    if directory is None:
+        return None
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    if input_path is not None:
+        name += '.' + os.path.basename(input_path)
+    return os.path.join(directory, name + '.out')
+
+
+def main(argv: Sequence[str]) -> None:
+    arg_parser = ArgumentParser(prog='numscript batch', description='Run scripts over many inputs in parallel')
+    arg_parser.add_argument('scripts', nargs='+', help='NumScript source files, or directories of source files')
+    arg_parser.add_argument('--input', action='append', default=[], help='Input file, or directory of input files, every script is run on each of them. Can be repeated')
+    arg_parser.add_argument('--results', default='-', help='Write the results as JSON lines to this file instead of stdout')
+    arg_parser.add_argument('--output-dir', help='Write the output of every run to a file in this directory instead of the results')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    arg_parser.add_argument('--threads', action='store_true', help='Run the workers as threads of this process, which only run in parallel on free-threaded builds of Python')
+    arg_parser.add_argument('--chunk-size', type=int, help='Number of runs sent to a worker at once, by default spread evenly over the workers')
+    arg_parser.add_argument('--engine', choices=[engine.value for engine in Engine], default=Engine.DECODED.value, help='Execution engine')
+    arg_parser.add_argument('-O', '--optimize', type=int, choices=[optimizer.NONE, optimizer.FOLD, optimizer.FUSE], default=optimizer.DEFAULT_LEVEL, help='Optimization level')
+    args = arg_parser.parse_args(argv)
+
+    script_paths = expand(args.scripts, SCRIPT_SUFFIX)
+    input_paths: List[str | None] = expand(args.input) or [None]
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    # Compile every script once, before the workers are forked
+    global programs
+    sources = [io.load_file_bytes(path) for path in script_paths]
+    engine = Engine(args.engine)
+    compiled = compile_programs(sources, engine, args.optimize)
+    programs = [program if isinstance(program, Program) else None for program in compiled]
+
+    results = sys.stdout if args.results == '-' else open(args.results, 'w')
+    jobs: List[Tuple[int, str | None, str | None]] = []
+    described: List[Tuple[str, str | None]] = []
+    failed = 0
+    for index, (script_path, program) in enumerate(zip(script_paths, compiled)):
+        if isinstance(program, ScriptError):
+            # Invalid scripts are reported once instead of once per input
+            record = {'script': script_path, 'status': 1, 'error': program.message.strip(), 'line': program.line_number}
+            results.write(json.dumps(record) + '\n')
+            failed += 1
+            continue
+        for input_path in input_paths:
+            jobs.append((index, input_path, output_path(args.output_dir, script_path, input_path)))
+            described.append((script_path, input_path))
+
+    workers = max(1, min(args.workers or 1, len(jobs)))
+    chunk_size = args.chunk_size or max(1, len(jobs) // (workers * 4))
+    start = time.perf_counter()
+    pool_type = ThreadPool if args.threads else Pool
+    with pool_type(workers, initialize_worker, (sources, engine, args.optimize)) as pool:
+        for (script_path, input_path), record in zip(described, pool.imap(run_job, jobs, chunk_size)):
+            results.write(json.dumps({'script': script_path, 'input': input_path, **record}) + '\n')
+            failed += record['status'] != 0
+    elapsed = time.perf_counter() - start
+
+    if results is not sys.stdout:
+        results.close()
+    print(f'Ran {len(jobs)} jobs on {workers} workers in {elapsed:.3f}s, {failed} failed', file=sys.stderr)
@@ -0,0 +1,302 @@
+from array import array
+from importlib import import_module
+from typing import Any, Callable, Dict, List, Tuple
+from numscript.code import Instruction, Script, StatementTable
+from numscript.decoder import decode_statement
+from numscript.optimizer import NONE
+from numscript.object import Object, Type as ObjectType
+import struct
+import sys
+
+
+# Layout of a compiled script:
+#   header
+#   line numbers, token offsets and token counts of the statements, one column after the other
+#   tokens: the operators, variants, operands and literal arrays of all the statements
+#   label table: label id and program address of each label
+#   stream levels: the optimization level of each instruction table
+#   instruction tables: handler and operands of the instruction of each statement, one table per optimization level
+#   arrays: the literal arrays referenced by instruction operands
+#   handler names: the qualified names of the handlers referenced by the instruction table
+#   text: the encoded output referenced by instruction operands
+# All the fields up to the arrays are native 64-bit integers.
+MAGIC = b'NSC\0'
+FORMAT_VERSION = 3
+# Compiled scripts use the native byte order, so they are only valid on similar machines
+PLATFORM_TAG = f'{sys.byteorder}-{FORMAT_VERSION}'.encode()
+HEADER = struct.Struct('=4sIqqqqqqqq')
+LABEL_FIELDS = 2
+# Instructions have at most this many operands, superinstructions included
+MAX_OPERANDS = 4
+# A handler reference followed by the kind and two values of each operand
+INSTRUCTION_FIELDS = 1 + MAX_OPERANDS * 3
+# Handler reference of instructions that couldn't be encoded and are decoded at load time
+DECODE_AT_LOAD = -1
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+class OperandKind:
+
+    NONE = 0
+    # Inline integer
+    INT = 1
+    # Array object, stored as the offset and length of its elements in the arrays section
+    ARRAY = 2
+    # Raw sequence of integers, stored like arrays
+    BUFFER = 3
+    # Bytes, stored as the offset and length of the data in the text section
+    BYTES = 4
+
+
+def handler_name(handler: Callable[..., None]) -> str:
+    return f'{handler.__module__}:{handler.__qualname__}'
+
+
+def resolve_handler(name: str) -> Callable[..., None] | None:
+    module_name, _, qualified_name = name.partition(':')
+    # Only handlers of the interpreter can be referenced
+    if module_name.split('.')[0] != 'numscript':
+        return None
+    try:
+        return getattr(import_module(module_name), qualified_name)
+    except (ImportError, AttributeError):
+        return None
+
+
+def fits_int64(value: int) -> bool:
+    return INT64_MIN <= value <= INT64_MAX
+
+
+class Encoder:
+
+    def __init__(self) -> None:
+        self.arrays = array('q')
+        self.text = bytearray()
+        self.handler_names: List[str] = []
+        self.handler_refs: Dict[Callable[..., None], int] = {}
+
+
+    def encode_operand(self, operand: Any) -> Tuple[int, int, int] | None:
+        if type(operand) is int:
+            if fits_int64(operand):
+                return (OperandKind.INT, operand, 0)
+            return None
+
+        if isinstance(operand, Object):
+            kind = OperandKind.ARRAY
+            values = operand.value
+            if operand.type != ObjectType.ARRAY:
+                return None
+        elif isinstance(operand, (array, memoryview)):
+            kind = OperandKind.BUFFER
+            values = operand
+        elif isinstance(operand, bytes):
+            offset = len(self.text)
+            self.text += operand
+            return (OperandKind.BYTES, offset, len(operand))
+        else:
+            return None
+
+        # Arrays with elements that don't fit in 64 bits are tuples
+        if not isinstance(values, (array, memoryview)):
+            return None
+        offset = len(self.arrays)
+        self.arrays.extend(values)
+        return (kind, offset, len(values))
+
+
+    def encode_instruction(self, instruction: Instruction) -> List[int]:
+        handler, operands = instruction
+        row = [DECODE_AT_LOAD] + [OperandKind.NONE] * (INSTRUCTION_FIELDS - 1)
+        if len(operands) > MAX_OPERANDS:
+            return row
+
+        arrays_size = len(self.arrays)
+        text_size = len(self.text)
+        for i, operand in enumerate(operands):
+            encoded = self.encode_operand(operand)
+            if encoded is None:
+                # Discard the data of the operands already encoded
+                del self.arrays[arrays_size:]
+                del self.text[text_size:]
+                return [DECODE_AT_LOAD] + [OperandKind.NONE] * (INSTRUCTION_FIELDS - 1)
+            row[1 + i * 3:4 + i * 3] = encoded
+
+        if handler not in self.handler_refs:
+            self.handler_refs[handler] = len(self.handler_names)
+            self.handler_names.append(handler_name(handler))
+        row[0] = self.handler_refs[handler]
+        return row
+
+
+    def encode_stream(self, instructions: List[Instruction], level: int) -> array | None:
+        """
+            Encode the instructions optimized at the level. Return None if an optimized instruction can't be encoded,
+            since decoding its statement at load time would undo the rewrites of its neighbours.
+        """
+        arrays_size = len(self.arrays)
+        text_size = len(self.text)
+        table = array('q')
+        for instruction in instructions:
+            row = self.encode_instruction(instruction)
+            if row[0] == DECODE_AT_LOAD and level != NONE:
+                del self.arrays[arrays_size:]
+                del self.text[text_size:]
+                return None
+            table.extend(row)
+        return table
+
+
+def dump(script: Script, streams: Dict[int, List[Instruction]] | None = None) -> bytes | None:
+    """
+        Encode the script with its label index and the instructions optimized at every level of streams,
+        by default its own instructions, which must already be built.
+        Optimized instructions that can't be encoded are left out, and optimized again at load time.
+        Return None if a token doesn't fit in 64 bits.
+    """
+    line_numbers = array('q')
+    offsets = array('q')
+    lengths = array('q')
+    tokens = array('q')
+    label_table = array('q')
+    try:
+        statements = script.statements
+        if isinstance(statements, StatementTable) and isinstance(statements.tokens, (array, memoryview)):
+            # The parser already stores the statements in the same layout
+            line_numbers = statements.line_numbers
+            offsets = statements.offsets
+            lengths = statements.lengths
+            tokens = statements.tokens
+        else:
+            for statement in statements:
+                line_numbers.append(statement.line_number)
+                offsets.append(len(tokens))
+                lengths.append(statement.length())
+                tokens.extend(statement.tokens)
+
+        for label_id, address in script.labels.items():
+            label_table.extend((label_id, address))
+    except OverflowError:
+        return None
+
+    if streams is None:
+        streams = {script.optimization: script.instructions}
+    encoder = Encoder()
+    levels = array('q')
+    instruction_tables = []
+    for level, instructions in sorted(streams.items()):
+        table = encoder.encode_stream(instructions, level)
+        if table is not None:
+            levels.append(level)
+            instruction_tables.append(table.tobytes())
+
+    names = '\n'.join(encoder.handler_names).encode()
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, script.verified,
+        len(script.statements), len(tokens), len(script.labels), len(levels),
+        len(encoder.arrays), len(names), len(encoder.text)
+    )
+    return b''.join((
+        header,
+        line_numbers.tobytes(), offsets.tobytes(), lengths.tobytes(), tokens.tobytes(), label_table.tobytes(),
+        levels.tobytes(), *instruction_tables, encoder.arrays.tobytes(),
+        names, encoder.text
+    ))
+
+
+def decode_operand(kind: int, first: int, second: int, arrays: memoryview, text: memoryview) -> Any:
+    match kind:
+        case OperandKind.INT:
+            return first
+        case OperandKind.ARRAY:
+            return Object(arrays[first:first + second], ObjectType.ARRAY)
+        case OperandKind.BUFFER:
+            return arrays[first:first + second]
+        case OperandKind.BYTES:
+            return text[first:first + second]
+
+
+def load(buffer: memoryview, level: int = NONE) -> Script | None:
+    """
+        Decode a compiled script without copying its tokens and literal arrays, which stay views of the buffer.
+        Only the instructions optimized at the level are decoded, or the unoptimized ones if they are missing.
+        Return None if the buffer is not a compiled script of the current format.
+    """
+    if len(buffer) < HEADER.size:
+        return None
+    magic, version, verified, statement_count, token_count, label_count, stream_count, arrays_size, names_size, text_size = HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+
+    sizes = (
+        statement_count, statement_count, statement_count, token_count, label_count * LABEL_FIELDS,
+        stream_count, stream_count * statement_count * INSTRUCTION_FIELDS, arrays_size
+    )
+    int_fields_end = HEADER.size + sum(sizes) * 8
+    if len(buffer) != int_fields_end + names_size + text_size:
+        return None
+
+    sections = []
+    fields = buffer[HEADER.size:int_fields_end].cast('q')
+    start = 0
+    for size in sizes:
+        sections.append(fields[start:start + size])
+        start += size
+    line_numbers, offsets, lengths, tokens, label_table, levels, instruction_tables, arrays = sections
+
+    names = bytes(buffer[int_fields_end:int_fields_end + names_size]).decode().split('\n') if names_size else []
+    text = buffer[int_fields_end + names_size:]
+
+    statements = StatementTable(tokens, line_numbers, offsets, lengths)
+    labels = dict(zip(label_table[::LABEL_FIELDS].tolist(), label_table[1::LABEL_FIELDS].tolist()))
+    script = Script(statements, labels, verified=bool(verified))
+
+    levels = levels.tolist()
+    if level not in levels:
+        level = NONE
+    if level not in levels:
+        # Decoded before execution
+        return script
+    stream = levels.index(level)
+    table_size = statement_count * INSTRUCTION_FIELDS
+    instruction_table = instruction_tables[stream * table_size:(stream + 1) * table_size]
+
+    handlers = [resolve_handler(name) for name in names]
+    if None in handlers:
+        return None
+
+    instructions: List[Instruction] = []
+    columns = [instruction_table[field::INSTRUCTION_FIELDS].tolist() for field in range(INSTRUCTION_FIELDS)]
+    for address, (handler_ref, kind1, first1, second1, kind2, first2, second2, kind3, first3, second3, kind4, first4, second4) in enumerate(zip(*columns)):
+        if handler_ref == DECODE_AT_LOAD:
+            instructions.append(decode_statement(statements[address], labels))
+        elif kind1 == OperandKind.NONE:
+            instructions.append((handlers[handler_ref], ()))
+        elif kind2 == OperandKind.NONE:
+            instructions.append((handlers[handler_ref], (
+                first1 if kind1 == OperandKind.INT else decode_operand(kind1, first1, second1, arrays, text),
+            )))
+        elif kind3 == OperandKind.NONE:
+            instructions.append((handlers[handler_ref], (
+                first1 if kind1 == OperandKind.INT else decode_operand(kind1, first1, second1, arrays, text),
+                first2 if kind2 == OperandKind.INT else decode_operand(kind2, first2, second2, arrays, text),
+            )))
+        elif kind4 == OperandKind.NONE:
+            instructions.append((handlers[handler_ref], (
+                first1 if kind1 == OperandKind.INT else decode_operand(kind1, first1, second1, arrays, text),
+                first2 if kind2 == OperandKind.INT else decode_operand(kind2, first2, second2, arrays, text),
+                first3 if kind3 == OperandKind.INT else decode_operand(kind3, first3, second3, arrays, text),
+            )))
+        else:
+            instructions.append((handlers[handler_ref], (
+                first1 if kind1 == OperandKind.INT else decode_operand(kind1, first1, second1, arrays, text),
+                first2 if kind2 == OperandKind.INT else decode_operand(kind2, first2, second2, arrays, text),
+                first3 if kind3 == OperandKind.INT else decode_operand(kind3, first3, second3, arrays, text),
+                first4 if kind4 == OperandKind.INT else decode_operand(kind4, first4, second4, arrays, text),
+            )))
+
+    script.instructions = instructions
+    script.optimization = level
+    return script
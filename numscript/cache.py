@@ -0,0 +1,156 @@
+from dataclasses import replace
+from hashlib import sha256
+from mmap import mmap, ACCESS_READ
+from typing import Dict, List
+from numscript import binary
+from numscript import io
+from numscript import optimizer
+from numscript import parser
+from numscript import verifier
+from numscript.code import Instruction, Script
+from numscript.decoder import decode
+from numscript.labels import index_labels
+import os
+import threading
+
+
+# Total size in bytes of the compiled scripts kept in the cache directory
+DEFAULT_CACHE_SIZE = 256 << 20
+COMPILED_SUFFIX = '.nsc'
+# Python code generated from compiled scripts
+CODE_SUFFIX = '.nspy'
+
+
+def cache_directory() -> str:
+    if 'NUMSCRIPT_CACHE_DIR' in os.environ:
+        return os.environ['NUMSCRIPT_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'numscript')
+
+
+def cache_key(source: bytes) -> str:
+    return sha256(binary.PLATFORM_TAG + source).hexdigest()
+
+
+def compile_source(source: bytes, verify: bool = True) -> Script:
+    script = parser.parse(source)
+    if verify:
+        # Also indexes the labels
+        verifier.verify(script)
+    else:
+        script.labels = index_labels(script)
+    script.instructions = decode(script, script.labels)
+    return script
+
+
+def optimize_levels(script: Script) -> Dict[int, List[Instruction]]:
+    """
+        Return the decoded instructions of the script optimized at every level, keyed by level.
+    """
+    streams = {optimizer.NONE: script.instructions}
+    for level in (optimizer.FOLD, optimizer.FUSE):
+        # The optimizer replaces the instructions of the script it is given
+        optimized = replace(script)
+        optimizer.optimize(optimized, level)
+        streams[level] = optimized.instructions
+    return streams
+
+
+def load_compiled(compiled_path: str, level: int = optimizer.NONE) -> Script | None:
+    try:
+        with open(compiled_path, 'rb') as f:
+            mapping = mmap(f.fileno(), 0, access=ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    # The tokens of the script keep the mapping alive
+    script = binary.load(memoryview(mapping), level)
+    if script is None:
+        return None
+
+    touch(compiled_path)
+    return script
+
+
+def touch(path: str) -> None:
+    # The modification time tracks the last use for eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def read_entry(path: str) -> bytes | None:
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    touch(path)
+    return data
+
+
+def evict(directory: str, max_size: int) -> None:
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith((COMPILED_SUFFIX, CODE_SUFFIX)):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+    # Remove the least recently used scripts first
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        os.remove(path)
+        total_size -= size
+
+
+def write_entry(path: str, data: bytes, max_size: int) -> None:
+    if len(data) > max_size:
+        return
+
+    directory = os.path.dirname(path)
+    # The cache is only an optimization, failing to write it is not an error
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Unique per thread, so that concurrent writers never share a temporary file
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        evict(directory, max_size)
+    except OSError:
+        pass
+
+
+def store_compiled(compiled_path: str, script: Script, streams: Dict[int, List[Instruction]], max_size: int) -> None:
+    data = binary.dump(script, streams)
+    if data is not None:
+        write_entry(compiled_path, data, max_size)
+
+
+def load_script(file_path: str, directory: str | None = None, max_size: int = DEFAULT_CACHE_SIZE, verify: bool = True, level: int = optimizer.NONE) -> Script:
+    """
+        Load the compiled script from the cache if the source hasn't changed since it was compiled,
+        otherwise compile the source and add it to the cache.
+        Unless verify is False, every invalid statement is reported before the script is returned.
+        The instructions are optimized at the level, scripts are cached optimized at every level.
+    """
+    source = io.load_file_bytes(file_path)
+
+    compiled_path = os.path.join(directory or cache_directory(), cache_key(source) + COMPILED_SUFFIX)
+    script = load_compiled(compiled_path, level)
+    # Scripts compiled without verification are compiled again when they must be verified
+    if script is not None and (script.verified or not verify):
+        if script.optimization != level:
+            # Instructions that couldn't be cached
+            optimizer.optimize(script, level)
+        return script
+
+    script = compile_source(source, verify)
+    streams = optimize_levels(script)
+    store_compiled(compiled_path, script, streams, max_size)
+    script.instructions = streams[level]
+    script.optimization = level
+    return script
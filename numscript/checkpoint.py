@@ -0,0 +1,269 @@
+from __future__ import annotations
+from array import array
+from dataclasses import dataclass
+from hashlib import sha256
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Any, Dict, List, TYPE_CHECKING
+from numscript.errors import ErrorCode, Errors
+from numscript.object import Object, Type as ObjectType, Value
+
+if TYPE_CHECKING:
+    from numscript.vm import VM
+
+
+# Layout of a checkpoint:
+#   header
+#   scopes: the start address of every scope
+#   goto stack: the return addresses of the gotos
+#   label table: label id and program address of each label
+#   slot table: kind and value of each stack slot
+#   array table: kind, offset and length of each value stored outside the slot table
+#   elements: the elements of the arrays
+#   text: integers that don't fit in 64 bits, in decimal and separated by spaces
+# All the fields up to the text are 64-bit integers in the byte order of the machine that wrote them.
+MAGIC = b'NSK\0'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('=4sIq32sqqqqqqqqqqqqq')
+LABEL_FIELDS = 2
+SLOT_FIELDS = 2
+ARRAY_FIELDS = 3
+LITTLE_ENDIAN = int(sys.byteorder == 'little')
+
+# Seconds between two periodic checkpoints
+DEFAULT_CHECKPOINT_INTERVAL = 60.0
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+
+class SlotKind:
+
+    # Inline integer
+    INT = 0
+    # Array, stored as the index of its entry in the array table
+    ARRAY = 1
+    # Integer that doesn't fit in 64 bits, stored like arrays
+    BIG_INT = 2
+
+
+class ArrayKind:
+
+    # Offset and length of the elements in the elements section
+    ELEMENTS = 0
+    # Offset and length of the integers in the text section
+    TEXT = 1
+
+
+@dataclass
+class Checkpoint:
+    # Digest of the source of the script the state belongs to
+    script_digest: bytes
+    program_counter: int
+    status: ErrorCode
+    scopes: List[int]
+    stack: List[Value]
+    labels: Dict[int, int]
+    goto_stack: List[int]
+    # Statements executed, counted against the statement limit
+    executed: int
+    virtual_time: int
+    # Bytes of input read and of output written
+    input_position: int
+    output_size: int
+
+
+def script_digest(source: bytes) -> bytes:
+    return sha256(source).digest()
+
+
+def capture(vm: VM, digest: bytes) -> Checkpoint:
+    """
+        Copy the state of the VM, which must be between two statements.
+        Values on the stack are never modified in place, so only the lists holding them are copied.
+    """
+    return Checkpoint(
+        digest, vm.program_counter, vm.status, vm.scopes.copy(), vm.stack.copy(), dict(vm.labels), vm.goto_stack.copy(),
+        vm.governor.executed if vm.governor is not None else 0, vm.virtual_time, vm.input.consumed(), vm.output.size()
+    )
+
+
+def encode(checkpoint: Checkpoint) -> List[Any]:
+    """
+        Encode the checkpoint as a list of buffers to write one after the other.
+        The elements of the arrays on the stack are written straight from their buffers, without copying them.
+    """
+    label_table = array('q')
+    for label_id, address in checkpoint.labels.items():
+        label_table.extend((label_id, address))
+
+    slot_table = array('q')
+    array_table = array('q')
+    buffers: List[Any] = []
+    element_count = 0
+    text = bytearray()
+    # Arrays shared by several slots are stored once
+    array_indexes: Dict[int, int] = {}
+
+    def add_text(values: Any) -> int:
+        index = len(array_table) // ARRAY_FIELDS
+        data = ' '.join(map(str, values)).encode()
+        array_table.extend((ArrayKind.TEXT, len(text), len(data)))
+        text.extend(data)
+        return index
+
+    for value in checkpoint.stack:
+        if type(value) is int:
+            if INT64_MIN <= value <= INT64_MAX:
+                slot_table.extend((SlotKind.INT, value))
+            else:
+                slot_table.extend((SlotKind.BIG_INT, add_text((value,))))
+            continue
+
+        index = array_indexes.get(id(value))
+        if index is None:
+            elements = value.value
+            if type(elements) is tuple:
+                # Arrays with elements that don't fit in 64 bits
+                index = add_text(elements)
+            else:
+                index = len(array_table) // ARRAY_FIELDS
+                array_table.extend((ArrayKind.ELEMENTS, element_count, len(elements)))
+                buffers.append(elements)
+                element_count += len(elements)
+            array_indexes[id(value)] = index
+        slot_table.extend((SlotKind.ARRAY, index))
+
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, LITTLE_ENDIAN, checkpoint.script_digest,
+        checkpoint.program_counter, checkpoint.status, checkpoint.executed, checkpoint.virtual_time,
+        checkpoint.input_position, checkpoint.output_size,
+        len(checkpoint.scopes), len(checkpoint.goto_stack), len(checkpoint.labels), len(checkpoint.stack),
+        len(array_table) // ARRAY_FIELDS, element_count, len(text)
+    )
+    return [
+        header, array('q', checkpoint.scopes), array('q', checkpoint.goto_stack), label_table, slot_table, array_table,
+        *buffers, text
+    ]
+
+
+def write(path: str, checkpoint: Checkpoint) -> None:
+    # Replace the previous checkpoint only once the new one is complete
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'wb') as f:
+        for buffer in encode(checkpoint):
+            f.write(buffer)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+def load(path: str, digest: bytes) -> Checkpoint:
+    """
+        Read a checkpoint of the script with the given source digest.
+        Raise ScriptError if the file is not a checkpoint of the current format or belongs to another script.
+    """
+    try:
+        with open(path, 'rb') as f:
+            buffer = memoryview(f.read())
+    except OSError as error:
+        Errors.invalid_checkpoint(path, error.strerror)
+
+    if len(buffer) < HEADER.size:
+        Errors.invalid_checkpoint(path, 'not a checkpoint')
+    (
+        magic, version, little_endian, checkpoint_digest,
+        program_counter, status, executed, virtual_time, input_position, output_size,
+        scope_count, goto_count, label_count, slot_count, array_count, element_count, text_size
+    ) = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        Errors.invalid_checkpoint(path, 'not a checkpoint')
+    if version != FORMAT_VERSION or little_endian != LITTLE_ENDIAN:
+        Errors.invalid_checkpoint(path, 'written by an incompatible version or machine')
+    if checkpoint_digest != digest:
+        Errors.invalid_checkpoint(path, 'written by a run of a different script')
+
+    sizes = (scope_count, goto_count, label_count * LABEL_FIELDS, slot_count * SLOT_FIELDS, array_count * ARRAY_FIELDS, element_count)
+    int_fields_end = HEADER.size + sum(sizes) * 8
+    if len(buffer) != int_fields_end + text_size:
+        Errors.invalid_checkpoint(path, 'truncated')
+
+    sections = []
+    fields = buffer[HEADER.size:int_fields_end].cast('q')
+    start = 0
+    for size in sizes:
+        sections.append(fields[start:start + size])
+        start += size
+    scopes, goto_stack, label_table, slot_table, array_table, elements = sections
+    text = bytes(buffer[int_fields_end:])
+
+    values: List[Any] = []
+    for kind, offset, length in zip(array_table[::ARRAY_FIELDS], array_table[1::ARRAY_FIELDS], array_table[2::ARRAY_FIELDS]):
+        if kind == ArrayKind.ELEMENTS:
+            values.append(array('q', elements[offset:offset + length].tobytes()))
+        else:
+            values.append(tuple(map(int, text[offset:offset + length].split())))
+
+    # Slots that shared an array share it again
+    objects: Dict[int, Object] = {}
+    stack: List[Value] = []
+    for kind, value in zip(slot_table[::SLOT_FIELDS].tolist(), slot_table[1::SLOT_FIELDS].tolist()):
+        match kind:
+            case SlotKind.INT:
+                stack.append(value)
+            case SlotKind.BIG_INT:
+                stack.append(values[value][0])
+            case _:
+                if value not in objects:
+                    objects[value] = Object(values[value], ObjectType.ARRAY)
+                stack.append(objects[value])
+
+    labels = dict(zip(label_table[::LABEL_FIELDS].tolist(), label_table[1::LABEL_FIELDS].tolist()))
+    return Checkpoint(
+        checkpoint_digest, program_counter, ErrorCode(status), scopes.tolist(), stack, labels, goto_stack.tolist(),
+        executed, virtual_time, input_position, output_size
+    )
+
+
+class Checkpointer:
+    """
+        Writes checkpoints of a run every interval seconds, and when requested, e.g. by a signal handler.
+        The VM only copies its state between two slices of statements, a background thread encodes and writes it.
+    """
+
+    def __init__(self, path: str, digest: bytes, interval: float = DEFAULT_CHECKPOINT_INTERVAL) -> None:
+        self.path = path
+        self.digest = digest
+        self.interval = interval
+        self.requested = False
+        self.next_time = time.monotonic() + interval
+        self.writer: threading.Thread | None = None
+
+
+    def request(self) -> None:
+        # Only sets a flag, so that it can be called from a signal handler
+        self.requested = True
+
+
+    def after_slice(self, vm: VM) -> None:
+        if not self.requested and time.monotonic() < self.next_time:
+            return
+        if self.writer is not None and self.writer.is_alive():
+            # Retry after the next slice instead of waiting for the previous checkpoint
+            return
+
+        self.requested = False
+        self.next_time = time.monotonic() + self.interval
+        # The checkpoint covers the output written so far
+        vm.output.flush()
+        self.writer = threading.Thread(target=write, args=(self.path, capture(vm, self.digest)))
+        self.writer.start()
+
+
+    def close(self) -> None:
+        # Wait for the last checkpoint to be written
+        if self.writer is not None:
+            self.writer.join()
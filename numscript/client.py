@@ -0,0 +1,109 @@
+# Thin client of the numscript serve daemon.
+# Only standard modules that are cheap to import are used, so that the client starts quickly,
+# which leaves out typing and argparse.
+import io
+import os
+import socket
+import struct
+import sys
+import threading
+
+
+# Frames sent by the server: a type, the length of the payload and the payload
+FRAME_HEADER = struct.Struct('!cI')
+OUTPUT = b'o'
+ERROR = b'e'
+STATUS = b's'
+
+
+def socket_path() -> str:
+    if 'NUMSCRIPT_SOCKET' in os.environ:
+        return os.environ['NUMSCRIPT_SOCKET']
+    directory = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(directory, f'numscript-{os.getuid()}.sock')
+
+
+def send_frame(connection: socket.socket, frame_type: bytes, payload: bytes) -> None:
+    connection.sendall(FRAME_HEADER.pack(frame_type, len(payload)) + payload)
+
+
+def read_frame(stream: io.BufferedReader) -> tuple[bytes, bytes] | None:
+    header = stream.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    frame_type, length = FRAME_HEADER.unpack(header)
+    return frame_type, stream.read(length)
+
+
+def forward_input(connection: socket.socket) -> None:
+    try:
+        while True:
+            # Read the file descriptor directly, the buffered stdin can't be left blocked at exit
+            chunk = os.read(sys.stdin.fileno(), 1 << 16)
+            if not chunk:
+                break
+            connection.sendall(chunk)
+        connection.shutdown(socket.SHUT_WR)
+    except OSError:
+        # The server closed the connection once the script finished
+        pass
+
+
+def usage() -> None:
+    print('usage: numscript-client [--socket PATH] [--engine ENGINE] [-O LEVEL] script', file=sys.stderr)
+    sys.exit(2)
+
+
+def main() -> None:
+    path = socket_path()
+    request = {'engine': 'decoded', 'optimize': None, 'script': None}
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        if arg in ('--socket', '--engine', '-O', '--optimize') and args:
+            value = args.pop(0)
+            if arg == '--socket':
+                path = value
+            elif arg == '--engine':
+                request['engine'] = value
+            else:
+                request['optimize'] = value
+        elif request['script'] is None and not arg.startswith('-'):
+            request['script'] = os.path.abspath(arg)
+        else:
+            usage()
+    if request['script'] is None:
+        usage()
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError as error:
+        print(f'Cannot connect to the numscript daemon on {path}: {error.strerror}', file=sys.stderr)
+        sys.exit(1)
+
+    # The request is a line of tab separated fields, followed by the input of the script
+    connection.sendall(f"{request['engine']}\t{request['optimize'] or ''}\t{request['script']}\n".encode())
+    threading.Thread(target=forward_input, args=(connection,), daemon=True).start()
+
+    stream = connection.makefile('rb')
+    stdout = sys.stdout.buffer
+    while True:
+        frame = read_frame(stream)
+        if frame is None:
+            print('The numscript daemon closed the connection', file=sys.stderr)
+            sys.exit(1)
+        frame_type, payload = frame
+        if frame_type == OUTPUT:
+            stdout.write(payload)
+            stdout.flush()
+        elif frame_type == ERROR:
+            print(payload.decode(), file=sys.stderr)
+            sys.exit(1)
+        elif frame_type == STATUS:
+            print(f'\nProgram finished with status code {int(payload)}')
+            sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
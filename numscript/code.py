@@ -1,5 +1,23 @@
+from __future__ import annotations
+from collections.abc import Sequence as SequenceABC
 from dataclasses import dataclass
-from typing import Tuple
+from enum import Enum
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+
+# A handler bound to its operator and variant, followed by its unpacked operands.
+# The VM executes an instruction as handler(vm, *operands).
+Instruction = Tuple[Callable[..., None], Tuple[Any, ...]]
+
+
+class Engine(Enum):
+
+    # Dispatch every statement through the operator match
+    MATCH = 'match'
+    # Execute the instruction stream produced by the decoder
+    DECODED = 'decoded'
+    # Execute basic blocks transpiled to Python functions
+    COMPILED = 'compiled'
 
 
 @dataclass
@@ -9,15 +27,46 @@ class Statement:
 
     def get(self, index: int) -> int:
         return self.tokens[index]
-    
+
     def get_from(self, index: int) -> Tuple[int]:
         return self.tokens[index:]
-    
+
     def length(self) -> int:
         return len(self.tokens)
 
 
+class StatementTable(SequenceABC):
+    """
+        Statements stored in flat buffers and only materialized when accessed.
+        The line number, token offset and token count of every statement are held in parallel arrays.
+    """
+
+    def __init__(self, tokens: Sequence[int], line_numbers: Sequence[int], offsets: Sequence[int], lengths: Sequence[int]) -> None:
+        self.tokens = tokens
+        self.line_numbers = line_numbers
+        self.offsets = offsets
+        self.lengths = lengths
+
+
+    def __len__(self) -> int:
+        return len(self.line_numbers)
+
+
+    def __getitem__(self, index: int) -> Statement:
+        offset = self.offsets[index]
+        return Statement(self.line_numbers[index], self.tokens[offset:offset + self.lengths[index]])
+
+
 @dataclass
 class Script:
-    statements: Tuple[Statement]
-
+    statements: Sequence[Statement]
+    # Maps label ids to program addresses, built before execution when missing
+    labels: Dict[int, int] | None = None
+    # Instructions decoded ahead of time, decoded before execution when missing
+    instructions: List[Instruction] | None = None
+    # Optimization level the instructions were rewritten with
+    optimization: int = 0
+    # Compiled basic blocks indexed by their start address, compiled before execution when missing
+    blocks: List[Callable[..., int] | None] | None = None
+    # Whether every statement was checked before execution, so the engines can skip the checks
+    verified: bool = False
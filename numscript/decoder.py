@@ -0,0 +1,665 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Sequence, Tuple, TYPE_CHECKING
+from numscript import arrays
+from numscript.code import Instruction, Script, Statement
+from numscript.errors import ErrorCode, Errors
+from numscript.op_codes import Operator
+from numscript.object import Object, Type as ObjectType, Value, make_array, represent
+
+if TYPE_CHECKING:
+    from numscript.vm import VM
+
+
+# Stack address of the scope every statement is executed in
+ROOT_SCOPE = 0
+
+
+# Handlers
+#
+# Identifier operands are resolved to flat stack slots by the decoder,
+# so handlers index VM.stack directly instead of searching the scopes.
+
+
+def symbol_not_found(vm: VM, slot: int) -> None:
+    Errors.symbol_not_found(slot, vm.current_statement())
+
+
+def load(vm: VM, slot: int) -> Value:
+    try:
+        return vm.stack[slot]
+    except IndexError:
+        symbol_not_found(vm, slot)
+
+
+def load_int(vm: VM, slot: int) -> int:
+    try:
+        value = vm.stack[slot]
+    except IndexError:
+        symbol_not_found(vm, slot)
+    if type(value) is not int:
+        Errors.invalid_object_type(value, ObjectType.INT, vm.current_statement())
+    return value
+
+
+def load_array(vm: VM, slot: int) -> Sequence[int]:
+    try:
+        value = vm.stack[slot]
+    except IndexError:
+        symbol_not_found(vm, slot)
+    if type(value) is int:
+        Errors.invalid_object_type(value, ObjectType.ARRAY, vm.current_statement())
+    return value.value
+
+
+def store(vm: VM, slot: int, obj: Value) -> None:
+    try:
+        vm.stack[slot] = obj
+    except IndexError:
+        symbol_not_found(vm, slot)
+
+
+def declare(vm: VM, slot: int, obj: Value) -> None:
+    # Check if the slot is already taken in the root scope
+    if len(vm.stack) > slot:
+        Errors.symbol_redeclaration(slot, vm.current_statement())
+    vm.stack.append(obj)
+
+
+def raise_error(vm: VM, error: Callable[..., None], args: Tuple[Any, ...]) -> None:
+    error(*args)
+
+
+def no_op(vm: VM) -> None:
+    pass
+
+
+def declare_local_int(vm: VM, dest: int, value: int) -> None:
+    declare(vm, dest, value)
+
+
+def declare_local_array(vm: VM, dest: int, array: Object) -> None:
+    declare(vm, dest, array)
+
+
+def declare_local_copy(vm: VM, dest: int, src: int) -> None:
+    declare(vm, dest, load(vm, src))
+
+
+def set_int(vm: VM, dest: int, value: int) -> None:
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+
+
+def set_array(vm: VM, dest: int, array: Object) -> None:
+    store(vm, dest, array)
+
+
+def set_copy(vm: VM, dest: int, src: int) -> None:
+    stack = vm.stack
+    try:
+        obj = stack[src]
+    except IndexError:
+        symbol_not_found(vm, src)
+    try:
+        stack[dest] = obj
+    except IndexError:
+        symbol_not_found(vm, dest)
+
+
+def call_depth_exceeded(vm: VM) -> None:
+    vm.call_depth_exceeded(vm.current_statement())
+
+
+def goto_address(vm: VM, address: int) -> None:
+    if len(vm.goto_stack) >= vm.max_call_depth:
+        call_depth_exceeded(vm)
+    # Save the current program counter for later
+    vm.goto_stack.append(vm.program_counter)
+    vm.program_counter = address
+
+
+def jump_to_address(vm: VM, address: int) -> None:
+    vm.program_counter = address
+
+
+def return_from_label(vm: VM) -> None:
+    try:
+        vm.program_counter = vm.goto_stack.pop()
+    except IndexError:
+        Errors.no_label_to_return_from(vm.current_statement())
+
+
+def exit_literal(vm: VM, exit_code: int) -> None:
+    vm.running = False
+    vm.status = exit_code
+
+
+def exit_identifier(vm: VM, exit_code: int) -> None:
+    vm.status = load_int(vm, exit_code)
+    vm.running = False
+
+
+def sleep_literal(vm: VM, sleep_ms: int) -> None:
+    vm.sleep(sleep_ms)
+
+
+def sleep_identifier(vm: VM, sleep_ms: int) -> None:
+    vm.sleep(load_int(vm, sleep_ms))
+
+
+def print_bytes(vm: VM, data: bytes) -> None:
+    vm.output.write(data)
+
+
+def print_array_literal(vm: VM, array: Object) -> None:
+    # Only reached when the literal has no string representation
+    vm.write_codes(array.value)
+
+
+def print_identifier(vm: VM, src: int) -> None:
+    vm.output.write_line(represent(load(vm, src)))
+
+
+def print_string_identifier(vm: VM, src: int) -> None:
+    obj = load(vm, src)
+    if type(obj) is int:
+        vm.write_codes((obj,))
+    elif obj.type == ObjectType.ARRAY:
+        vm.write_codes(obj.value)
+    else:
+        Errors.no_string_representation(obj, vm.current_statement())
+
+
+def access_literal_index_literal_array(vm: VM, index: int, dest: int, array: Sequence[int]) -> None:
+    value = vm.get_element(array, index)
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+
+
+def access_identifier_index_literal_array(vm: VM, index: int, dest: int, array: Sequence[int]) -> None:
+    value = vm.get_element(array, load_int(vm, index))
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+
+
+def access_literal_index_identifier_array(vm: VM, index: int, dest: int, array: int) -> None:
+    value = vm.get_element(load_array(vm, array), index)
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+
+
+def access_identifier_index_identifier_array(vm: VM, index: int, dest: int, array: int) -> None:
+    # The index is resolved before the array, like in the match engine
+    index = load_int(vm, index)
+    value = vm.get_element(load_array(vm, array), index)
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+
+
+def if_goto_identifier(vm: VM, condition: int, address: int) -> None:
+    if load_int(vm, condition):
+        if len(vm.goto_stack) >= vm.max_call_depth:
+            call_depth_exceeded(vm)
+        vm.goto_stack.append(vm.program_counter)
+        vm.program_counter = address
+
+
+def if_jump_identifier(vm: VM, condition: int, address: int) -> None:
+    if load_int(vm, condition):
+        vm.program_counter = address
+
+
+def load_operand(vm: VM, slot: int, length: int) -> int | Sequence[int]:
+    # Element-wise operand, an int or an array of the given length
+    value = load(vm, slot)
+    if type(value) is int:
+        return value
+    if len(value.value) != length:
+        Errors.array_length_mismatch(length, len(value.value), vm.current_statement())
+    return value.value
+
+
+def store_array(vm: VM, dest: int, values: Sequence[int]) -> None:
+    store(vm, dest, Object(values, ObjectType.ARRAY))
+
+
+def array_slice(vm: VM, dest: int, array: int, start: int, end: int) -> None:
+    store_array(vm, dest, arrays.slice_elements(load_array(vm, array), load_int(vm, start), load_int(vm, end)))
+
+
+def array_concatenate(vm: VM, dest: int, first: int, second: int) -> None:
+    first_values = load_array(vm, first)
+    second_values = load_array(vm, second)
+    vm.check_array_length(len(first_values) + len(second_values))
+    store_array(vm, dest, arrays.concatenate(first_values, second_values))
+
+
+def array_fill(vm: VM, dest: int, value: int, length: int) -> None:
+    count = load_int(vm, length)
+    vm.check_array_length(count)
+    store_array(vm, dest, arrays.fill(load_int(vm, value), count))
+
+
+def array_add(vm: VM, dest: int, array: int, operand: int) -> None:
+    values = load_array(vm, array)
+    store_array(vm, dest, arrays.add(values, load_operand(vm, operand, len(values))))
+
+
+def array_subtract(vm: VM, dest: int, array: int, operand: int) -> None:
+    values = load_array(vm, array)
+    store_array(vm, dest, arrays.subtract(values, load_operand(vm, operand, len(values))))
+
+
+def array_multiply(vm: VM, dest: int, array: int, operand: int) -> None:
+    values = load_array(vm, array)
+    store_array(vm, dest, arrays.multiply(values, load_operand(vm, operand, len(values))))
+
+
+def array_sum(vm: VM, dest: int, array: int) -> None:
+    store(vm, dest, arrays.total(load_array(vm, array)))
+
+
+def array_compare(vm: VM, dest: int, array: int, operand: int) -> None:
+    values = load_array(vm, array)
+    store_array(vm, dest, arrays.compare(values, load_operand(vm, operand, len(values))))
+
+
+def array_find(vm: VM, dest: int, array: int, value: int) -> None:
+    store(vm, dest, arrays.find(load_array(vm, array), load_int(vm, value)))
+
+
+def input_int(vm: VM, dest: int) -> None:
+    vm.output.before_input()
+    try:
+        store(vm, dest, vm.input.read_int())
+    except (ValueError, TypeError):
+        vm.status = ErrorCode.INVALID_INPUT
+    except EOFError:
+        vm.status = ErrorCode.EOF
+
+
+def input_array(vm: VM, dest: int) -> None:
+    vm.output.before_input()
+    try:
+        store(vm, dest, vm.input.read_array())
+    except (ValueError, TypeError):
+        vm.status = ErrorCode.INVALID_INPUT
+    except EOFError:
+        vm.status = ErrorCode.EOF
+
+
+def input_char(vm: VM, dest: int) -> None:
+    vm.output.before_input()
+    try:
+        store(vm, dest, vm.input.read_char())
+    except (ValueError, TypeError):
+        vm.status = ErrorCode.INVALID_INPUT
+    except EOFError:
+        vm.status = ErrorCode.EOF
+
+
+def input_string(vm: VM, dest: int) -> None:
+    vm.output.before_input()
+    try:
+        store(vm, dest, vm.input.read_string())
+    except (ValueError, TypeError):
+        vm.status = ErrorCode.INVALID_INPUT
+    except EOFError:
+        vm.status = ErrorCode.EOF
+
+
+# Decoders
+
+
+def resolve_slot(identifier: int) -> int:
+    # No operator opens a new scope, so every statement runs in the root scope
+    # and each identifier is a fixed offset from its start
+    return ROOT_SCOPE + identifier
+
+
+def deferred_error(error: Callable[..., None], *args: Any) -> Instruction:
+    """
+        Postpone an error found while decoding until the statement is executed,
+        so that invalid statements that are never reached behave like in the match engine.
+    """
+    return (raise_error, (error, args))
+
+
+def minimum_arg_number_error(statement: Statement, expected: int) -> Instruction | None:
+    if statement.length() < expected + 1:
+        return deferred_error(Errors.not_enough_arguments, statement.get(0), statement, expected, statement.length() - 1)
+    return None
+
+
+def exact_arg_number_error(statement: Statement, expected: int) -> Instruction | None:
+    if statement.length() != expected + 1:
+        return deferred_error(Errors.invalid_op_arg_number, statement.get(0), statement, expected, statement.length() - 1)
+    return None
+
+
+def variant_error(statement: Statement) -> Instruction:
+    return deferred_error(Errors.invalid_op_code_variant, statement.get(0), statement.get(1), statement)
+
+
+def decode_text(array: Sequence[int]) -> Instruction:
+    # Encode the output once, unless it has no valid representation,
+    # in which case the error is raised at runtime
+    try:
+        return (print_bytes, ((''.join(map(chr, array)) + '\n').encode(),))
+    except (ValueError, OverflowError):
+        return (print_array_literal, (Object.from_array(array),))
+
+
+def decode_declare_local(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        0 0 [local identifier] [literal int]
+        0 1 [local identifier] [array]
+        0 2 [local identifier] [identifier]
+    """
+    error = minimum_arg_number_error(statement, 3)
+    if error is not None:
+        return error
+
+    dest = resolve_slot(statement.get(2))
+    match statement.get(1):
+        case 0:
+            return exact_arg_number_error(statement, 3) or (declare_local_int, (dest, statement.get(3)))
+        case 1:
+            return (declare_local_array, (dest, Object.from_array(statement.get_from(3))))
+        case 2:
+            return exact_arg_number_error(statement, 3) or (declare_local_copy, (dest, resolve_slot(statement.get(3))))
+        case _:
+            return variant_error(statement)
+
+
+def decode_set(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        1 0 [identifier] [literal int]
+        1 1 [identifier] [array]
+        1 2 [identifier] [identifier]
+    """
+    error = minimum_arg_number_error(statement, 3)
+    if error is not None:
+        return error
+
+    dest = resolve_slot(statement.get(2))
+    match statement.get(1):
+        case 0:
+            return exact_arg_number_error(statement, 3) or (set_int, (dest, statement.get(3)))
+        case 1:
+            return (set_array, (dest, Object.from_array(statement.get_from(3))))
+        case 2:
+            return exact_arg_number_error(statement, 3) or (set_copy, (dest, resolve_slot(statement.get(3))))
+        case _:
+            return variant_error(statement)
+
+
+def decode_declare_label(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        2 [label identifier]
+    """
+    # Labels are resolved before execution
+    return exact_arg_number_error(statement, 1) or (no_op, ())
+
+
+def decode_goto_label(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        3 [label identifier]
+    """
+    return exact_arg_number_error(statement, 1) or (goto_address, (labels[statement.get(1)],))
+
+
+def decode_return_from_label(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        4
+    """
+    return exact_arg_number_error(statement, 0) or (return_from_label, ())
+
+
+def decode_exit(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        5 0 [literal int]
+        5 1 [identifier]
+    """
+    error = exact_arg_number_error(statement, 2)
+    if error is not None:
+        return error
+
+    match statement.get(1):
+        case 0:
+            return (exit_literal, (statement.get(2),))
+        case 1:
+            return (exit_identifier, (resolve_slot(statement.get(2)),))
+        case _:
+            return variant_error(statement)
+
+
+def decode_no_op(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        6
+    """
+    return exact_arg_number_error(statement, 0) or (no_op, ())
+
+
+def decode_sleep_ms(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        7 0 [literal int]
+        7 1 [identifier]
+    """
+    error = exact_arg_number_error(statement, 2)
+    if error is not None:
+        return error
+
+    match statement.get(1):
+        case 0:
+            return (sleep_literal, (statement.get(2),))
+        case 1:
+            return (sleep_identifier, (resolve_slot(statement.get(2)),))
+        case _:
+            return variant_error(statement)
+
+
+def decode_print(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        8 0 [literal int]
+        8 1 [array]
+        8 2 [identifier]
+    """
+    error = minimum_arg_number_error(statement, 2)
+    if error is not None:
+        return error
+
+    match statement.get(1):
+        case 0:
+            return exact_arg_number_error(statement, 2) or (print_bytes, (f'{statement.get(2)}\n'.encode(),))
+        case 1:
+            return decode_text(statement.get_from(2))
+        case 2:
+            return exact_arg_number_error(statement, 2) or (print_identifier, (resolve_slot(statement.get(2)),))
+        case _:
+            return variant_error(statement)
+
+
+def decode_print_string(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        9 0 [int literal]
+        9 1 [array literal]
+        9 2 [identifier]
+    """
+    error = minimum_arg_number_error(statement, 2)
+    if error is not None:
+        return error
+
+    match statement.get(1):
+        case 0:
+            return exact_arg_number_error(statement, 2) or decode_text(statement.get_from(2))
+        case 1:
+            return decode_text(statement.get_from(2))
+        case 2:
+            return exact_arg_number_error(statement, 2) or (print_string_identifier, (resolve_slot(statement.get(2)),))
+        case _:
+            return variant_error(statement)
+
+
+def decode_access_index(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        10 0 [literal int index] [save address] [literal array]
+        10 1 [identifier index] [save address] [literal array]
+        10 2 [literal int index] [save address] [identifier array]
+        10 3 [identifier index] [save address] [identifier array]
+    """
+    error = minimum_arg_number_error(statement, 4)
+    if error is not None:
+        return error
+
+    index = statement.get(2)
+    dest = resolve_slot(statement.get(3))
+    match statement.get(1):
+        case 0:
+            return (access_literal_index_literal_array, (index, dest, make_array(statement.get_from(4))))
+        case 1:
+            return (access_identifier_index_literal_array, (resolve_slot(index), dest, make_array(statement.get_from(4))))
+        case 2:
+            return exact_arg_number_error(statement, 4) or (access_literal_index_identifier_array, (index, dest, resolve_slot(statement.get(4))))
+        case 3:
+            return exact_arg_number_error(statement, 4) or (access_identifier_index_identifier_array, (resolve_slot(index), dest, resolve_slot(statement.get(4))))
+        case _:
+            return variant_error(statement)
+
+
+def decode_if_jump(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        11 0 [literal condition] [label]
+        11 1 [identifier condition] [label]
+        11 2 [literal condition] [stop label]
+        11 3 [identifier condition] [stop label]
+    """
+    error = exact_arg_number_error(statement, 3)
+    if error is not None:
+        return error
+
+    condition = statement.get(2)
+    address = labels[statement.get(3)]
+    match statement.get(1):
+        case 0:
+            # The condition is known at load time
+            return (goto_address, (address,)) if condition else (no_op, ())
+        case 1:
+            return (if_goto_identifier, (resolve_slot(condition), address))
+        case 2:
+            return (jump_to_address, (address,)) if condition else (no_op, ())
+        case 3:
+            return (if_jump_identifier, (resolve_slot(condition), address))
+        case _:
+            return variant_error(statement)
+
+
+def decode_input(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        12 0 [save address] # input int
+        12 1 [save address] # input array
+        12 2 [save address] # input char as int
+        12 3 [save address] # input string as array
+    """
+    error = exact_arg_number_error(statement, 2)
+    if error is not None:
+        return error
+
+    dest = resolve_slot(statement.get(2))
+    match statement.get(1):
+        case 0:
+            return (input_int, (dest,))
+        case 1:
+            return (input_array, (dest,))
+        case 2:
+            return (input_char, (dest,))
+        case 3:
+            return (input_string, (dest,))
+        case _:
+            return variant_error(statement)
+
+
+# Handlers of the array operation variants taking exactly three identifiers
+ARRAY_OPERATIONS: Dict[int, Callable[..., None]] = {
+    1: array_concatenate,
+    2: array_fill,
+    3: array_add,
+    4: array_subtract,
+    5: array_multiply,
+    7: array_compare,
+    8: array_find,
+}
+
+
+def decode_array_operation(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    """
+        13 0 [save address] [identifier array] [identifier start] [identifier end] # slice
+        13 1 [save address] [identifier array] [identifier array] # concatenate
+        13 2 [save address] [identifier value] [identifier length] # fill
+        13 3 [save address] [identifier array] [identifier operand] # add
+        13 4 [save address] [identifier array] [identifier operand] # subtract
+        13 5 [save address] [identifier array] [identifier operand] # multiply
+        13 6 [save address] [identifier array] # sum
+        13 7 [save address] [identifier array] [identifier operand] # compare
+        13 8 [save address] [identifier array] [identifier value] # find
+    """
+    error = minimum_arg_number_error(statement, 3)
+    if error is not None:
+        return error
+
+    variant = statement.get(1)
+    slots = tuple(map(resolve_slot, statement.get_from(2)))
+    match variant:
+        case 0:
+            return exact_arg_number_error(statement, 5) or (array_slice, slots)
+        case 6:
+            return exact_arg_number_error(statement, 3) or (array_sum, slots)
+        case _ if variant in ARRAY_OPERATIONS:
+            return exact_arg_number_error(statement, 4) or (ARRAY_OPERATIONS[variant], slots)
+        case _:
+            return variant_error(statement)
+
+
+# Maps every operator to the function that decodes its statements
+DECODERS: Dict[Operator, Callable[[Statement, Dict[int, int]], Instruction]] = {
+    Operator.DECALRE_LOCAL: decode_declare_local,
+    Operator.SET: decode_set,
+    Operator.DECLARE_LABEL: decode_declare_label,
+    Operator.GOTO_LABEL: decode_goto_label,
+    Operator.RETURN_FROM_LABEL: decode_return_from_label,
+    Operator.EXIT: decode_exit,
+    Operator.NO_OP: decode_no_op,
+    Operator.SLEEP_MS: decode_sleep_ms,
+    Operator.PRINT: decode_print,
+    Operator.PRINT_STRING: decode_print_string,
+    Operator.ACCESS_INDEX: decode_access_index,
+    Operator.IF_JUMP: decode_if_jump,
+    Operator.INPUT: decode_input,
+    Operator.ARRAY_OPERATION: decode_array_operation,
+}
+
+
+def decode_statement(statement: Statement, labels: Dict[int, int]) -> Instruction:
+    if statement.length() == 0:
+        return (no_op, ())
+
+    main_op = statement.get(0)
+    decoder = DECODERS.get(main_op)
+    if decoder is None:
+        return deferred_error(Errors.invalid_op_code, main_op, statement)
+
+    return decoder(statement, labels)
+
+
+def decode(script: Script, labels: Dict[int, int]) -> List[Instruction]:
+    return [decode_statement(statement, labels) for statement in script.statements]
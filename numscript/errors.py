@@ -1,9 +1,8 @@
 from enum import IntEnum
-from typing import Any
+from typing import List, Tuple
 from numscript.object import Object, Type as ObjectType
 from numscript.op_codes import Operator
 from numscript.code import Statement
-from sys import stderr
 
 
 class ErrorCode(IntEnum):
@@ -11,14 +10,30 @@ class ErrorCode(IntEnum):
     NO_ERROR = 0
     INVALID_INPUT = 1
     EOF = 2
+    # A limit of the run was exceeded
+    STATEMENT_LIMIT = 3
+    MEMORY_LIMIT = 4
+    OUTPUT_LIMIT = 5
+    TIME_LIMIT = 6
+    CALL_DEPTH_LIMIT = 7
+
+
+class ScriptError(Exception):
+    """
+        Raised when a script is invalid or fails, with the line it failed on if any.
+    """
+
+    def __init__(self, message: str, line_number: int | None = None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.line_number = line_number
 
 
 class Errors:
 
     @staticmethod
-    def error(*args: Any) -> None:
-        print(*args, file=stderr)
-        exit(1)
+    def error(message: str, line_number: int | None = None) -> None:
+        raise ScriptError(message, line_number)
 
     
     @staticmethod
@@ -26,77 +41,146 @@ class Errors:
         Errors.error(f"""
 Invalid argument number for operation {operator} on line {statement.line_number}.
 Expected at least {expected} arguments, got {got}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
 
     @staticmethod
     def invalid_op_arg_number(operator: Operator, statement: Statement, expected: int, got: int) -> None:
         Errors.error(f"""
 Invalid argument number for operation {operator} on line {statement.line_number}.
 Expected {expected} arguments, got {got}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
 
     @staticmethod
     def invalid_op_code(operator: Operator, statement: Statement) -> None:
         Errors.error(f"""
 Invalid operation code {operator} on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
     
     @staticmethod
     def symbol_redeclaration(identifier: int, statement: Statement) -> None:
         Errors.error(f"""
 Symbol {identifier} redeclared on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
     
     @staticmethod
     def invalid_op_code_variant(operator: Operator, variant: int, statement: Statement) -> None:
         Errors.error(f"""
 Invalid operation code variation {variant} for operator {operator} on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
 
     @staticmethod
     def label_not_found(label: int, statement: Statement) -> None:
         Errors.error(f"""
 Label {label} not found on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def label_redeclaration(label: int, statement: Statement) -> None:
+        Errors.error(f"""
+Label {label} redeclared on line {statement.line_number}:
+{list(statement.tokens)}
+        """, statement.line_number)
     
     @staticmethod
     def no_label_to_return_from(statement: Statement) -> None:
         Errors.error(f"""
 No label to return from on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
     
     @staticmethod
     def no_string_representation(object: Object, statement: Statement) -> None:
         Errors.error(f"""
 No string representation for object {object} on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
     
     @staticmethod
     def invalid_object_type(object: Object, expected_type: ObjectType, statement: Statement) -> None:
         Errors.error(f"""
 Invalid index type for object {object} (expected {expected_type}) on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
     
     @staticmethod
     def symbol_not_found(identifier: int, statement: Statement) -> None:
         Errors.error(f"""
 Symbol {identifier} not found on line {statement.line_number}:
-{statement.tokens}
-        """)
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def call_depth_exceeded(depth: int, statement: Statement) -> None:
+        Errors.error(f"""
+Call depth limit of {depth} exceeded on line {statement.line_number}, labels are jumped to without returning:
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def index_out_of_range(index: int, length: int, statement: Statement) -> None:
+        Errors.error(f"""
+Index {index} out of range for an array of length {length} on line {statement.line_number}:
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def invalid_sleep_length(length: int, statement: Statement) -> None:
+        Errors.error(f"""
+Invalid sleep length of {length} ms on line {statement.line_number}:
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def invalid_code_point(code: int, statement: Statement) -> None:
+        Errors.error(f"""
+Invalid character code {code} on line {statement.line_number}:
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def array_length_mismatch(left: int, right: int, statement: Statement) -> None:
+        Errors.error(f"""
+Arrays of different lengths {left} and {right} on line {statement.line_number}:
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def negative_array_length(length: int, statement: Statement) -> None:
+        Errors.error(f"""
+Negative array length {length} on line {statement.line_number}:
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def array_too_long(length: int, statement: Statement) -> None:
+        Errors.error(f"""
+Array length {length} too large on line {statement.line_number}:
+{list(statement.tokens)}
+        """, statement.line_number)
+    
+    @staticmethod
+    def invalid_program(problems: List[Tuple[Statement, str]]) -> None:
+        report = '\n'.join(f'Line {statement.line_number}: {message}:\n{list(statement.tokens)}' for statement, message in problems)
+        Errors.error(f"""
+Found {len(problems)} invalid statements:
+{report}
+        """, problems[0][0].line_number)
     
     @staticmethod
     def invalid_token(token: str, statement: str, line_number: int) -> None:
         Errors.error(f"""
 Invalid token '{token}' on line {line_number}:
 {statement}
+        """, line_number)
+    
+    @staticmethod
+    def invalid_checkpoint(path: str, reason: str) -> None:
+        Errors.error(f"""
+Cannot resume from checkpoint {path}: {reason}
         """)
-
@@ -0,0 +1,132 @@
+from typing import Callable, List, Set
+from numscript import decoder
+from numscript.code import Instruction
+
+
+# Handlers after which execution continues at the next address, and nowhere else
+SEQUENTIAL = {
+    decoder.no_op,
+    decoder.declare_local_int,
+    decoder.declare_local_array,
+    decoder.declare_local_copy,
+    decoder.set_int,
+    decoder.set_array,
+    decoder.set_copy,
+    decoder.sleep_literal,
+    decoder.sleep_identifier,
+    decoder.print_bytes,
+    decoder.print_array_literal,
+    decoder.print_identifier,
+    decoder.print_string_identifier,
+    decoder.access_literal_index_literal_array,
+    decoder.access_identifier_index_literal_array,
+    decoder.access_literal_index_identifier_array,
+    decoder.access_identifier_index_identifier_array,
+    decoder.input_int,
+    decoder.input_array,
+    decoder.input_char,
+    decoder.input_string,
+    decoder.array_slice,
+    decoder.array_concatenate,
+    decoder.array_fill,
+    decoder.array_add,
+    decoder.array_subtract,
+    decoder.array_multiply,
+    decoder.array_sum,
+    decoder.array_compare,
+    decoder.array_find,
+}
+
+# Handlers that only move the program counter
+JUMPS = {
+    decoder.goto_address,
+    decoder.jump_to_address,
+    decoder.if_goto_identifier,
+    decoder.if_jump_identifier,
+}
+
+# Handlers that stop execution
+TERMINAL = {
+    decoder.exit_literal,
+    decoder.exit_identifier,
+    decoder.raise_error,
+}
+
+
+def successors(address: int, instruction: Instruction) -> List[int]:
+    """
+        Addresses executed next in the same frame, without following gotos, which run in a new frame.
+    """
+    handler, operands = instruction
+    if handler in SEQUENTIAL:
+        return [address + 1]
+    if handler is decoder.jump_to_address:
+        return [operands[0]]
+    if handler is decoder.if_jump_identifier:
+        return [operands[1], address + 1]
+    if handler is decoder.if_goto_identifier:
+        # When the goto is taken, execution only comes back to the next address if the label returns
+        return [address + 1]
+    return []
+
+
+def may_return(handler: Callable[..., None]) -> bool:
+    # Handlers that aren't known may pop the goto stack
+    return handler is decoder.return_from_label or (
+        handler not in SEQUENTIAL and handler not in TERMINAL and handler not in JUMPS
+    )
+
+
+def returning(instructions: List[Instruction]) -> Set[int]:
+    """
+        Return the addresses from which a return from label can pop the frame they are executed in.
+        Execution continues after a goto only if its label returns, so the set is built as a fixpoint.
+    """
+    predecessors: List[List[int]] = [[] for _ in range(len(instructions) + 1)]
+    # Gotos by target address
+    callers: List[List[int]] = [[] for _ in range(len(instructions) + 1)]
+    pending: List[int] = []
+    for address, instruction in enumerate(instructions):
+        handler, operands = instruction
+        if may_return(handler):
+            pending.append(address)
+        elif handler is decoder.goto_address and 0 <= operands[0] < len(instructions):
+            callers[operands[0]].append(address)
+        for successor in successors(address, instruction):
+            if 0 <= successor < len(instructions):
+                predecessors[successor].append(address)
+
+    reaching = set(pending)
+
+    def add(address: int) -> None:
+        if address not in reaching:
+            reaching.add(address)
+            pending.append(address)
+
+    while pending:
+        address = pending.pop()
+        for predecessor in predecessors[address]:
+            add(predecessor)
+        # A goto right before this address returns here if its label returns
+        previous = address - 1
+        if previous >= 0 and instructions[previous][0] is decoder.goto_address and instructions[previous][1][0] in reaching:
+            add(previous)
+        # Gotos to this address, which now returns, continue at their next address
+        for caller in callers[address]:
+            if caller + 1 in reaching:
+                add(caller)
+    return reaching
+
+
+def find_jumps(instructions: List[Instruction]) -> List[int]:
+    """
+        Return the addresses of the gotos whose label never returns, so their return address would never be popped.
+    """
+    reaching = returning(instructions)
+    jumps: List[int] = []
+    for address, (handler, operands) in enumerate(instructions):
+        if handler is decoder.goto_address and operands[0] not in reaching:
+            jumps.append(address)
+        elif handler is decoder.if_goto_identifier and operands[1] not in reaching:
+            jumps.append(address)
+    return jumps
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from dataclasses import dataclass
+import time
+from typing import List, Sequence, TYPE_CHECKING
+from numscript.errors import ErrorCode
+
+if TYPE_CHECKING:
+    from numscript.vm import VM
+
+
+# Statements executed between two checks of the limits
+DEFAULT_CHECK_INTERVAL = 10000
+
+
+@dataclass
+class Limits:
+    # Statements executed
+    max_statements: int | None = None
+    # Slots of the VM stack
+    max_stack_slots: int | None = None
+    # Elements of the arrays held on the VM stack
+    max_array_elements: int | None = None
+    # Bytes of output written
+    max_output_bytes: int | None = None
+    # Wall-clock seconds, sleeps included
+    max_time: float | None = None
+    # Return addresses kept by gotos
+    max_call_depth: int | None = None
+    check_interval: int = DEFAULT_CHECK_INTERVAL
+
+    def __post_init__(self) -> None:
+        # Runs would never get past an empty slice
+        if self.check_interval < 1:
+            raise ValueError(f'The limit check interval must be at least 1, not {self.check_interval}')
+
+
+class LimitExceeded(Exception):
+    """
+        Raised when a run exceeds one of its limits, which stops it with the given status.
+    """
+
+    def __init__(self, status: ErrorCode) -> None:
+        super().__init__(status.name)
+        self.status = status
+
+
+def block_lengths(blocks: Sequence[object | None], counts: Sequence[int]) -> List[int]:
+    """
+        Return the number of statements executed by the block starting at every address,
+        from the number of statements executed by every instruction. Blocks always run to their end.
+    """
+    lengths = [0] * len(blocks)
+    executed = 0
+    for address in range(len(blocks) - 1, -1, -1):
+        executed += counts[address]
+        if blocks[address] is not None:
+            lengths[address] = executed
+            executed = 0
+    return lengths
+
+
+class Governor:
+    """
+        Enforces the limits of a run. Only the statement count is tracked on the fast path,
+        the other limits are checked every check_interval statements and before sleeping.
+    """
+
+    def __init__(self, limits: Limits) -> None:
+        self.limits = limits
+        self.executed = 0
+        self.deadline = time.monotonic() + limits.max_time if limits.max_time is not None else None
+
+
+    def next_slice(self) -> int:
+        """
+            Return the number of statements to execute before the next check.
+        """
+        if self.limits.max_statements is None:
+            return self.limits.check_interval
+        return max(0, min(self.limits.check_interval, self.limits.max_statements - self.executed))
+
+
+    def check(self, vm: VM, executed: int) -> None:
+        self.executed += executed
+        limits = self.limits
+        # The limits of a finished run are not checked, but a run stopped to sleep is resumed after the sleep
+        if not vm.running and vm.pending_sleep is None:
+            return
+        if limits.max_statements is not None and self.executed >= limits.max_statements:
+            raise LimitExceeded(ErrorCode.STATEMENT_LIMIT)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise LimitExceeded(ErrorCode.TIME_LIMIT)
+        if limits.max_stack_slots is not None and len(vm.stack) > limits.max_stack_slots:
+            raise LimitExceeded(ErrorCode.MEMORY_LIMIT)
+        if limits.max_array_elements is not None:
+            # Arrays shared by several slots are counted once per slot
+            elements = sum(len(value.value) for value in vm.stack if type(value) is not int)
+            if elements > limits.max_array_elements:
+                raise LimitExceeded(ErrorCode.MEMORY_LIMIT)
+        if limits.max_output_bytes is not None and vm.output.size() > limits.max_output_bytes:
+            raise LimitExceeded(ErrorCode.OUTPUT_LIMIT)
+
+
+    def before_allocation(self, length: int) -> None:
+        # Checked before the array is created, since a single statement can allocate any number of elements
+        if self.limits.max_array_elements is not None and length > self.limits.max_array_elements:
+            raise LimitExceeded(ErrorCode.MEMORY_LIMIT)
+
+
+    def before_sleep(self, sleep_ms: int) -> None:
+        # Don't wait for a sleep that would end after the deadline
+        if self.deadline is not None and time.monotonic() + sleep_ms / 1000 > self.deadline:
+            raise LimitExceeded(ErrorCode.TIME_LIMIT)
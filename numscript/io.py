@@ -1,6 +1,267 @@
+from __future__ import annotations
+import asyncio
+from enum import IntFlag
+from mmap import mmap, ACCESS_READ
+from typing import BinaryIO, Sequence
+from numscript.object import Object
+
+
+# Bytes of output held in memory before being written to the stream
+DEFAULT_OUTPUT_BUFFER_SIZE = 1 << 16
+# Bytes of input read from the stream at once
+DEFAULT_INPUT_CHUNK_SIZE = 1 << 16
 
 
 def load_file(file_path: str) -> str:
     with open(file_path, 'r') as f:
         return f.read()
 
+
+def load_file_bytes(file_path: str) -> bytes:
+    # Scripts and input are read as bytes, without decoding them
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def map_file(file_path: str) -> mmap | bytes:
+    with open(file_path, 'rb') as f:
+        try:
+            return mmap(f.fileno(), 0, access=ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return b''
+
+
+class FlushPoint(IntFlag):
+
+    # When the program finishes
+    EXIT = 1
+    # Before reading input
+    INPUT = 2
+    # When the buffer reaches its size threshold
+    SIZE = 4
+    # Before sleeping
+    SLEEP = 8
+
+    ALL = EXIT | INPUT | SIZE | SLEEP
+
+
+class OutputSink:
+
+    def __init__(self, stream: BinaryIO, buffer_size: int = DEFAULT_OUTPUT_BUFFER_SIZE, flush_points: FlushPoint = FlushPoint.ALL) -> None:
+        self.stream = stream
+        self.buffer = bytearray()
+        self.buffer_size = buffer_size
+        # Bytes already written to the stream
+        self.flushed = 0
+        self.flush_points = flush_points
+        # Flag operations are slow, so they are resolved once
+        self.flush_on_exit = bool(flush_points & FlushPoint.EXIT)
+        self.flush_on_input = bool(flush_points & FlushPoint.INPUT)
+        self.flush_on_size = bool(flush_points & FlushPoint.SIZE)
+        self.flush_on_sleep = bool(flush_points & FlushPoint.SLEEP)
+
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        if self.flush_on_size and len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+
+    def write_line(self, text: str) -> None:
+        self.write((text + '\n').encode())
+
+
+    def write_codes(self, codes: Sequence[int]) -> None:
+        """
+            Write the characters with the given code points, followed by a newline.
+        """
+        try:
+            # Iterate instead of passing the buffer, which would copy its raw memory
+            data = bytes(iter(codes))
+        except ValueError:
+            data = None
+
+        if data is not None and data.isascii():
+            self.buffer += data
+            self.write(b'\n')
+        else:
+            self.write_line(''.join(map(chr, codes)))
+
+
+    def before_input(self) -> None:
+        if self.flush_on_input:
+            self.flush()
+
+
+    def before_sleep(self) -> None:
+        if self.flush_on_sleep:
+            self.flush()
+
+
+    def at_exit(self) -> None:
+        if self.flush_on_exit:
+            self.flush()
+
+
+    def size(self) -> int:
+        # Bytes of output written so far, buffered or not
+        return self.flushed + len(self.buffer)
+
+
+    def flush(self) -> None:
+        if self.buffer:
+            self.stream.write(self.buffer)
+            self.flushed += len(self.buffer)
+            self.buffer.clear()
+        self.stream.flush()
+
+
+class InputPending(Exception):
+    """
+        Raised by asynchronous input sources when a line isn't available yet.
+    """
+
+
+class InputSource:
+
+    def __init__(self, stream: BinaryIO | None, chunk_size: int = DEFAULT_INPUT_CHUNK_SIZE, data: bytearray | mmap | None = None) -> None:
+        # When there is no stream, all the input is already in data
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.data = data if data is not None else bytearray()
+        self.position = 0
+        # Bytes consumed and dropped from the start of data
+        self.offset = 0
+        # Stream every line read is copied to, so that the session can be replayed
+        self.log: BinaryIO | None = None
+
+
+    @staticmethod
+    def from_file(file_path: str, memory_map: bool = False, chunk_size: int = DEFAULT_INPUT_CHUNK_SIZE) -> InputSource:
+        if memory_map:
+            with open(file_path, 'rb') as f:
+                try:
+                    return InputSource(None, data=mmap(f.fileno(), 0, access=ACCESS_READ))
+                except ValueError:
+                    # Empty files cannot be mapped
+                    return InputSource(None)
+        return InputSource(open(file_path, 'rb'), chunk_size)
+
+
+    def read_chunk(self) -> bool:
+        if self.stream is None:
+            return False
+        # Don't wait for a whole chunk when reading from a terminal or a pipe
+        read = getattr(self.stream, 'read1', self.stream.read)
+        chunk = read(self.chunk_size)
+        if not chunk:
+            self.stream = None
+            return False
+        # Drop the lines already consumed and append the new chunk
+        del self.data[:self.position]
+        self.data += chunk
+        self.offset += self.position
+        self.position = 0
+        return True
+
+
+    def release(self) -> None:
+        # Free the consumed input, a memory map is left to the OS
+        if type(self.data) is bytearray:
+            self.data.clear()
+            self.offset += self.position
+            self.position = 0
+        else:
+            self.position = len(self.data)
+
+
+    def consumed(self) -> int:
+        # Bytes of input read so far
+        return self.offset + self.position
+
+
+    def skip(self, count: int) -> None:
+        """
+            Discard the given number of bytes, which were read by a previous run.
+        """
+        while count > 0:
+            if self.position >= len(self.data) and not self.read_chunk():
+                return
+            step = min(count, len(self.data) - self.position)
+            self.position += step
+            count -= step
+
+
+    def read_line(self) -> bytes:
+        """
+            Return the next line without its line terminator.
+            Raise EOFError if there is no more input.
+        """
+        searched = 0
+        while True:
+            end = self.data.find(b'\n', self.position + searched)
+            if end != -1:
+                break
+            # Only search the new chunk on the next iteration
+            searched = len(self.data) - self.position
+            if not self.read_chunk():
+                # The last line may not be terminated
+                if searched == 0:
+                    raise EOFError
+                end = len(self.data)
+                break
+
+        line = self.data[self.position:end]
+        self.position = end + 1
+        if self.position >= len(self.data):
+            self.release()
+        if line.endswith(b'\r'):
+            line = line[:-1]
+        if self.log is not None:
+            self.log.write(line + b'\n')
+        return line
+
+
+    def read_int(self) -> int:
+        return int(self.read_line())
+
+
+    def read_array(self) -> Object:
+        return Object.from_tokens(self.read_line().split(b' '))
+
+
+    def read_char(self) -> int:
+        return ord(self.read_line().decode())
+
+
+    def read_string(self) -> Object:
+        return Object.from_string(self.read_line().decode())
+
+
+class AsyncInputSource(InputSource):
+    """
+        Input read from an asyncio stream. Reads that would block raise InputPending instead,
+        and the VM retries the statement after awaiting fill().
+    """
+
+    def __init__(self, reader: asyncio.StreamReader | None, chunk_size: int = DEFAULT_INPUT_CHUNK_SIZE, data: bytearray | None = None) -> None:
+        super().__init__(None, chunk_size, data)
+        self.reader = reader
+
+
+    def read_chunk(self) -> bool:
+        if self.reader is None:
+            return False
+        raise InputPending
+
+
+    async def fill(self) -> None:
+        chunk = await self.reader.read(self.chunk_size)
+        if not chunk:
+            self.reader = None
+            return
+        del self.data[:self.position]
+        self.data += chunk
+        self.offset += self.position
+        self.position = 0
@@ -0,0 +1,55 @@
+from typing import Dict
+from numscript.code import Script, Statement
+from numscript.errors import Errors
+from numscript.op_codes import Operator
+
+
+def declared_label(statement: Statement) -> int | None:
+    if statement.length() == 2 and statement.get(0) == Operator.DECLARE_LABEL:
+        return statement.get(1)
+    return None
+
+
+def referenced_label(statement: Statement) -> int | None:
+    if statement.length() == 2 and statement.get(0) == Operator.GOTO_LABEL:
+        return statement.get(1)
+    if statement.length() == 4 and statement.get(0) == Operator.IF_JUMP:
+        return statement.get(3)
+    return None
+
+
+def unresolved_label(labels: Dict[int, int], address: int, statement: Statement) -> int | None:
+    """
+        Return the label referenced by the statement at the address if it can't be resolved, None otherwise.
+    """
+    label_id = referenced_label(statement)
+    if label_id is None:
+        return None
+    if label_id not in labels:
+        return label_id
+    # Stop labels of if-jump variants 2 and 3 must be declared after the jump
+    if statement.get(0) == Operator.IF_JUMP and statement.get(1) in (2, 3) and labels[label_id] <= address:
+        return label_id
+    return None
+
+
+def index_labels(script: Script) -> Dict[int, int]:
+    """
+        Map every label id to the program address of the statement following its declaration.
+        Duplicate labels and references to undeclared labels are reported here, before execution.
+    """
+    labels: Dict[int, int] = {}
+    for address, statement in enumerate(script.statements):
+        label_id = declared_label(statement)
+        if label_id is None:
+            continue
+        if label_id in labels:
+            Errors.label_redeclaration(label_id, statement)
+        labels[label_id] = address + 1
+
+    for address, statement in enumerate(script.statements):
+        label_id = unresolved_label(labels, address, statement)
+        if label_id is not None:
+            Errors.label_not_found(label_id, statement)
+
+    return labels
@@ -0,0 +1,207 @@
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from collections.abc import Sequence as SequenceABC
+from itertools import chain
+from mmap import mmap
+import re
+from typing import Deque, Dict, Iterator, List, Tuple, TYPE_CHECKING
+from numscript import io
+from numscript.code import Instruction, Script, Statement
+from numscript.decoder import decode_statement, deferred_error
+from numscript.errors import Errors
+from numscript.labels import unresolved_label
+from numscript.op_codes import Operator
+from numscript.parser import convert_tokens
+
+if TYPE_CHECKING:
+    from numscript.vm import VM
+
+
+# Statements kept tokenized, and instructions kept decoded, by a lazily loaded script
+DEFAULT_CACHE_ENTRIES = 1 << 16
+
+
+# Lazy loading of scripts too large to parse as a whole.
+#
+# The source is memory-mapped and only scanned by regular expressions, to find where its statements start
+# and where its labels are declared. Statements are tokenized when they are read and decoded when they are first
+# executed, so the startup time and the memory held follow the statements a run reaches instead of the size of the script.
+# Lines are separated like bytes.splitlines does, and tokens by spaces like the parser does.
+
+
+def line_pattern(pattern: bytes) -> Tuple[re.Pattern, re.Pattern, re.Pattern]:
+    """
+        Compile a pattern matching a line from its start, at the start of the source, after a \\n, and after any line break.
+        Searching for a single character is much faster than searching for any of several.
+    """
+    # A \r followed by \n is a single line break
+    return re.compile(pattern), re.compile(rb'\n' + pattern), re.compile(rb'(?:\n|\r(?!\n))' + pattern)
+
+
+# Line holding at least one token, matched up to its first token
+STATEMENT = line_pattern(rb' *(?=[^ \r\n])')
+# Line without tokens, matched up to its line break
+BLANK_LINE = line_pattern(rb' *(?=[\r\n])')
+# Candidate label declaration: a token equal to 2, written with any leading zeros, and one more token.
+# Tokens can hold other whitespace around their digits
+LABEL_DECLARATION = line_pattern(rb' *([\t\f\v]*\+?[0_]*2[\t\f\v]*) +([^ \r\n]+) *(?=[\r\n]|\Z)')
+LONE_CARRIAGE_RETURN = re.compile(rb'\r(?!\n)')
+
+
+def find_lines(pattern: Tuple[re.Pattern, re.Pattern, re.Pattern], source: mmap | bytes) -> Iterator[re.Match]:
+    at_start, after_newline, after_line_break = pattern
+    first = at_start.match(source)
+    after_break = after_line_break if LONE_CARRIAGE_RETURN.search(source) else after_newline
+    return chain(() if first is None else (first,), after_break.finditer(source))
+
+
+def int_token(token: bytes) -> int | None:
+    try:
+        return int(token)
+    except ValueError:
+        return None
+
+
+def index_source(source: mmap | bytes) -> Tuple[array, array]:
+    """
+        Return the offsets of the first tokens of the statements of the source, and the offsets of the ends of its blank lines.
+    """
+    offsets = array('q', map(re.Match.end, find_lines(STATEMENT, source)))
+    blank_lines = array('q', map(re.Match.end, find_lines(BLANK_LINE, source)))
+    return offsets, blank_lines
+
+
+class LazyStatementTable(SequenceABC):
+    """
+        Statements of a memory-mapped source, tokenized when accessed.
+        Only the offset of every statement is held for the whole script, the most recently used statements are cached.
+    """
+
+    def __init__(self, source: mmap | bytes, offsets: array, blank_lines: array, max_entries: int = DEFAULT_CACHE_ENTRIES) -> None:
+        self.source = source
+        self.offsets = offsets
+        self.blank_lines = blank_lines
+        self.max_entries = max_entries
+        self.cache: OrderedDict[int, Statement] = OrderedDict()
+        # Declared labels, the labels referenced by statements are checked when the statements are read
+        self.labels: Dict[int, int] = {}
+
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+
+    def line_number(self, index: int) -> int:
+        # Blank lines are the only lines that aren't statements
+        offset = self.offsets[index]
+        return index + 1 + bisect_left(self.blank_lines, offset)
+
+
+    def tokenize(self, index: int) -> Statement:
+        start = self.offsets[index]
+        # Statements run until the first token of the next one, the lines in between are blank
+        end = self.offsets[index + 1] if index + 1 < len(self.offsets) else len(self.source)
+        text = self.source[start:end]
+        line_number = self.line_number(index)
+        return Statement(line_number, convert_tokens(text.splitlines(), line_number))
+
+
+    def __getitem__(self, index: int) -> Statement:
+        if index < 0:
+            index += len(self.offsets)
+        if not 0 <= index < len(self.offsets):
+            raise IndexError('statement index out of range')
+
+        statement = self.cache.get(index)
+        if statement is not None:
+            self.cache.move_to_end(index)
+            return statement
+
+        statement = self.tokenize(index)
+        # Reported when the statement is first executed, instead of before execution
+        label_id = unresolved_label(self.labels, index, statement)
+        if label_id is not None:
+            Errors.label_not_found(label_id, statement)
+
+        self.cache[index] = statement
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+        return statement
+
+
+def index_labels(statements: LazyStatementTable) -> Dict[int, int]:
+    """
+        Map every label id to the program address of the statement following its declaration,
+        by scanning the source for declarations instead of tokenizing every statement.
+    """
+    labels: Dict[int, int] = {}
+    address = 0
+    for match in find_lines(LABEL_DECLARATION, statements.source):
+        label_id = int_token(match.group(2))
+        if int_token(match.group(1)) != Operator.DECLARE_LABEL or label_id is None:
+            # Invalid tokens are reported if the statement is executed
+            continue
+        # Declarations are found in order, so the search for their statement continues from the previous one
+        address = statements.offsets.index(match.start(1), address)
+        if label_id in labels:
+            Errors.label_redeclaration(label_id, statements.tokenize(address))
+        labels[label_id] = address + 1
+    return labels
+
+
+class LazyDecoder:
+    """
+        Instructions of a lazily loaded script, decoded when first executed.
+        Every instruction starts as a shared placeholder that decodes the statement at its address,
+        which replaces the placeholder until it is evicted, oldest decoded first, to keep at most max_entries decoded.
+    """
+
+    def __init__(self, statements: LazyStatementTable, labels: Dict[int, int], max_entries: int = DEFAULT_CACHE_ENTRIES) -> None:
+        self.statements = statements
+        self.labels = labels
+        self.max_entries = max_entries
+        self.placeholder: Instruction = (self.decode_and_execute, ())
+        self.instructions: List[Instruction] = [self.placeholder] * len(statements)
+        self.decoded: Deque[int] = deque()
+
+
+    def decode(self, address: int) -> Instruction:
+        # Decoded statements are not cached as statements, they're only read again to report errors
+        statement = self.statements.tokenize(address)
+        label_id = unresolved_label(self.labels, address, statement)
+        if label_id is not None:
+            instruction = deferred_error(Errors.label_not_found, label_id, statement)
+        else:
+            instruction = decode_statement(statement, self.labels)
+
+        self.instructions[address] = instruction
+        self.decoded.append(address)
+        if len(self.decoded) > self.max_entries:
+            self.instructions[self.decoded.popleft()] = self.placeholder
+        return instruction
+
+
+    def decode_and_execute(self, vm: VM) -> None:
+        # The program counter is advanced before an instruction is executed
+        address = vm.program_counter - 1
+        # Copies of the instructions, like the ones wrapped by the profiler, keep calling the placeholder once decoded
+        instruction = self.instructions[address]
+        if instruction is self.placeholder:
+            instruction = self.decode(address)
+        handler, operands = instruction
+        handler(vm, *operands)
+
+
+def load(file_path: str, cache_entries: int = DEFAULT_CACHE_ENTRIES) -> Script:
+    """
+        Map the source and index its statements and labels without tokenizing them.
+        Invalid statements and unresolved labels are reported when they are reached, redeclared labels before execution.
+        The script is neither verified nor optimized, which both need every statement.
+    """
+    source = io.map_file(file_path)
+    statements = LazyStatementTable(source, *index_source(source), cache_entries)
+    labels = index_labels(statements)
+    statements.labels = labels
+    return Script(statements, labels, LazyDecoder(statements, labels, cache_entries).instructions)
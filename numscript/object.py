@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import Any
+from array import array
+from typing import Any, Sequence, Union
 from enum import IntEnum
 
 
@@ -10,38 +11,82 @@ class Type(IntEnum):
 
 
 class Object():
-    
+
+    # Arrays are the only boxed values, integers are stored on the stack as plain ints
+    __slots__ = ('value', 'type')
+
     def __init__(self, value: Any, _type: Type) -> None:
         self.value = value
         self.type = _type
 
-    
+
     @staticmethod
-    def from_int(value: int) -> Object:
-        return Object(value, Type.INT)
-    
+    def from_array(value: Sequence[int]) -> Object:
+        return Object(make_array(value), Type.ARRAY)
+
 
     @staticmethod
-    def from_array(value: list) -> Object:
-        return Object(value, Type.ARRAY)
-    
+    def from_tokens(tokens: Sequence[str | bytes]) -> Object:
+        # Convert straight into the buffer, without an intermediate list of ints
+        try:
+            return Object(array('q', map(int, tokens)), Type.ARRAY)
+        except OverflowError:
+            return Object(tuple(map(int, tokens)), Type.ARRAY)
+
+
+    @staticmethod
+    def from_string(string: str) -> Object:
+        # UTF-32 code units are the code points of the characters
+        return Object(array('q', array('I', string.encode('utf-32-le', 'surrogatepass'))), Type.ARRAY)
+
 
     def to_string(self) -> str | None:
         match self.type:
-            case Type.INT:
-                return chr(self.value)
             case Type.ARRAY:
-                return ''.join(chr(x) for x in self.value)
+                return ''.join(map(chr, self.value))
             case _:
                 return None
-    
+
 
     def represent(self) -> str:
         match self.type:
-            case Type.INT:
-                return str(self.value)
             case Type.ARRAY:
-                return ' '.join(str(x) for x in self.value)
+                return ' '.join(map(str, self.value))
             case _:
                 return f"<Object {self.type}: {self.value}>"
-                
+
+
+# A value held on the VM stack
+Value = Union[int, Object]
+
+
+def make_array(values: Sequence[int]) -> Sequence[int]:
+    # Store the elements in a contiguous buffer, unless they don't fit in 64 bits
+    try:
+        return array('q', values)
+    except OverflowError:
+        return tuple(values)
+
+
+def type_of(value: Value) -> Type:
+    if type(value) is int:
+        return Type.INT
+    return value.type
+
+
+def unwrap(value: Value) -> Any:
+    if type(value) is int:
+        return value
+    return value.value
+
+
+def to_string(value: Value) -> str | None:
+    if type(value) is int:
+        return chr(value)
+    return value.to_string()
+
+
+def represent(value: Value) -> str:
+    if type(value) is int:
+        return str(value)
+    return value.represent()
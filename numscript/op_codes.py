@@ -16,5 +16,6 @@ class Operator(IntEnum):
     ACCESS_INDEX = 10
     IF_JUMP = 11
     INPUT = 12
+    ARRAY_OPERATION = 13
     
 
@@ -0,0 +1,296 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, TextIO, TYPE_CHECKING
+from numscript import decoder
+from numscript import flow
+from numscript.code import Instruction, Script
+from numscript.decoder import call_depth_exceeded, load_array, load_int, no_op, symbol_not_found
+from numscript.labels import index_labels
+from numscript.object import represent
+
+if TYPE_CHECKING:
+    from numscript.vm import VM
+
+
+# Optimization levels
+NONE = 0
+# Fold constant statements, skip runs of no-ops, remove overwritten stores
+# and turn gotos to labels that never return into jumps
+FOLD = 1
+# Also fuse common sequences of statements into superinstructions
+FUSE = 2
+
+DEFAULT_LEVEL = FUSE
+
+
+# Superinstructions
+#
+# A superinstruction replaces the first statement of a sequence and executes the following ones too.
+# The program counter is advanced before every statement after the first, so errors are still
+# reported on the line of the statement that caused them. The following statements are left
+# in place, since they may be jumped to.
+
+
+def access_identifier_array_print(vm: VM, index: int, dest: int, array: int) -> None:
+    index = load_int(vm, index)
+    value = vm.get_element(load_array(vm, array), index)
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+    vm.program_counter += 1
+    vm.output.write(b'%d\n' % value)
+
+
+def access_literal_array_print(vm: VM, index: int, dest: int, array: Sequence[int]) -> None:
+    value = vm.get_element(array, load_int(vm, index))
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+    vm.program_counter += 1
+    vm.output.write(b'%d\n' % value)
+
+
+def access_identifier_array_if_goto(vm: VM, index: int, dest: int, array: int, address: int) -> None:
+    index = load_int(vm, index)
+    value = vm.get_element(load_array(vm, array), index)
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+    vm.program_counter += 1
+    # The condition is the element just stored, which is always an int
+    if value:
+        if len(vm.goto_stack) >= vm.max_call_depth:
+            call_depth_exceeded(vm)
+        vm.goto_stack.append(vm.program_counter)
+        vm.program_counter = address
+
+
+def access_identifier_array_if_jump(vm: VM, index: int, dest: int, array: int, address: int) -> None:
+    index = load_int(vm, index)
+    value = vm.get_element(load_array(vm, array), index)
+    try:
+        vm.stack[dest] = value
+    except IndexError:
+        symbol_not_found(vm, dest)
+    vm.program_counter += 1
+    if value:
+        vm.program_counter = address
+
+
+def print_bytes_pair(vm: VM, first: bytes, second: bytes) -> None:
+    vm.output.write(first)
+    vm.program_counter += 1
+    vm.output.write(second)
+
+
+# Maps a pair of handlers to the superinstruction executing both, with a function
+# building its operands from the operands of the pair, or None if they can't be fused
+SUPERINSTRUCTIONS: Dict[tuple, tuple] = {
+    (decoder.access_identifier_index_identifier_array, decoder.print_identifier): (
+        access_identifier_array_print,
+        lambda first, second: first if second[0] == first[1] else None,
+    ),
+    (decoder.access_identifier_index_literal_array, decoder.print_identifier): (
+        access_literal_array_print,
+        lambda first, second: first if second[0] == first[1] else None,
+    ),
+    (decoder.access_identifier_index_identifier_array, decoder.if_goto_identifier): (
+        access_identifier_array_if_goto,
+        lambda first, second: first + (second[1],) if second[0] == first[1] else None,
+    ),
+    (decoder.access_identifier_index_identifier_array, decoder.if_jump_identifier): (
+        access_identifier_array_if_jump,
+        lambda first, second: first + (second[1],) if second[0] == first[1] else None,
+    ),
+    (decoder.print_bytes, decoder.print_bytes): (
+        print_bytes_pair,
+        lambda first, second: first + second,
+    ),
+}
+
+# Superinstructions, which execute both statements of the pair they replace
+FUSED = {handler for handler, _ in SUPERINSTRUCTIONS.values()}
+# Handler of the first statement of every superinstruction
+FIRST_HANDLERS = {handler: first for (first, _), (handler, _) in SUPERINSTRUCTIONS.items()}
+
+# Stores that don't read the stack
+CONSTANT_STORES = (decoder.set_int, decoder.set_array)
+JUMPS = (decoder.goto_address, decoder.jump_to_address)
+CONDITIONAL_JUMPS = (decoder.if_goto_identifier, decoder.if_jump_identifier)
+
+
+@dataclass
+class Rewrite:
+    address: int
+    before: Instruction
+    after: Instruction
+    reason: str
+
+
+def statement_count(instruction: Instruction) -> int:
+    return 2 if instruction[0] in FUSED else 1
+
+
+def unfuse(instruction: Instruction) -> Instruction:
+    """
+        Return the instruction executing only the first statement of a superinstruction,
+        the following statements are still in place. Other instructions are returned as they are.
+    """
+    handler, operands = instruction
+    first = FIRST_HANDLERS.get(handler)
+    if first is None:
+        return instruction
+    # The operands of a superinstruction start with the operands of its first statement, the VM excluded
+    return first, operands[:first.__code__.co_argcount - 1]
+
+
+def describe(instruction: Instruction) -> str:
+    handler, operands = instruction
+    arguments = ', '.join(represent(operand) if hasattr(operand, 'type') else repr(operand) for operand in operands)
+    return f'{handler.__name__}({arguments})'
+
+
+class Optimizer:
+
+    def __init__(self, instructions: List[Instruction], labels: Dict[int, int]) -> None:
+        self.instructions = list(instructions)
+        self.rewrites: List[Rewrite] = []
+        # Addresses that execution can reach from somewhere other than the previous instruction
+        self.targets = set(labels.values())
+        for address, (handler, operands) in enumerate(instructions):
+            # Return addresses
+            if handler in (decoder.goto_address, decoder.if_goto_identifier):
+                self.targets.add(address + 1)
+            if handler in JUMPS:
+                self.targets.add(operands[0])
+            elif handler in CONDITIONAL_JUMPS:
+                self.targets.add(operands[1])
+
+
+    def rewrite(self, address: int, after: Instruction, reason: str) -> None:
+        self.rewrites.append(Rewrite(address, self.instructions[address], after, reason))
+        self.instructions[address] = after
+
+
+    def fold_constant_access(self) -> None:
+        for address, (handler, operands) in enumerate(self.instructions):
+            if handler is not decoder.access_literal_index_literal_array:
+                continue
+            index, dest, array = operands
+            # An index out of range is reported when the statement is executed
+            if -len(array) <= index < len(array):
+                self.rewrite(address, (decoder.set_int, (dest, array[index])), 'constant array element')
+
+
+    def remove_overwritten_stores(self) -> None:
+        for address in range(len(self.instructions) - 1):
+            handler, operands = self.instructions[address]
+            next_handler, next_operands = self.instructions[address + 1]
+            if handler not in CONSTANT_STORES or next_handler not in CONSTANT_STORES:
+                continue
+            if operands[0] != next_operands[0] or address + 1 in self.targets:
+                continue
+            # Perform the second store in place of the first, a missing slot is still reported on the first line
+            self.rewrite(address, (next_handler, next_operands), 'store overwritten by the next statement')
+            self.rewrite(address + 1, (no_op, ()), 'store moved to the previous statement')
+
+
+    def skip_no_op_runs(self) -> None:
+        address = 0
+        while address < len(self.instructions):
+            if self.instructions[address][0] is not no_op:
+                address += 1
+                continue
+            end = address
+            while end < len(self.instructions) and self.instructions[end][0] is no_op:
+                end += 1
+            if end - address > 1:
+                # Every no-op of the run jumps to its end, wherever the run is entered
+                for skipped in range(address, end):
+                    self.rewrite(skipped, (decoder.jump_to_address, (end,)), 'skip a run of no-ops')
+            address = end
+
+
+    def final_target(self, address: int) -> int:
+        seen = set()
+        while address < len(self.instructions) and address not in seen:
+            seen.add(address)
+            handler, operands = self.instructions[address]
+            if handler is not decoder.jump_to_address:
+                break
+            address = operands[0]
+        return address
+
+
+    def thread_jumps(self) -> None:
+        for address, (handler, operands) in enumerate(self.instructions):
+            if handler in JUMPS:
+                target = self.final_target(operands[0])
+                if target != operands[0]:
+                    self.rewrite(address, (handler, (target,)), 'jump to the final target')
+            elif handler in CONDITIONAL_JUMPS:
+                target = self.final_target(operands[1])
+                if target != operands[1]:
+                    self.rewrite(address, (handler, (operands[0], target)), 'jump to the final target')
+
+
+    def convert_jumps(self) -> None:
+        # The return address of a goto is never popped if no return can be reached from its label
+        for address in flow.find_jumps(self.instructions):
+            handler, operands = self.instructions[address]
+            if handler is decoder.goto_address:
+                self.rewrite(address, (decoder.jump_to_address, operands), 'label never returns')
+            else:
+                self.rewrite(address, (decoder.if_jump_identifier, operands), 'label never returns')
+
+
+    def fuse(self) -> None:
+        address = 0
+        while address < len(self.instructions) - 1:
+            first = self.instructions[address]
+            second = self.instructions[address + 1]
+            superinstruction = SUPERINSTRUCTIONS.get((first[0], second[0]))
+            if superinstruction is not None:
+                handler, make_operands = superinstruction
+                operands = make_operands(first[1], second[1])
+                if operands is not None:
+                    self.rewrite(address, (handler, operands), f'fused with {second[0].__name__}')
+                    address += 2
+                    continue
+            address += 1
+
+
+def optimize(script: Script, level: int = DEFAULT_LEVEL) -> List[Rewrite]:
+    """
+        Rewrite the decoded instructions of the script, building them first if missing.
+        Addresses are preserved, so jumps and diagnostics still refer to the original statements.
+        Return the rewrites that were performed.
+    """
+    if script.labels is None:
+        script.labels = index_labels(script)
+    if script.instructions is None:
+        script.instructions = decoder.decode(script, script.labels)
+    if level <= NONE:
+        return []
+
+    optimizer = Optimizer(script.instructions, script.labels)
+    optimizer.fold_constant_access()
+    optimizer.remove_overwritten_stores()
+    optimizer.skip_no_op_runs()
+    optimizer.convert_jumps()
+    optimizer.thread_jumps()
+    if level >= FUSE:
+        optimizer.fuse()
+
+    script.instructions = optimizer.instructions
+    script.optimization = level
+    return optimizer.rewrites
+
+
+def dump(script: Script, rewrites: List[Rewrite], stream: TextIO) -> None:
+    for rewrite in sorted(rewrites, key=lambda rewrite: rewrite.address):
+        line_number = script.statements[rewrite.address].line_number
+        print(f'line {line_number}: {describe(rewrite.before)} -> {describe(rewrite.after)} ({rewrite.reason})', file=stream)
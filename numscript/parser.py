@@ -1,26 +1,56 @@
-from typing import List
+from array import array
+from itertools import accumulate, compress, count
+from typing import List, Sequence
 from numscript.errors import Errors
-from numscript.code import Statement, Script
-
-    
-def parse(script: str) -> Script:
-    lines = enumerate(script.splitlines(), start=1)
-    statements: List[Statement] = []
-
-    for line_number, line in lines:
-        if line == '':
-            statements.append(Statement(line_number, ()))
-        else:
-            statement = []
-            for token in line.split(' '):
-                if token == '':
-                    continue
-                try:
-                    statement.append(int(token))
-                except ValueError:
-                    Errors.invalid_token(token, line, line_number)
-
-            statements.append(Statement(line_number, statement))
-
-    return Script(tuple(statements))
-            
+from numscript.code import StatementTable, Script
+
+
+def split_tokens(line: bytes) -> List[bytes]:
+    # Tokens are only separated by spaces, int() accepts other whitespace around a token but not inside it
+    return [token for token in line.split(b' ') if token]
+
+
+def find_invalid_token(lines: List[bytes], first_line_number: int = 1) -> None:
+    for line_number, line in enumerate(lines, start=first_line_number):
+        for token in split_tokens(line):
+            try:
+                int(token)
+            except ValueError:
+                Errors.invalid_token(token.decode(errors='replace'), line.decode(errors='replace'), line_number)
+
+
+def convert_tokens(lines: List[bytes], first_line_number: int = 1) -> Sequence[int]:
+    # Convert all the tokens of the lines at once, straight into a flat buffer
+    words = split_tokens(b' '.join(lines))
+    try:
+        return array('q', map(int, words))
+    except OverflowError:
+        pass
+    except ValueError:
+        find_invalid_token(lines, first_line_number)
+
+    # Some tokens don't fit in 64 bits
+    try:
+        return list(map(int, words))
+    except ValueError:
+        find_invalid_token(lines, first_line_number)
+
+
+def parse(script: str | bytes) -> Script:
+    """
+        Tokenize the whole script into one flat buffer of tokens, separated by spaces.
+        Blank lines are not kept, every statement remembers the line it comes from.
+    """
+    if isinstance(script, str):
+        script = script.encode()
+
+    lines = script.splitlines()
+    tokens = convert_tokens(lines)
+    # Token count of every line, blank lines are dropped from the statement arrays.
+    # Every token was converted, so splitting on any whitespace finds the same tokens
+    line_lengths = array('q', map(len, map(bytes.split, lines)))
+    line_numbers = array('q', compress(count(1), line_lengths))
+    lengths = array('q', filter(None, line_lengths))
+    offsets = array('q', accumulate(lengths[:-1], initial=0)) if lengths else array('q')
+
+    return Script(StatementTable(tokens, line_numbers, offsets, lengths))
@@ -0,0 +1,209 @@
+from __future__ import annotations
+from collections import Counter
+from typing import Any, Callable, Dict, List, Sequence, TextIO, Tuple, TYPE_CHECKING
+from numscript.code import Instruction, Script, Statement
+from numscript.labels import declared_label, referenced_label
+from numscript.op_codes import Operator
+import json
+import threading
+import time
+
+if TYPE_CHECKING:
+    from numscript.vm import VM
+
+
+# Operators whose second token is an operand instead of a variant
+NO_VARIANT_OPERATORS = (Operator.DECLARE_LABEL, Operator.GOTO_LABEL, Operator.RETURN_FROM_LABEL, Operator.NO_OP)
+# Name of the region of the statements preceding the first label
+START_REGION = 'start'
+# Milliseconds between two samples of the sampling profiler
+DEFAULT_SAMPLE_INTERVAL = 10.0
+# Innermost frames kept by every sample, deeper frames are merged into a truncated frame
+MAX_SAMPLED_DEPTH = 128
+TRUNCATED_FRAME = '...'
+
+
+def operation_name(statement: Statement) -> str:
+    if statement.length() == 0:
+        return 'EMPTY'
+    try:
+        operator = Operator(statement.get(0))
+    except ValueError:
+        return f'INVALID {statement.get(0)}'
+    if operator in NO_VARIANT_OPERATORS or statement.length() < 2:
+        return operator.name
+    return f'{operator.name} {statement.get(1)}'
+
+
+def label_regions(statements: Sequence[Statement]) -> List[str]:
+    """
+        Name of the label region of every statement, which is the last label declared before it.
+    """
+    regions: List[str] = []
+    region = START_REGION
+    for statement in statements:
+        label_id = declared_label(statement)
+        if label_id is not None:
+            region = f'label {label_id}'
+        regions.append(region)
+    return regions
+
+
+class Profiler:
+    """
+        Count the executions and accumulate the wall time of every statement of a script.
+        The VM only consults the profiler when it's given one, so normal runs don't pay for it.
+    """
+
+    def __init__(self) -> None:
+        self.script: Script = None
+        self.counts: List[int] = []
+        self.times: List[int] = []
+
+
+    def start(self, script: Script) -> None:
+        self.script = script
+        self.counts = [0] * len(script.statements)
+        self.times = [0] * len(script.statements)
+
+
+    def instrument(self, instructions: List[Instruction]) -> List[Instruction]:
+        """
+            Wrap every instruction so that its executions are recorded at its address.
+        """
+        counts = self.counts
+        times = self.times
+        clock = time.perf_counter_ns
+
+        def profiled(vm: VM, address: int, handler: Callable[..., None], operands: tuple) -> None:
+            start = clock()
+            try:
+                handler(vm, *operands)
+            finally:
+                times[address] += clock() - start
+                counts[address] += 1
+
+        return [(profiled, (address, handler, operands)) for address, (handler, operands) in enumerate(instructions)]
+
+
+    def step(self, vm: VM) -> None:
+        """
+            Execute the next statement in the match engine and record it.
+        """
+        address = vm.program_counter
+        start = time.perf_counter_ns()
+        try:
+            vm.execute_next_statement()
+        finally:
+            if address < len(self.counts):
+                self.times[address] += time.perf_counter_ns() - start
+                self.counts[address] += 1
+
+
+    def aggregate(self, keys: Sequence[Any]) -> Dict[Any, Dict[str, int]]:
+        totals: Dict[Any, Dict[str, int]] = {}
+        for key, count, elapsed in zip(keys, self.counts, self.times):
+            if count == 0:
+                continue
+            total = totals.setdefault(key, {'count': 0, 'time_ns': 0})
+            total['count'] += count
+            total['time_ns'] += elapsed
+        return totals
+
+
+    def results(self) -> Dict[str, Dict[Any, Dict[str, int]]]:
+        statements = self.script.statements
+        return {
+            'lines': self.aggregate([statement.line_number for statement in statements]),
+            'operations': self.aggregate([operation_name(statement) for statement in statements]),
+            'labels': self.aggregate(label_regions(statements)),
+        }
+
+
+    def report(self, stream: TextIO, top: int = 20) -> None:
+        results = self.results()
+        total_time = sum(self.times) or 1
+        titles = {'lines': 'Line', 'operations': 'Operation', 'labels': 'Label region'}
+        for section, totals in results.items():
+            print(f'\n{titles[section]:<24} {"count":>12} {"time (ms)":>12} {"time %":>8}', file=stream)
+            hot_spots = sorted(totals.items(), key=lambda item: item[1]['time_ns'], reverse=True)[:top]
+            for key, total in hot_spots:
+                print(f'{str(key):<24} {total["count"]:>12} {total["time_ns"] / 1e6:>12.3f} {total["time_ns"] * 100 / total_time:>7.1f}%', file=stream)
+
+
+    def write_json(self, file_path: str) -> None:
+        results = self.results()
+        with open(file_path, 'w') as f:
+            json.dump({section: {str(key): total for key, total in totals.items()} for section, totals in results.items()}, f, indent=4)
+
+
+def caller_frame(statements: Sequence[Statement], return_address: int) -> str:
+    # The goto that pushed a return address is the statement before it
+    label_id = None
+    if 0 < return_address <= len(statements):
+        label_id = referenced_label(statements[return_address - 1])
+    if label_id is None:
+        return f'address {return_address - 1}'
+    return f'label {label_id}'
+
+
+class SamplingProfiler:
+    """
+        Sample the label call stack of a running VM from a background thread.
+        The call stack is rebuilt from the return addresses of the goto stack, each naming the label its goto jumped to,
+        and the statement being executed. The VM isn't instrumented, so the engines run at full speed between samples.
+        Samples are taken on wall time, so sleeps and waits for input are sampled too.
+    """
+
+    def __init__(self, vm: VM, interval_ms: float = DEFAULT_SAMPLE_INTERVAL) -> None:
+        self.vm = vm
+        self.interval = interval_ms / 1000
+        # Number of samples of every goto stack, whether it was truncated, and program counter
+        self.samples: Counter[Tuple[Tuple[int, ...], bool, int]] = Counter()
+        self.stopped = threading.Event()
+        self.thread: threading.Thread | None = None
+
+
+    def start(self) -> None:
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+    def sample(self) -> None:
+        vm = self.vm
+        samples = self.samples
+        while not self.stopped.wait(self.interval):
+            if vm.running:
+                # Copying the list is atomic, the statement being executed may already have returned
+                goto_stack = vm.goto_stack[-MAX_SAMPLED_DEPTH:]
+                samples[tuple(goto_stack), len(vm.goto_stack) > MAX_SAMPLED_DEPTH, vm.program_counter] += 1
+
+
+    def collapsed_stacks(self) -> Dict[str, int]:
+        """
+            Count the samples of every call stack, named like the collapsed stacks read by flame graph tools.
+        """
+        statements = self.vm.script.statements
+        stacks: Counter[str] = Counter()
+        for (return_addresses, truncated, program_counter), count in self.samples.items():
+            frames = [START_REGION, TRUNCATED_FRAME] if truncated else [START_REGION]
+            frames.extend(caller_frame(statements, address) for address in return_addresses)
+            # Every engine advances the program counter before executing a statement. Blocks of the compiled engine set it
+            # before calling a handler, so the code they run inline is counted on the last statement that called one
+            address = program_counter - 1
+            if 0 <= address < len(statements):
+                frames.append(f'line {statements[address].line_number}')
+            stacks[';'.join(frames)] += count
+        return stacks
+
+
+    def write_collapsed(self, stream: TextIO) -> None:
+        for stack, count in sorted(self.collapsed_stacks().items()):
+            print(f'{stack} {count}', file=stream)
@@ -0,0 +1,40 @@
+import asyncio
+from typing import List, Set
+from numscript.code import Script
+from numscript.errors import ErrorCode
+from numscript.vm import DEFAULT_QUANTUM, VM
+
+
+class Scheduler:
+    """
+        Run many VMs concurrently on one event loop.
+        Every VM executes a quantum of statements per turn, and the event loop resumes
+        the ready VMs in the order they yielded, so none of them can starve the others.
+    """
+
+    def __init__(self, quantum: int = DEFAULT_QUANTUM) -> None:
+        self.quantum = quantum
+        self.tasks: Set[asyncio.Task] = set()
+
+
+    def start(self, vm: VM, script: Script, name: str | None = None) -> asyncio.Task:
+        """
+            Start running the script in the VM. Cancelling the returned task stops the VM
+            at its next sleep, input or end of quantum, after flushing its output.
+        """
+        task = asyncio.create_task(vm.run_async(script, self.quantum), name=name)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+
+    def cancel(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+
+
+    async def wait(self, tasks: List[asyncio.Task]) -> List[ErrorCode | BaseException]:
+        """
+            Wait for the tasks to finish, returning their status, or the exception they raised or were cancelled with.
+        """
+        return await asyncio.gather(*tasks, return_exceptions=True)
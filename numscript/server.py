@@ -0,0 +1,159 @@
+from argparse import ArgumentParser
+from collections import OrderedDict
+import os
+import signal
+import socket
+import sys
+import traceback
+from typing import BinaryIO, List, Sequence, Tuple
+from numscript import io
+from numscript import optimizer
+from numscript.api import Program
+from numscript.client import ERROR, OUTPUT, STATUS, send_frame, socket_path
+from numscript.errors import ScriptError
+from numscript.vm import VM, Engine
+
+
+DEFAULT_CACHE_ENTRIES = 256
+
+
+class FrameStream:
+    """
+        Output stream sending every write to the client as an output frame.
+    """
+
+    def __init__(self, connection: socket.socket) -> None:
+        self.connection = connection
+
+
+    def write(self, data: bytes) -> None:
+        send_frame(self.connection, OUTPUT, bytes(data))
+
+
+    def flush(self) -> None:
+        pass
+
+
+class ProgramCache:
+    """
+        Compiled programs of a worker, keyed by their path, modification time, engine and optimization level.
+        The least recently used programs are dropped first.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.programs: OrderedDict[Tuple[str, int, Engine, int], Program] = OrderedDict()
+
+
+    def get(self, path: str, engine: Engine, level: int) -> Program:
+        key = (path, os.stat(path).st_mtime_ns, engine, level)
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+            return program
+
+        program = Program.compile(io.load_file_bytes(path), engine, level)
+        self.programs[key] = program
+        if len(self.programs) > self.max_entries:
+            self.programs.popitem(last=False)
+        return program
+
+
+def handle(connection: socket.socket, cache: ProgramCache) -> None:
+    reader: BinaryIO = connection.makefile('rb')
+    request = reader.readline().decode().rstrip('\n').split('\t')
+    if len(request) != 3:
+        send_frame(connection, ERROR, b'Invalid request')
+        return
+    engine_name, level, path = request
+
+    try:
+        engine = Engine(engine_name)
+        program = cache.get(path, engine, int(level) if level else optimizer.DEFAULT_LEVEL)
+    except (ValueError, OSError) as error:
+        send_frame(connection, ERROR, str(error).encode())
+        return
+    except ScriptError as error:
+        send_frame(connection, ERROR, error.message.encode())
+        return
+
+    # The rest of the connection is the input of the script
+    output = io.OutputSink(FrameStream(connection))
+    vm = VM(engine, output, io.InputSource(reader))
+    try:
+        status = vm.run(program.script)
+    except ScriptError as error:
+        output.flush()
+        send_frame(connection, ERROR, error.message.encode())
+        return
+    output.flush()
+    send_frame(connection, STATUS, str(int(status)).encode())
+
+
+def serve_forever(listener: socket.socket, cache_entries: int) -> None:
+    # Workers are stopped by the server, not by the terminal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    cache = ProgramCache(cache_entries)
+    while True:
+        connection, _ = listener.accept()
+        with connection:
+            try:
+                handle(connection, cache)
+            except BrokenPipeError:
+                # The client went away
+                pass
+            except Exception:
+                try:
+                    send_frame(connection, ERROR, traceback.format_exc().encode())
+                except OSError:
+                    pass
+
+
+def start_worker(listener: socket.socket, cache_entries: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve_forever(listener, cache_entries)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main(argv: Sequence[str]) -> None:
+    arg_parser = ArgumentParser(prog='numscript serve', description='Run scripts sent by numscript-client in warm worker processes')
+    arg_parser.add_argument('--socket', default=socket_path(), help='Path of the Unix socket to listen on')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Number of worker processes')
+    arg_parser.add_argument('--cache-entries', type=int, default=DEFAULT_CACHE_ENTRIES, help='Number of compiled scripts kept by every worker')
+    args = arg_parser.parse_args(argv)
+
+    if os.path.exists(args.socket):
+        os.remove(args.socket)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(args.socket)
+    os.chmod(args.socket, 0o600)
+    listener.listen()
+
+    workers: List[int] = [start_worker(listener, args.cache_entries) for _ in range(max(1, args.workers or 1))]
+    print(f'Listening on {args.socket} with {len(workers)} workers', file=sys.stderr)
+
+    def stop(signal_number: int, frame: object) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while True:
+            # Replace the workers that died
+            pid, _ = os.wait()
+            if pid in workers:
+                workers[workers.index(pid)] = start_worker(listener, args.cache_entries)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        listener.close()
+        os.remove(args.socket)
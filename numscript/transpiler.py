@@ -0,0 +1,461 @@
+from __future__ import annotations
+from hashlib import sha256
+from importlib.util import MAGIC_NUMBER
+from types import CodeType
+from typing import Any, Callable, Dict, List, Set, TYPE_CHECKING
+from numscript import cache
+from numscript import decoder
+from numscript.code import Instruction, Script, StatementTable
+from numscript.errors import Errors
+from numscript.object import Type as ObjectType, represent
+import marshal
+import os
+
+if TYPE_CHECKING:
+    from numscript.vm import VM
+
+
+# Bump when the generated code changes, so that cached code is regenerated
+TRANSPILER_VERSION = 7
+# Blocks are split after this many instructions to bound the size of the generated functions
+MAX_BLOCK_LENGTH = 256
+
+# A block executes straight-line code starting at its address and returns the address of the next block
+Block = Callable[['VM'], int]
+
+# Handlers that end a basic block
+CONTROL_FLOW = {
+    decoder.goto_address,
+    decoder.jump_to_address,
+    decoder.return_from_label,
+    decoder.if_goto_identifier,
+    decoder.if_jump_identifier,
+    decoder.exit_literal,
+    decoder.exit_identifier,
+}
+
+# Handlers called as they are, which don't modify the stack
+PURE_HANDLERS = {
+    decoder.no_op,
+    decoder.raise_error,
+    decoder.sleep_literal,
+    decoder.sleep_identifier,
+    decoder.print_array_literal,
+    decoder.print_identifier,
+    decoder.print_string_identifier,
+}
+
+# Handlers called as they are, which don't change the program counter
+SEQUENTIAL_HANDLERS = PURE_HANDLERS | {
+    decoder.input_int,
+    decoder.input_array,
+    decoder.input_char,
+    decoder.input_string,
+    decoder.array_slice,
+    decoder.array_concatenate,
+    decoder.array_fill,
+    decoder.array_add,
+    decoder.array_subtract,
+    decoder.array_multiply,
+    decoder.array_sum,
+    decoder.array_compare,
+    decoder.array_find,
+}
+
+# Handlers whose code is generated inline, other than control flow
+INLINED = {
+    decoder.no_op,
+    decoder.declare_local_int,
+    decoder.declare_local_array,
+    decoder.declare_local_copy,
+    decoder.set_int,
+    decoder.set_array,
+    decoder.set_copy,
+    decoder.print_bytes,
+    decoder.print_identifier,
+    decoder.access_literal_index_literal_array,
+    decoder.access_identifier_index_literal_array,
+    decoder.access_literal_index_identifier_array,
+    decoder.access_identifier_index_identifier_array,
+}
+
+# Names available to the generated code
+NAMESPACE = {
+    'Errors': Errors,
+    'INT': ObjectType.INT,
+    'ARRAY': ObjectType.ARRAY,
+    'represent': represent,
+}
+
+# Code compiled in this process, by script digest. Code objects are immutable,
+# so threads compiling the same script at once only duplicate the work
+compiled_code: Dict[str, CodeType] = {}
+
+
+def script_digest(script: Script) -> str:
+    """
+        Hash of the statements of the script, which determine its instructions.
+    """
+    digest = sha256(b'%d-%d-%d-' % (TRANSPILER_VERSION, MAX_BLOCK_LENGTH, script.optimization) + MAGIC_NUMBER)
+    statements = script.statements
+    if isinstance(statements, StatementTable) and not isinstance(statements.tokens, list):
+        for column in (statements.tokens, statements.offsets, statements.lengths):
+            digest.update(memoryview(column).cast('B'))
+            digest.update(b'|')
+    else:
+        for statement in statements:
+            digest.update(repr(list(statement.tokens)).encode())
+    return digest.hexdigest()
+
+
+def ends_block(handler: Callable[..., None]) -> bool:
+    # Handlers that aren't known may change the program counter, like superinstructions
+    return handler in CONTROL_FLOW or handler not in INLINED and handler not in SEQUENTIAL_HANDLERS
+
+
+def find_leaders(instructions: List[Instruction], labels: Dict[int, int]) -> List[bool]:
+    """
+        Mark the addresses where a basic block starts: jump targets, labels and the instructions following control flow.
+    """
+    leaders = [False] * (len(instructions) + 1)
+    leaders[0] = True
+    leaders[-1] = True
+    for address in labels.values():
+        if address <= len(instructions):
+            leaders[address] = True
+
+    length = 0
+    for address, (handler, operands) in enumerate(instructions):
+        length += 1
+        if ends_block(handler) or length == MAX_BLOCK_LENGTH:
+            leaders[address + 1] = True
+        if handler in (decoder.goto_address, decoder.jump_to_address):
+            leaders[operands[0]] = True
+        elif handler in (decoder.if_goto_identifier, decoder.if_jump_identifier):
+            leaders[operands[1]] = True
+        if leaders[address + 1]:
+            length = 0
+
+    return leaders
+
+
+class BlockWriter:
+    """
+        Generate the source of the function executing the instructions of a basic block.
+        Stack slots read in the block are bound to local variables, stores are written through to the stack.
+    """
+
+    def __init__(self, start: int) -> None:
+        self.start = start
+        self.lines: List[str] = []
+        self.arguments: List[str] = []
+        self.indent = 1
+        # Local variable holding the value of every slot known to exist
+        self.bound: Dict[int, str] = {}
+        # Slots known to hold an int
+        self.ints: Set[int] = set()
+
+
+    def emit(self, line: str) -> None:
+        self.lines.append('    ' * self.indent + line)
+
+
+    def constant(self, address: int, index: int) -> str:
+        name = f'c{len(self.arguments)}'
+        self.arguments.append(f'{name}=O[{address}][{index}]')
+        return name
+
+
+    def forget(self) -> None:
+        self.bound.clear()
+        self.ints.clear()
+
+
+    def symbol_not_found(self, slot: int, address: int) -> None:
+        self.emit('except IndexError:')
+        self.emit(f'    Errors.symbol_not_found({slot}, S[{address}])')
+
+
+    def load(self, slot: int, address: int) -> str:
+        if slot in self.bound:
+            return self.bound[slot]
+        name = f'v{slot}' if slot >= 0 else f'n{-slot}'
+        self.emit('try:')
+        self.emit(f'    {name} = stack[{slot}]')
+        self.symbol_not_found(slot, address)
+        # Negative slots alias other slots, so they are always read from the stack
+        if slot >= 0:
+            self.bound[slot] = name
+        return name
+
+
+    def load_int(self, slot: int, address: int) -> str:
+        name = self.load(slot, address)
+        if slot not in self.ints:
+            self.emit(f'if type({name}) is not int:')
+            self.emit(f'    Errors.invalid_object_type({name}, INT, S[{address}])')
+            if slot >= 0:
+                self.ints.add(slot)
+        return name
+
+
+    def load_array(self, slot: int, address: int) -> str:
+        name = self.load(slot, address)
+        if slot in self.ints:
+            self.emit(f'Errors.invalid_object_type({name}, ARRAY, S[{address}])')
+        else:
+            self.emit(f'if type({name}) is int:')
+            self.emit(f'    Errors.invalid_object_type({name}, ARRAY, S[{address}])')
+        return f'{name}.value'
+
+
+    def store(self, slot: int, value: str, address: int, is_int: bool) -> None:
+        if slot < 0:
+            self.emit(f'value = {value}')
+            self.emit('try:')
+            self.emit(f'    stack[{slot}] = value')
+            self.symbol_not_found(slot, address)
+            self.forget()
+            return
+
+        name = f'v{slot}'
+        if slot in self.bound:
+            self.emit(f'stack[{slot}] = {name} = {value}')
+        else:
+            self.emit(f'{name} = {value}')
+            self.emit('try:')
+            self.emit(f'    stack[{slot}] = {name}')
+            self.symbol_not_found(slot, address)
+            self.bound[slot] = name
+
+        if is_int:
+            self.ints.add(slot)
+        else:
+            self.ints.discard(slot)
+
+
+    def element(self, values: str, index: str, address: int) -> str:
+        self.emit('try:')
+        self.emit(f'    element = {values}[{index}]')
+        self.emit('except IndexError:')
+        self.emit(f'    Errors.index_out_of_range({index}, len({values}), S[{address}])')
+        return 'element'
+
+
+    def declare(self, slot: int, value: str, address: int) -> None:
+        self.emit(f'if len(stack) > {slot}:')
+        self.emit(f'    Errors.symbol_redeclaration({slot}, S[{address}])')
+        self.emit(f'stack.append({value})')
+
+
+    def call(self, address: int, handler: Callable[..., None], operands: tuple) -> None:
+        name = f'h{len(self.arguments)}'
+        self.arguments.append(f'{name}=H[{address}]')
+        # The handler finds the statement it executes from the program counter
+        self.emit(f'vm.program_counter = {address + 1}')
+        self.emit(f'{name}(vm, *O[{address}])')
+        if handler not in PURE_HANDLERS:
+            self.forget()
+
+
+    def push_return_address(self, following: int, address: int) -> None:
+        self.emit('goto_stack = vm.goto_stack')
+        self.emit('if len(goto_stack) >= vm.max_call_depth:')
+        self.emit(f'    vm.call_depth_exceeded(S[{address}])')
+        self.emit(f'goto_stack.append({following})')
+
+
+    def write_instruction(self, address: int, handler: Callable[..., None], operands: tuple) -> bool:
+        """
+            Emit the code of an instruction. Return True if the instruction ends the block.
+        """
+        following = address + 1
+
+        if handler is decoder.no_op:
+            pass
+
+        elif handler is decoder.declare_local_int:
+            self.declare(operands[0], repr(operands[1]), address)
+
+        elif handler is decoder.declare_local_array:
+            self.declare(operands[0], self.constant(address, 1), address)
+
+        elif handler is decoder.declare_local_copy:
+            self.declare(operands[0], self.load(operands[1], address), address)
+
+        elif handler is decoder.set_int:
+            self.store(operands[0], repr(operands[1]), address, True)
+
+        elif handler is decoder.set_array:
+            self.store(operands[0], self.constant(address, 1), address, False)
+
+        elif handler is decoder.set_copy:
+            src = operands[1]
+            value = self.load(src, address)
+            self.store(operands[0], value, address, src in self.ints)
+
+        elif handler is decoder.print_bytes:
+            self.emit(f'write({self.constant(address, 0)})')
+
+        elif handler is decoder.print_identifier:
+            src = operands[0]
+            value = self.load(src, address)
+            if src in self.ints:
+                self.emit(f"write(b'%d\\n' % {value})")
+            else:
+                self.emit(f'output.write_line(represent({value}))')
+
+        elif handler is decoder.access_literal_index_literal_array:
+            index, dest, _ = operands
+            self.store(dest, self.element(self.constant(address, 2), repr(index), address), address, True)
+
+        elif handler is decoder.access_identifier_index_literal_array:
+            index, dest, _ = operands
+            index = self.load_int(index, address)
+            self.store(dest, self.element(self.constant(address, 2), index, address), address, True)
+
+        elif handler is decoder.access_literal_index_identifier_array:
+            index, dest, array = operands
+            self.store(dest, self.element(self.load_array(array, address), repr(index), address), address, True)
+
+        elif handler is decoder.access_identifier_index_identifier_array:
+            index, dest, array = operands
+            index = self.load_int(index, address)
+            array = self.load_array(array, address)
+            self.store(dest, self.element(array, index, address), address, True)
+
+        elif handler is decoder.goto_address:
+            self.push_return_address(following, address)
+            self.emit(f'return {operands[0]}')
+            return True
+
+        elif handler is decoder.jump_to_address:
+            self.emit(f'return {operands[0]}')
+            return True
+
+        elif handler is decoder.if_goto_identifier:
+            condition, target = operands
+            self.emit(f'if {self.load_int(condition, address)}:')
+            self.indent += 1
+            self.push_return_address(following, address)
+            self.indent -= 1
+            self.emit(f'    return {target}')
+            self.emit(f'return {following}')
+            return True
+
+        elif handler is decoder.if_jump_identifier:
+            condition, target = operands
+            self.emit(f'if {self.load_int(condition, address)}:')
+            self.emit(f'    return {target}')
+            self.emit(f'return {following}')
+            return True
+
+        elif handler is decoder.return_from_label:
+            self.emit('try:')
+            self.emit('    return vm.goto_stack.pop()')
+            self.emit('except IndexError:')
+            self.emit(f'    Errors.no_label_to_return_from(S[{address}])')
+            return True
+
+        elif handler is decoder.exit_literal:
+            self.emit('vm.running = False')
+            self.emit(f'vm.status = {operands[0]!r}')
+            self.emit(f'return {following}')
+            return True
+
+        elif handler is decoder.exit_identifier:
+            self.emit(f'vm.status = {self.load_int(operands[0], address)}')
+            self.emit('vm.running = False')
+            self.emit(f'return {following}')
+            return True
+
+        else:
+            self.call(address, handler, operands)
+            if ends_block(handler):
+                self.emit('return vm.program_counter')
+                return True
+
+        return False
+
+
+    def source(self, end: int) -> str:
+        arguments = ''.join(f', {argument}' for argument in self.arguments)
+        header = [
+            f'def block_{self.start}(vm{arguments}):',
+            '    stack = vm.stack',
+            '    output = vm.output',
+            '    write = output.write',
+        ]
+        return '\n'.join(header + self.lines + [f'    return {end}', '', ''])
+
+
+def generate(instructions: List[Instruction], labels: Dict[int, int]) -> str:
+    """
+        Generate the source of a module defining a function for every basic block,
+        and the list of blocks indexed by their start address.
+    """
+    leaders = find_leaders(instructions, labels)
+    chunks: List[str] = []
+    starts: List[int] = []
+
+    writer = None
+    for address, (handler, operands) in enumerate(instructions):
+        if leaders[address]:
+            writer = BlockWriter(address)
+            starts.append(address)
+        if writer.write_instruction(address, handler, operands):
+            chunks.append(writer.source(address + 1))
+            writer = None
+        elif leaders[address + 1]:
+            chunks.append(writer.source(address + 1))
+
+    entries = ', '.join(f'{start}: block_{start}' for start in starts)
+    chunks.append(f'BLOCKS = {{{entries}}}\n')
+    return ''.join(chunks)
+
+
+def load_code(digest: str, directory: str | None) -> CodeType | None:
+    if digest in compiled_code:
+        return compiled_code[digest]
+    if directory is None:
+        return None
+    data = cache.read_entry(os.path.join(directory, digest + cache.CODE_SUFFIX))
+    if data is None:
+        return None
+    try:
+        code = marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+        return None
+    compiled_code[digest] = code
+    return code
+
+
+def store_code(digest: str, code: CodeType, directory: str | None, max_size: int) -> None:
+    compiled_code[digest] = code
+    if directory is not None:
+        cache.write_entry(os.path.join(directory, digest + cache.CODE_SUFFIX), marshal.dumps(code), max_size)
+
+
+def compile_blocks(script: Script, directory: str | None = None, max_size: int = cache.DEFAULT_CACHE_SIZE) -> List[Block | None]:
+    """
+        Compile the decoded instructions of the script into Python functions, one per basic block.
+        Return the blocks indexed by their start address, with None at the addresses inside a block.
+        The generated code is cached in this process and, if a directory is given, on disk.
+    """
+    digest = script_digest(script)
+    code = load_code(digest, directory)
+    if code is None:
+        source = generate(script.instructions, script.labels)
+        code = compile(source, f'<numscript {digest[:12]}>', 'exec')
+        store_code(digest, code, directory, max_size)
+
+    namespace: Dict[str, Any] = dict(NAMESPACE)
+    namespace['S'] = script.statements
+    namespace['H'] = [handler for handler, _ in script.instructions]
+    namespace['O'] = [operands for _, operands in script.instructions]
+    exec(code, namespace)
+
+    blocks: List[Block | None] = [None] * len(script.instructions)
+    for start, block in namespace['BLOCKS'].items():
+        blocks[start] = block
+    return blocks
@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+from numscript.code import Script, Statement
+from numscript.errors import Errors
+from numscript.op_codes import Operator
+
+
+# Highest code point accepted by chr()
+MAX_CODE_POINT = 0x10FFFF
+# Code points reserved for UTF-16 surrogates, which can't be printed
+SURROGATES = range(0xD800, 0xE000)
+# About 31 years, longer sleeps overflow the clocks of some platforms
+MAX_SLEEP_MS = 10 ** 12
+
+
+@dataclass
+class Signature:
+    # Number of arguments, the variant included
+    arguments: int
+    # Whether every variant takes exactly that many arguments
+    exact: bool
+    # Maps every variant to whether it takes exactly that many arguments,
+    # or to False if it ends with an array literal. None for operators without variants
+    variants: Dict[int, bool] | None = None
+    # Number of arguments of the variants taking exactly another number of arguments
+    variant_arguments: Dict[int, int] = field(default_factory=dict)
+
+
+SIGNATURES: Dict[Operator, Signature] = {
+    Operator.DECALRE_LOCAL: Signature(3, False, {0: True, 1: False, 2: True}),
+    Operator.SET: Signature(3, False, {0: True, 1: False, 2: True}),
+    Operator.DECLARE_LABEL: Signature(1, True),
+    Operator.GOTO_LABEL: Signature(1, True),
+    Operator.RETURN_FROM_LABEL: Signature(0, True),
+    Operator.EXIT: Signature(2, True, {0: True, 1: True}),
+    Operator.NO_OP: Signature(0, True),
+    Operator.SLEEP_MS: Signature(2, True, {0: True, 1: True}),
+    Operator.PRINT: Signature(2, False, {0: True, 1: False, 2: True}),
+    Operator.PRINT_STRING: Signature(2, False, {0: True, 1: False, 2: True}),
+    Operator.ACCESS_INDEX: Signature(4, False, {0: False, 1: False, 2: True, 3: True}),
+    Operator.IF_JUMP: Signature(3, True, {0: True, 1: True, 2: True, 3: True}),
+    Operator.INPUT: Signature(2, True, {0: True, 1: True, 2: True, 3: True}),
+    Operator.ARRAY_OPERATION: Signature(3, False, {variant: True for variant in range(9)}, {0: 5, 1: 4, 2: 4, 3: 4, 4: 4, 5: 4, 7: 4, 8: 4}),
+}
+
+
+# Number of tokens of the operators without variants
+LENGTHS: Dict[int, int] = {
+    operator: signature.arguments + 1 for operator, signature in SIGNATURES.items() if signature.variants is None
+}
+# Maps every operator and variant to its number of tokens, and whether it is exact or a minimum
+SHAPES: Dict[Tuple[int, int], Tuple[int, bool]] = {
+    (operator, variant): (signature.variant_arguments.get(variant, signature.arguments) + 1, signature.exact or exact)
+    for operator, signature in SIGNATURES.items() if signature.variants is not None
+    for variant, exact in signature.variants.items()
+}
+# Operators with literals that are checked
+LITERALS = {Operator.SLEEP_MS, Operator.PRINT, Operator.PRINT_STRING, Operator.ACCESS_INDEX}
+
+
+@dataclass
+class Problem:
+    statement: Statement
+    message: str
+
+
+def printable(code: int) -> bool:
+    return 0 <= code <= MAX_CODE_POINT and code not in SURROGATES
+
+
+def check_statement(statement: Statement) -> str | None:
+    operator = statement.get(0)
+    signature = SIGNATURES.get(operator)
+    if signature is None:
+        return f'Invalid operation code {operator}'
+    got = statement.length() - 1
+    # Checked in the same order as the engines, so the same problem is reported
+    if signature.exact and got != signature.arguments:
+        return f'Invalid argument number for operation {operator}, expected {signature.arguments} arguments, got {got}'
+    if got < signature.arguments:
+        return f'Invalid argument number for operation {operator}, expected at least {signature.arguments} arguments, got {got}'
+    if signature.variants is None:
+        return None
+
+    variant = statement.get(1)
+    exact = signature.variants.get(variant)
+    if exact is None:
+        return f'Invalid operation code variation {variant} for operator {operator}'
+    expected = signature.variant_arguments.get(variant, signature.arguments)
+    if exact and got != expected:
+        return f'Invalid argument number for operation {operator}, expected {expected} arguments, got {got}'
+    return None
+
+
+def check_literals(statement: Statement) -> str | None:
+    match statement.get(0), statement.get(1):
+        case Operator.PRINT_STRING, 0:
+            if not printable(statement.get(2)):
+                return f'No string representation for code point {statement.get(2)}'
+        case (Operator.PRINT | Operator.PRINT_STRING), 1:
+            invalid = [code for code in statement.get_from(2) if not printable(code)]
+            if invalid:
+                return f'No string representation for code points {invalid}'
+        case Operator.SLEEP_MS, 0:
+            if not 0 <= statement.get(2) <= MAX_SLEEP_MS:
+                return f'Invalid sleep duration {statement.get(2)}'
+        case Operator.ACCESS_INDEX, 0:
+            array: Sequence[int] = statement.get_from(4)
+            if not -len(array) <= statement.get(2) < len(array):
+                return f'Index {statement.get(2)} out of range for an array of length {len(array)}'
+    return None
+
+
+def find_problems(script: Script) -> List[Problem]:
+    """
+        Check the operators, variants, number of arguments, labels and literals of every statement,
+        without executing anything. Return every problem found, in program order.
+    """
+    problems: List[Problem] = []
+    labels: Dict[int, int] = {}
+    # Statements referencing a label, checked once every label is declared
+    references: List[Tuple[int, Statement, int]] = []
+    for address, statement in enumerate(script.statements):
+        tokens = statement.tokens
+        length = len(tokens)
+        if length == 0:
+            continue
+        operator = tokens[0]
+        # Only valid statements are matched against the shapes, the slow path describes the problem
+        if operator in LENGTHS:
+            valid = length == LENGTHS[operator]
+        else:
+            shape = SHAPES.get((operator, tokens[1])) if length > 1 else None
+            valid = shape is not None and (length == shape[0] if shape[1] else length >= shape[0])
+        message = check_statement(statement) if not valid else check_literals(statement) if operator in LITERALS else None
+        if message is not None:
+            problems.append(Problem(statement, message))
+            continue
+
+        match operator:
+            case Operator.DECLARE_LABEL:
+                if tokens[1] in labels:
+                    problems.append(Problem(statement, f'Label {tokens[1]} redeclared'))
+                else:
+                    labels[tokens[1]] = address + 1
+            case Operator.GOTO_LABEL:
+                references.append((address, statement, tokens[1]))
+            case Operator.IF_JUMP:
+                references.append((address, statement, tokens[3]))
+
+    for address, statement, label_id in references:
+        if label_id not in labels:
+            problems.append(Problem(statement, f'Label {label_id} not found'))
+        # Stop labels of if-jump variants 2 and 3 must be declared after the jump
+        elif statement.get(1) in (2, 3) and statement.get(0) == Operator.IF_JUMP and labels[label_id] <= address:
+            problems.append(Problem(statement, f'Stop label {label_id} is not declared after the jump'))
+
+    if not problems:
+        script.labels = labels
+    problems.sort(key=lambda problem: problem.statement.line_number)
+    return problems
+
+
+def verify(script: Script) -> None:
+    """
+        Report every problem of the script at once, or mark it as verified,
+        so that the engines execute its statements without checking them again.
+    """
+    problems = find_problems(script)
+    if problems:
+        Errors.invalid_program([(problem.statement, problem.message) for problem in problems])
+    script.verified = True
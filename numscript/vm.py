@@ -1,8 +1,20 @@
-from typing import Any, Dict, List
-from numscript.code import Script, Statement
+import asyncio
+from typing import Any, Dict, List, Sequence
+from numscript import arrays
+from numscript.checkpoint import Checkpoint, Checkpointer
+from numscript.code import Engine, Instruction, Script, Statement
+from numscript.decoder import ROOT_SCOPE, decode
+from numscript.labels import index_labels
 from numscript.errors import ErrorCode, Errors
+from numscript.governor import Governor, LimitExceeded, Limits, block_lengths
+from numscript.io import InputPending, InputSource, OutputSink
 from numscript.op_codes import Operator
-from numscript.object import Object, Type as ObjectType
+from numscript.optimizer import FUSED, statement_count, unfuse
+from numscript.profiler import Profiler
+from numscript.transpiler import Block, compile_blocks
+from numscript.verifier import MAX_SLEEP_MS, printable
+from numscript.object import Object, Type as ObjectType, Value, represent, type_of, unwrap
+import sys
 import time
 
 
@@ -24,21 +36,63 @@ def check_exact_arg_number(statement: Statement, expected: int) -> None:
         Errors.invalid_op_arg_number(statement.get(0), statement, expected, statement.length() - 1)
 
 
+# Return addresses kept on the goto stack when no call depth is given
+UNLIMITED_CALL_DEPTH = sys.maxsize
+# Statements executed by an asynchronous run before yielding to the other tasks of the event loop
+DEFAULT_QUANTUM = 1000
+
+
 class VM:
 
-    def __init__(self) -> None:
+    def __init__(self, engine: Engine = Engine.DECODED, output: OutputSink | None = None, input_source: InputSource | None = None, profiler: Profiler | None = None, max_call_depth: int | None = None, virtual_clock: bool = False, limits: Limits | None = None, checkpointer: Checkpointer | None = None) -> None:
         
+        self.engine = engine
+        self.limits = limits
+        self.checkpointer = checkpointer
+        # Sleeps advance a simulated time instead of blocking
+        self.virtual_clock = virtual_clock
+        self.profiler = profiler
+        # Gotos keep any number of return addresses unless a depth is given
+        self.max_call_depth = max_call_depth if max_call_depth is not None else UNLIMITED_CALL_DEPTH
+        if limits is not None and limits.max_call_depth is not None:
+            self.max_call_depth = min(self.max_call_depth, limits.max_call_depth)
+        self.output = output if output is not None else OutputSink(sys.stdout.buffer)
+        self.input = input_source if input_source is not None else InputSource(sys.stdin.buffer)
+        self.reset()
+
+
+    def reset(self, output: OutputSink | None = None, input_source: InputSource | None = None) -> None:
+        """
+            Clear the state left by the previous run, so that the VM can run another script.
+            The output and input are kept unless new ones are given.
+        """
+        if output is not None:
+            self.output = output
+        if input_source is not None:
+            self.input = input_source
         # List of the start addresses of the scopes
-        self.scopes: List[int] = [0]
+        self.scopes: List[int] = [ROOT_SCOPE]
         self.program_counter = 0
-        self.stack: List[Object] = []
+        self.stack: List[Value] = []
         self.running = False
         self.script: Script = None
+        # Whether the statements of the script were checked before execution
+        self.verified = False
         self.statement: Statement = None
         # Maps label ids to program addresses
         self.labels: Dict[int, int] = {}
         self.goto_stack: List[int] = []
         self.status = ErrorCode.NO_ERROR
+        # Whether the VM is run by the event loop, which performs its sleeps
+        self.scheduled = False
+        # Milliseconds to sleep before resuming an asynchronous run
+        self.pending_sleep: int | None = None
+        # Whether an asynchronous run waits for input before resuming
+        self.pending_input = False
+        # Milliseconds slept on the virtual clock
+        self.virtual_time = 0
+        # Enforces the limits of the current run
+        self.governor: Governor | None = None
 
 
     def execute_next_statement(self) -> None:
@@ -58,6 +112,11 @@ class VM:
         return line
 
 
+    def current_statement(self) -> Statement:
+        # The program counter is advanced before a statement is executed
+        return self.script.statements[self.program_counter - 1]
+
+
     def current_scope(self) -> int:
         return self.scopes[-1]
 
@@ -83,37 +142,53 @@ class VM:
             return scope + local_addr
         
         # The address is not in any scope
-        Errors.symbol_not_found(local_addr, self.statement)
+        Errors.symbol_not_found(local_addr, self.current_statement())
 
     
-    def get_object(self, local_addr: int) -> Object:
-        return self.stack[self.get_stack_address_from_local(local_addr)]
+    def get_object(self, local_addr: int) -> Value:
+        try:
+            return self.stack[self.get_stack_address_from_local(local_addr)]
+        except IndexError:
+            # Negative addresses below the bottom of the stack
+            Errors.symbol_not_found(local_addr, self.current_statement())
     
 
-    def set_object(self, local_addr: int, obj: Object) -> None:
-        self.stack[self.get_stack_address_from_local(local_addr)] = obj
+    def set_object(self, local_addr: int, obj: Value) -> None:
+        try:
+            self.stack[self.get_stack_address_from_local(local_addr)] = obj
+        except IndexError:
+            Errors.symbol_not_found(local_addr, self.current_statement())
 
 
-    def declare_local_object(self, address: int, obj: Object) -> None:
+    def declare_local_object(self, address: int, obj: Value) -> None:
         # Check if the address is already taken in the local scope
         if self.current_scope_size() > address:
-            Errors.symbol_redeclaration(address, self.statement)
+            Errors.symbol_redeclaration(address, self.current_statement())
         
         # Add the object to the local scope
         self.stack.append(obj)
 
     
-    def set_local_object(self, address: int, obj: Object) -> None:
+    def set_local_object(self, address: int, obj: Value) -> None:
         self.stack[self.current_scope() + address] = obj
     
 
-    def get_local_object(self, address: int) -> Object:
+    def get_local_object(self, address: int) -> Value:
         return self.stack[self.current_scope() + address]
 
 
+    def call_depth_exceeded(self, statement: Statement) -> None:
+        # Limited runs are stopped with a status, like for the other limits
+        if self.limits is not None and self.limits.max_call_depth == self.max_call_depth:
+            raise LimitExceeded(ErrorCode.CALL_DEPTH_LIMIT)
+        Errors.call_depth_exceeded(self.max_call_depth, statement)
+
+
     def goto_label(self, label_id: int) -> None:
         if label_id not in self.labels:
-            Errors.label_not_found(label_id, self.statement)
+            Errors.label_not_found(label_id, self.current_statement())
+        if len(self.goto_stack) >= self.max_call_depth:
+            self.call_depth_exceeded(self.current_statement())
         
         # Save the current program counter for later
         self.goto_stack.append(self.program_counter)
@@ -122,26 +197,32 @@ class VM:
 
 
     def jump_until_label(self, label_id: int) -> None:
-        statement = None
-        while True:
-            if self.program_counter == len(self.script.statements):
-                Errors.label_not_found(label_id, self.statement)
-            
-            statement = self.get_next_statement()
-            if statement.get(0) == Operator.DECLARE_LABEL:
-                check_minimum_arg_number(statement, 1)
-                if statement.get(1) == label_id:
-                    break
-            
-            self.program_counter += 1
-        
-        self.labels[label_id] = self.program_counter
+        # Stop labels are checked to follow the jump when the labels are indexed
+        self.program_counter = self.labels[label_id]
+
 
+    def get_object_value(self, obj: Value, _type: ObjectType) -> Any:
+        if type_of(obj) == _type:
+            return unwrap(obj)
+        Errors.invalid_object_type(obj, _type, self.current_statement())
 
-    def get_object_value(self, obj: Object, _type: ObjectType) -> Any:
-        if obj.type == _type:
-            return obj.value
-        Errors.invalid_object_type(obj, _type, self.statement)
+
+    def get_element(self, values: Sequence[int], index: int) -> int:
+        try:
+            return values[index]
+        except IndexError:
+            Errors.index_out_of_range(index, len(values), self.current_statement())
+
+
+    def write_codes(self, codes: Sequence[int]) -> None:
+        """
+            Write the characters with the given code points, followed by a newline.
+        """
+        try:
+            self.output.write_codes(codes)
+        except (ValueError, OverflowError):
+            invalid = next(code for code in codes if not printable(code))
+            Errors.invalid_code_point(invalid, self.current_statement())
 
 
     def execute_statement(self) -> None:
@@ -157,22 +238,25 @@ class VM:
                     0 1 [local identifier] [array]
                     0 2 [local identifier] [identifier]
                 """                
-                check_minimum_arg_number(self.statement, 3)
+                if not self.verified:
+                    check_minimum_arg_number(self.statement, 3)
                 
                 variant = self.statement.get(1)
                 local_dest_id = self.statement.get(2)
                 match variant:
                     case 0:
-                        check_exact_arg_number(self.statement, 3)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 3)
                         value = self.statement.get(3)
-                        self.declare_local_object(local_dest_id, Object.from_int(value))                        
+                        self.declare_local_object(local_dest_id, value)
                     
                     case 1:
                         array = self.statement.get_from(3)
                         self.declare_local_object(local_dest_id, Object.from_array(array))
                     
                     case 2:
-                        check_exact_arg_number(self.statement, 3)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 3)
                         src_id = self.statement.get(3)
                         self.declare_local_object(local_dest_id, self.get_object(src_id))
                     
@@ -185,22 +269,25 @@ class VM:
                     1 1 [identifier] [array]
                     1 2 [identifier] [identifier]
                 """
-                check_minimum_arg_number(self.statement, 3)
+                if not self.verified:
+                    check_minimum_arg_number(self.statement, 3)
 
                 variant = self.statement.get(1)
                 dest_id = self.statement.get(2)
                 match variant:
                     case 0:
-                        check_exact_arg_number(self.statement, 3)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 3)
                         value = self.statement.get(3)
-                        self.set_object(dest_id, Object.from_int(value))
+                        self.set_object(dest_id, value)
 
                     case 1:
                         array = self.statement.get_from(3)
                         self.set_object(dest_id, Object.from_array(array))
 
                     case 2:
-                        check_exact_arg_number(self.statement, 3)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 3)
                         src_id = self.statement.get(3)
                         self.set_object(dest_id, self.get_object(src_id))
                     
@@ -211,7 +298,8 @@ class VM:
                 """
                     2 [label identifier]
                 """
-                check_exact_arg_number(self.statement, 1)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 1)
                 label_id = self.statement.get(1)
                 self.labels[label_id] = self.program_counter
             
@@ -219,7 +307,8 @@ class VM:
                 """
                     3 [label identifier]
                 """
-                check_exact_arg_number(self.statement, 1)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 1)
                 label_id = self.statement.get(1)
                 self.goto_label(label_id)
             
@@ -227,7 +316,8 @@ class VM:
                 """
                     4
                 """
-                check_exact_arg_number(self.statement, 0)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 0)
                 # Restore the program counter
                 try:
                     self.program_counter = self.goto_stack.pop()
@@ -239,7 +329,8 @@ class VM:
                     5 0 [literal int]
                     5 1 [identifier]
                 """
-                check_exact_arg_number(self.statement, 2)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 2)
 
                 variant = self.statement.get(1)
                 match variant:
@@ -261,14 +352,16 @@ class VM:
                 """
                     6
                 """
-                check_exact_arg_number(self.statement, 0)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 0)
             
             case Operator.SLEEP_MS:
                 """
                     7 0 [literal int]
                     7 1 [identifier]
                 """
-                check_exact_arg_number(self.statement, 2)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 2)
 
                 variant = self.statement.get(1)
                 match variant:
@@ -283,7 +376,7 @@ class VM:
                     case _:
                         Errors.invalid_op_code_variant(main_op, variant, self.statement)
                         
-                time.sleep(sleep_ms / 1000)
+                self.sleep(sleep_ms)
 
             case Operator.PRINT:
                 """
@@ -291,24 +384,27 @@ class VM:
                     8 1 [array]
                     8 2 [identifier]
                 """
-                check_minimum_arg_number(self.statement, 2)
+                if not self.verified:
+                    check_minimum_arg_number(self.statement, 2)
 
                 variant = self.statement.get(1)
                 match variant:
                     case 0:
-                        check_exact_arg_number(self.statement, 2)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 2)
                         value = self.statement.get(2)
-                        print(value)
+                        self.output.write_line(str(value))
 
                     case 1:
                         array = self.statement.get_from(2)
-                        print(Object.from_array(array).to_string())
+                        self.write_codes(array)
                     
                     case 2:
-                        check_exact_arg_number(self.statement, 2)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 2)
                         src_id = self.statement.get(2)
                         obj = self.get_object(src_id)
-                        print(obj.represent())
+                        self.output.write_line(represent(obj))
 
                     case _:
                         Errors.invalid_op_code_variant(main_op, variant, self.statement)
@@ -319,27 +415,30 @@ class VM:
                     9 1 [array literal]
                     9 2 [identifier]
                 """
-                check_minimum_arg_number(self.statement, 2)
+                if not self.verified:
+                    check_minimum_arg_number(self.statement, 2)
 
                 variant = self.statement.get(1)
                 match variant:
                     case 0:
-                        check_exact_arg_number(self.statement, 2)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 2)
                         value = self.statement.get(2)
-                        print(chr(value))
+                        self.write_codes((value,))
 
                     case 1:
                         array = self.statement.get_from(2)
-                        print(Object.from_array(array).to_string())
+                        self.write_codes(array)
 
                     case 2:
-                        check_exact_arg_number(self.statement, 2)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 2)
                         src_id = self.statement.get(2)
                         obj = self.get_object(src_id)
-                        string = obj.to_string()
-                        if string is None:
-                            Errors.no_string_representation(obj, self.statement)
-                        print(string)
+                        self.write_codes((obj,) if type(obj) is int else obj.value)
+
+                    case _:
+                        Errors.invalid_op_code_variant(main_op, variant, self.statement)
 
             case Operator.ACCESS_INDEX:
                 """
@@ -348,7 +447,8 @@ class VM:
                     10 2 [literal int index] [save address] [identifier array]
                     10 3 [identifier index] [save address] [identifier array]
                 """
-                check_minimum_arg_number(self.statement, 4)
+                if not self.verified:
+                    check_minimum_arg_number(self.statement, 4)
 
                 variant = self.statement.get(1)
                 match variant:
@@ -356,7 +456,7 @@ class VM:
                         index = self.statement.get(2)
                         dest_id = self.statement.get(3)
                         array = self.statement.get_from(4)
-                        self.set_object(dest_id, Object.from_int(array[index]))
+                        self.set_object(dest_id, self.get_element(array, index))
                         
                     case 1:
                         index_id = self.statement.get(2)
@@ -366,10 +466,11 @@ class VM:
                         index_obj = self.get_object(index_id)
                         index = self.get_object_value(index_obj, ObjectType.INT)
 
-                        self.set_object(dest_id, Object.from_int(array[index]))
+                        self.set_object(dest_id, self.get_element(array, index))
 
                     case 2:
-                        check_exact_arg_number(self.statement, 4)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 4)
                         index = self.statement.get(2)
                         dest_id = self.statement.get(3)
                         array_id = self.statement.get(4)
@@ -377,10 +478,11 @@ class VM:
                         array_obj = self.get_object(array_id)
                         array = self.get_object_value(array_obj, ObjectType.ARRAY)
 
-                        self.set_object(dest_id, Object.from_int(array[index]))
+                        self.set_object(dest_id, self.get_element(array, index))
 
                     case 3:
-                        check_exact_arg_number(self.statement, 4)
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 4)
                         index_id = self.statement.get(2)
                         dest_id = self.statement.get(3)
                         array_id = self.statement.get(4)
@@ -391,7 +493,10 @@ class VM:
                         array_obj = self.get_object(array_id)
                         array = self.get_object_value(array_obj, ObjectType.ARRAY)
 
-                        self.set_object(dest_id, Object.from_int(array[index]))
+                        self.set_object(dest_id, self.get_element(array, index))
+
+                    case _:
+                        Errors.invalid_op_code_variant(main_op, variant, self.statement)
 
             case Operator.IF_JUMP:
                 """
@@ -400,7 +505,8 @@ class VM:
                     11 2 [literal condition] [stop label]
                     11 3 [identifier condition] [stop label]
                 """
-                check_exact_arg_number(self.statement, 3)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 3)
 
                 variant = self.statement.get(1)
                 match variant:
@@ -414,7 +520,7 @@ class VM:
                         condition_id = self.statement.get(2)
                         label_id = self.statement.get(3)
                         condition_obj = self.get_object(condition_id)
-                        condition = self.get_object_value(condition_obj, ObjectType.BOOL)
+                        condition = self.get_object_value(condition_obj, ObjectType.INT)
                         if condition:
                             self.goto_label(label_id)
                         
@@ -428,10 +534,13 @@ class VM:
                         condition_id = self.statement.get(2)
                         label_id = self.statement.get(3)
                         condition_obj = self.get_object(condition_id)
-                        condition = self.get_object_value(condition_obj, ObjectType.BOOL)
+                        condition = self.get_object_value(condition_obj, ObjectType.INT)
                         if condition:
                             self.jump_until_label(label_id)
 
+                    case _:
+                        Errors.invalid_op_code_variant(main_op, variant, self.statement)
+
             case Operator.INPUT:
                 """
                     12 0 [save address] # input int
@@ -439,27 +548,32 @@ class VM:
                     12 2 [save address] # input char as int
                     12 3 [save address] # input string as array
                 """
-                check_exact_arg_number(self.statement, 2)
+                if not self.verified:
+                    check_exact_arg_number(self.statement, 2)
 
                 variant = self.statement.get(1)
                 dest_id = self.statement.get(2)
+                self.output.before_input()
                 try:
                     match variant:
                         case 0:
-                            int_input = int(input())  
-                            self.set_object(dest_id, Object.from_int(int_input))
+                            int_input = self.input.read_int()
+                            self.set_object(dest_id, int_input)
                         
                         case 1:
-                            array_input = [int(c) for c in input().split(' ')]
-                            self.set_object(dest_id, Object.from_array(array_input))
+                            array_input = self.input.read_array()
+                            self.set_object(dest_id, array_input)
                         
                         case 2:
-                            int_input = ord(input())
-                            self.set_object(dest_id, Object.from_int(int_input))
+                            int_input = self.input.read_char()
+                            self.set_object(dest_id, int_input)
 
                         case 3:
-                            array_input = [ord(c) for c in input()]
-                            self.set_object(dest_id, Object.from_array(array_input))
+                            array_input = self.input.read_string()
+                            self.set_object(dest_id, array_input)
+
+                        case _:
+                            Errors.invalid_op_code_variant(main_op, variant, self.statement)
                             
                 except ValueError:
                     self.status = ErrorCode.INVALID_INPUT
@@ -471,16 +585,335 @@ class VM:
                     self.status = ErrorCode.EOF
                     return
 
+            case Operator.ARRAY_OPERATION:
+                """
+                    13 0 [save address] [identifier array] [identifier start] [identifier end] # slice
+                    13 1 [save address] [identifier array] [identifier array] # concatenate
+                    13 2 [save address] [identifier value] [identifier length] # fill
+                    13 3 [save address] [identifier array] [identifier operand] # add
+                    13 4 [save address] [identifier array] [identifier operand] # subtract
+                    13 5 [save address] [identifier array] [identifier operand] # multiply
+                    13 6 [save address] [identifier array] # sum
+                    13 7 [save address] [identifier array] [identifier operand] # compare
+                    13 8 [save address] [identifier array] [identifier value] # find
+                """
+                if not self.verified:
+                    check_minimum_arg_number(self.statement, 3)
+
+                variant = self.statement.get(1)
+                dest_id = self.statement.get(2)
+                match variant:
+                    case 0:
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 5)
+                        array = self.get_object_value(self.get_object(self.statement.get(3)), ObjectType.ARRAY)
+                        start = self.get_object_value(self.get_object(self.statement.get(4)), ObjectType.INT)
+                        end = self.get_object_value(self.get_object(self.statement.get(5)), ObjectType.INT)
+                        self.set_object(dest_id, Object(arrays.slice_elements(array, start, end), ObjectType.ARRAY))
+
+                    case 1:
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 4)
+                        first = self.get_object_value(self.get_object(self.statement.get(3)), ObjectType.ARRAY)
+                        second = self.get_object_value(self.get_object(self.statement.get(4)), ObjectType.ARRAY)
+                        self.check_array_length(len(first) + len(second))
+                        self.set_object(dest_id, Object(arrays.concatenate(first, second), ObjectType.ARRAY))
+
+                    case 2:
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 4)
+                        length = self.get_object_value(self.get_object(self.statement.get(4)), ObjectType.INT)
+                        self.check_array_length(length)
+                        value = self.get_object_value(self.get_object(self.statement.get(3)), ObjectType.INT)
+                        self.set_object(dest_id, Object(arrays.fill(value, length), ObjectType.ARRAY))
+
+                    case 3 | 4 | 5 | 7:
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 4)
+                        array = self.get_object_value(self.get_object(self.statement.get(3)), ObjectType.ARRAY)
+                        operand = unwrap(self.get_object(self.statement.get(4)))
+                        if type(operand) is not int and len(operand) != len(array):
+                            Errors.array_length_mismatch(len(array), len(operand), self.statement)
+                        operation = {3: arrays.add, 4: arrays.subtract, 5: arrays.multiply, 7: arrays.compare}[variant]
+                        self.set_object(dest_id, Object(operation(array, operand), ObjectType.ARRAY))
+
+                    case 6:
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 3)
+                        array = self.get_object_value(self.get_object(self.statement.get(3)), ObjectType.ARRAY)
+                        self.set_object(dest_id, arrays.total(array))
+
+                    case 8:
+                        if not self.verified:
+                            check_exact_arg_number(self.statement, 4)
+                        array = self.get_object_value(self.get_object(self.statement.get(3)), ObjectType.ARRAY)
+                        value = self.get_object_value(self.get_object(self.statement.get(4)), ObjectType.INT)
+                        self.set_object(dest_id, arrays.find(array, value))
+
+                    case _:
+                        Errors.invalid_op_code_variant(main_op, variant, self.statement)
+
             case _:
                 Errors.invalid_op_code(main_op, self.statement)
 
 
 
-    def run(self, script: Script) -> ErrorCode:
+    def run_decoded(self, instructions: List[Instruction]) -> None:
+        while self.running:
+            try:
+                handler, operands = instructions[self.program_counter]
+            except IndexError:
+                # The program is finished
+                self.running = False
+                return
+
+            self.program_counter += 1
+            handler(self, *operands)
+
+
+    def run_compiled(self, blocks: List[Block | None], instructions: List[Instruction]) -> None:
+        while self.running:
+            try:
+                block = blocks[self.program_counter]
+            except IndexError:
+                # The program is finished
+                self.running = False
+                return
+
+            if block is not None:
+                self.program_counter = block(self)
+            else:
+                # The program counter was set to an address inside a block from outside the program
+                handler, operands = instructions[self.program_counter]
+                self.program_counter += 1
+                handler(self, *operands)
+
+
+    def end_slice(self, executed: int) -> None:
+        self.governor.check(self, executed)
+        if self.checkpointer is not None and self.running:
+            self.checkpointer.after_slice(self)
+
+
+    def run_governed(self, instructions: List[Instruction] | None, blocks: List[Block | None] | None) -> None:
+        governor = self.governor
+        if blocks is None:
+            while self.running:
+                self.end_slice(self.run_quantum(instructions, governor.next_slice()))
+            return
+
+        lengths = block_lengths(blocks, [statement_count(instruction) for instruction in instructions])
+        executed = 0
+        next_check = governor.next_slice()
+        while self.running:
+            if executed >= next_check:
+                self.end_slice(executed)
+                executed = 0
+                next_check = governor.next_slice()
+
+            address = self.program_counter
+            try:
+                block = blocks[address]
+            except IndexError:
+                # The program is finished
+                self.running = False
+                break
+
+            if block is not None and executed + lengths[address] <= next_check:
+                executed += lengths[address]
+                self.program_counter = block(self)
+            else:
+                # Blocks that don't fit in the rest of the slice are executed statement by statement, to end it exactly
+                handler, operands = instructions[address]
+                if executed + statement_count((handler, operands)) > next_check:
+                    handler, operands = unfuse((handler, operands))
+                executed += statement_count((handler, operands))
+                self.program_counter += 1
+                handler(self, *operands)
+        # Count the statements of the last slice
+        self.end_slice(executed)
+
+
+    def check_array_length(self, length: int) -> None:
+        """
+            Check the length of an array before creating it.
+        """
+        if length < 0:
+            Errors.negative_array_length(length, self.current_statement())
+        if self.governor is not None:
+            self.governor.before_allocation(length)
+        if length > arrays.MAX_ARRAY_LENGTH:
+            Errors.array_too_long(length, self.current_statement())
+
+
+    def sleep(self, sleep_ms: int) -> None:
+        if not 0 <= sleep_ms <= MAX_SLEEP_MS:
+            Errors.invalid_sleep_length(sleep_ms, self.current_statement())
+        self.output.before_sleep()
+        if self.virtual_clock:
+            self.virtual_time += sleep_ms
+            return
+        if self.governor is not None:
+            self.governor.before_sleep(sleep_ms)
+        if self.scheduled:
+            # Stop the current quantum, the event loop sleeps before resuming
+            self.pending_sleep = sleep_ms
+            self.running = False
+        else:
+            time.sleep(sleep_ms / 1000)
+
+
+    def start(self, script: Script, checkpoint: Checkpoint | None = None) -> None:
         self.script = script
+        if script.labels is None:
+            script.labels = index_labels(script)
+        self.labels = dict(script.labels)
+        self.verified = script.verified
         self.running = True
-        while self.running:
-            self.execute_next_statement()
+        # Checkpoints are taken between the slices of governed runs
+        if self.limits is not None or self.checkpointer is not None:
+            self.governor = Governor(self.limits or Limits())
+        else:
+            self.governor = None
+        if checkpoint is not None:
+            self.restore(checkpoint)
+        if self.profiler is not None:
+            self.profiler.start(script)
+
+
+    def restore(self, checkpoint: Checkpoint) -> None:
+        """
+            Continue the run saved in the checkpoint. The input and output are restored by their owner.
+        """
+        self.program_counter = checkpoint.program_counter
+        self.status = checkpoint.status
+        self.scopes = checkpoint.scopes.copy()
+        self.stack = checkpoint.stack.copy()
+        self.labels = dict(checkpoint.labels)
+        self.goto_stack = checkpoint.goto_stack.copy()
+        self.virtual_time = checkpoint.virtual_time
+        if self.governor is not None:
+            self.governor.executed = checkpoint.executed
+
+
+    def decoded_instructions(self, script: Script) -> List[Instruction] | None:
+        # The decoder resolves identifiers to stack slots of the root scope,
+        # any other scope layout falls back to the dynamic scope lookup
+        if self.engine == Engine.MATCH or self.scopes != [ROOT_SCOPE]:
+            return None
+        if script.instructions is None:
+            script.instructions = decode(script, script.labels)
+        if self.profiler is not None:
+            # Profiled runs time every instruction, so blocks are not compiled,
+            # and superinstructions are split to time every statement on its own line
+            return self.profiler.instrument(list(map(unfuse, script.instructions)))
+        return script.instructions
+
+
+    def run(self, script: Script, checkpoint: Checkpoint | None = None) -> ErrorCode:
+        self.start(script, checkpoint)
+        try:
+            instructions = self.decoded_instructions(script)
+            blocks = None
+            if instructions is not None and self.engine == Engine.COMPILED and self.profiler is None:
+                if script.blocks is None:
+                    script.blocks = compile_blocks(script)
+                blocks = script.blocks
+
+            if self.governor is not None:
+                self.run_governed(instructions, blocks)
+            elif blocks is not None:
+                self.run_compiled(blocks, instructions)
+            elif instructions is not None:
+                self.run_decoded(instructions)
+            elif self.profiler is not None:
+                while self.running:
+                    self.profiler.step(self)
+            else:
+                while self.running:
+                    self.execute_next_statement()
+        except LimitExceeded as error:
+            self.status = error.status
+            self.running = False
+        finally:
+            self.output.at_exit()
         
         return self.status
-            
+
+
+    def run_quantum(self, instructions: List[Instruction] | None, quantum: int) -> int:
+        """
+            Execute at most quantum statements. Return the number of statements executed,
+            which is lower if the program stopped or waits for input.
+        """
+        executed = 0
+        try:
+            if instructions is None:
+                while executed < quantum and self.running:
+                    if self.profiler is not None:
+                        self.profiler.step(self)
+                    else:
+                        self.execute_next_statement()
+                    executed += 1
+                return executed
+
+            steps = iter(range(1, quantum + 1))
+            for step in steps:
+                if not self.running:
+                    break
+                try:
+                    handler, operands = instructions[self.program_counter]
+                except IndexError:
+                    # The program is finished
+                    self.running = False
+                    break
+                if handler in FUSED:
+                    # A superinstruction takes the step of its second statement, or only executes its first one if none is left
+                    following = next(steps, None)
+                    if following is None:
+                        handler, operands = unfuse((handler, operands))
+                    else:
+                        step = following
+                self.program_counter += 1
+                handler(self, *operands)
+                executed = step
+        except InputPending:
+            # Execute the input statement again once more input is available
+            self.program_counter -= 1
+            self.pending_input = True
+        return executed
+
+
+    async def run_async(self, script: Script, quantum: int = DEFAULT_QUANTUM, checkpoint: Checkpoint | None = None) -> ErrorCode:
+        """
+            Run the script as a coroutine, yielding to the event loop every quantum statements,
+            while sleeping and while waiting for input, so that many VMs can share one thread.
+            The compiled engine runs the decoded instructions, since blocks can't be interrupted.
+        """
+        self.start(script, checkpoint)
+        self.scheduled = True
+        governor = self.governor
+        try:
+            instructions = self.decoded_instructions(script)
+            while self.running:
+                executed = self.run_quantum(instructions, quantum if governor is None else min(quantum, governor.next_slice()))
+                if governor is not None:
+                    self.end_slice(executed)
+
+                if self.pending_input:
+                    self.pending_input = False
+                    await self.input.fill()
+                elif self.pending_sleep is not None:
+                    sleep_ms, self.pending_sleep = self.pending_sleep, None
+                    self.running = True
+                    await asyncio.sleep(sleep_ms / 1000)
+                elif self.running:
+                    await asyncio.sleep(0)
+        except LimitExceeded as error:
+            self.status = error.status
+        finally:
+            self.scheduled = False
+            self.running = False
+            self.output.at_exit()
+
+        return self.status
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+from io import BytesIO
+import re
+from numscript import optimizer
+from numscript import parser
+from numscript import verifier
+from numscript.code import Engine, Script
+from numscript.errors import ScriptError
+from numscript.governor import Limits
+from numscript.io import InputSource, OutputSink
+from numscript.vm import VM
+
+
+LEVELS = (optimizer.NONE, optimizer.FOLD, optimizer.FUSE)
+# Every engine with every optimization level, the match engine only runs the statements
+CONFIGURATIONS = [(Engine.MATCH, optimizer.NONE)] + [(engine, level) for engine in (Engine.DECODED, Engine.COMPILED) for level in LEVELS]
+
+
+@dataclass
+class Run:
+    output: bytes
+    status: int
+    # The error that stopped the run, None if it finished
+    error: ScriptError | None
+    vm: VM
+
+    def outcome(self) -> tuple:
+        """
+            What a run is compared on across engines, errors by their message.
+        """
+        # Some messages name objects by their address
+        message = None if self.error is None else re.sub('0x[0-9a-f]+', '0x', self.error.message)
+        return self.output, self.status, message
+
+
+def prepare(source: str | bytes, engine: Engine, level: int, verify: bool = True) -> Script:
+    script = parser.parse(source)
+    if verify:
+        verifier.verify(script)
+    if engine is not Engine.MATCH:
+        optimizer.optimize(script, level)
+    return script
+
+
+def make_vm(engine: Engine, stream: BytesIO, input_data: bytes = b'', limits: Limits | None = None) -> VM:
+    return VM(engine, OutputSink(stream), InputSource(None, data=bytearray(input_data)), limits=limits)
+
+
+def run(source: str | bytes, engine: Engine, level: int, input_data: bytes = b'', limits: Limits | None = None, verify: bool = True) -> Run:
+    stream = BytesIO()
+    vm = make_vm(engine, stream, input_data, limits)
+    try:
+        # Labels that are not declared are reported before execution
+        status = vm.run(prepare(source, engine, level, verify))
+    except ScriptError as error:
+        return Run(stream.getvalue(), 1, error, vm)
+    return Run(stream.getvalue(), int(status), None, vm)
@@ -0,0 +1,73 @@
+from array import array
+import operator
+from typing import Sequence
+import pytest
+from numscript import arrays
+from numscript.code import Engine
+from numscript.object import make_array
+from tests.helpers import run
+from tests.test_engines import SAMPLES
+
+
+LENGTH = arrays.MIN_VECTORIZED_LENGTH * 2
+LEFT = [(i * 7919) % 1000 - 500 for i in range(LENGTH)]
+RIGHT = [(i * 104729) % 900 - 450 for i in range(LENGTH)]
+HUGE = [arrays.INT64_MAX - i for i in range(LENGTH)]
+
+
+@pytest.fixture(params=[False, True], ids=['python', 'numpy'])
+def vectorized(request, monkeypatch) -> bool:
+    if not request.param:
+        monkeypatch.setattr(arrays, 'numpy', None)
+    elif arrays.numpy is None:
+        pytest.skip('NumPy is not installed')
+    return request.param
+
+
+def layouts(values: Sequence[int]) -> list:
+    # A buffer, a view of a buffer like the literal arrays of cached scripts, and a tuple
+    return [make_array(values), memoryview(make_array(values)), tuple(values)]
+
+
+@pytest.mark.parametrize('name, function', [('add', operator.add), ('subtract', operator.sub), ('multiply', operator.mul)])
+def test_elementwise_operations(vectorized: bool, name: str, function) -> None:
+    operation = getattr(arrays, name)
+    for left in layouts(LEFT):
+        for right in layouts(RIGHT):
+            assert list(operation(left, right)) == list(map(function, LEFT, RIGHT))
+        assert list(operation(left, -3)) == [function(element, -3) for element in LEFT]
+
+
+@pytest.mark.parametrize('name, function', [('add', operator.add), ('multiply', operator.mul)])
+def test_results_beyond_64_bits_are_exact(vectorized: bool, name: str, function) -> None:
+    result = getattr(arrays, name)(make_array(HUGE), make_array(HUGE))
+    assert type(result) is tuple
+    assert list(result) == list(map(function, HUGE, HUGE))
+    assert list(getattr(arrays, name)(make_array(HUGE), 1 << 70)) == [function(element, 1 << 70) for element in HUGE]
+
+
+def test_compare_total_and_find(vectorized: bool) -> None:
+    for values in layouts(LEFT):
+        assert list(arrays.compare(values, RIGHT[0])) == [(element > RIGHT[0]) - (element < RIGHT[0]) for element in LEFT]
+        assert list(arrays.compare(values, make_array(RIGHT))) == [(a > b) - (a < b) for a, b in zip(LEFT, RIGHT)]
+        assert arrays.total(values) == sum(LEFT)
+        assert arrays.find(values, LEFT[5]) == LEFT.index(LEFT[5])
+        assert arrays.find(values, 10 ** 6) == -1
+    assert arrays.total(make_array(HUGE)) == sum(HUGE)
+
+
+def test_concatenate_and_fill(vectorized: bool) -> None:
+    for first in layouts(LEFT):
+        for second in layouts(HUGE):
+            assert list(arrays.concatenate(first, second)) == LEFT + HUGE
+    assert type(arrays.concatenate(memoryview(make_array(LEFT)), array('q', RIGHT))) is array
+    assert list(arrays.fill(-7, LENGTH)) == [-7] * LENGTH
+    assert list(arrays.fill(1 << 70, 3)) == [1 << 70] * 3
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_bulk_operations_match_without_numpy(monkeypatch, engine: Engine) -> None:
+    source, input_data = SAMPLES['bulk_arrays']
+    expected = run(source, engine, 0, input_data)
+    monkeypatch.setattr(arrays, 'numpy', None)
+    assert run(source, engine, 0, input_data).outcome() == expected.outcome()
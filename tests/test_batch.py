@@ -0,0 +1,55 @@
+import json
+import os
+from typing import Any, Dict, List
+import pytest
+from numscript import batch
+
+
+# Prints the element of an array at the index read from the input
+SCRIPT = '0 1 0 1 2 3\n0 0 1 0\n12 0 1\n10 3 1 1 0\n8 2 1\n'
+
+
+def write(path: str, data: str) -> str:
+    with open(path, 'w') as f:
+        f.write(data)
+    return path
+
+
+def run_batch(tmp_path, arguments: List[str]) -> List[Dict[str, Any]]:
+    results = os.path.join(tmp_path, 'results.jsonl')
+    batch.main(arguments + ['--results', results, '--threads', '--workers', '2'])
+    with open(results) as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize('engine', ['match', 'decoded', 'compiled'])
+def test_failing_jobs_dont_stop_the_others(tmp_path, engine: str) -> None:
+    script = write(os.path.join(tmp_path, 'index.ns'), SCRIPT)
+    inputs = os.path.join(tmp_path, 'inputs')
+    os.mkdir(inputs)
+    write(os.path.join(inputs, 'a'), '1\n')
+    write(os.path.join(inputs, 'b'), '9\n')
+    write(os.path.join(inputs, 'c'), '2\n')
+    missing = os.path.join(tmp_path, 'missing')
+
+    records = run_batch(tmp_path, [script, '--input', inputs, '--input', missing, '--engine', engine])
+    by_input = {os.path.basename(record['input']): record for record in records}
+    assert len(records) == 4
+    assert (by_input['a']['status'], by_input['a']['output']) == (0, '2\n')
+    assert (by_input['c']['status'], by_input['c']['output']) == (0, '3\n')
+    assert by_input['b']['status'] == 1
+    assert by_input['b']['line'] == 4
+    assert 'Index 9 out of range' in by_input['b']['error']
+    assert by_input['missing']['status'] == 1
+    assert by_input['missing']['error'].startswith('FileNotFoundError')
+
+
+def test_invalid_script_is_reported_once(tmp_path) -> None:
+    valid = write(os.path.join(tmp_path, 'valid.ns'), SCRIPT)
+    invalid = write(os.path.join(tmp_path, 'invalid.ns'), '3 7\n')
+    first = write(os.path.join(tmp_path, 'first'), '0\n')
+    second = write(os.path.join(tmp_path, 'second'), '1\n')
+
+    records = run_batch(tmp_path, [valid, invalid, '--input', first, '--input', second])
+    assert [record['status'] for record in records if record['script'] == invalid] == [1]
+    assert [record['output'] for record in records if record['script'] == valid] == ['1\n', '2\n']
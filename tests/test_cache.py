@@ -0,0 +1,122 @@
+from io import BytesIO
+import os
+import sys
+import pytest
+from numscript import binary
+from numscript import cache
+from numscript import optimizer
+from numscript import transpiler
+from numscript import verifier
+from numscript.code import Engine, Script
+from tests.helpers import CONFIGURATIONS, LEVELS, make_vm, prepare, run
+from tests.test_engines import SAMPLES
+
+
+# Stores overwritten by an array with elements that don't fit in 64 bits, which optimized entries can't hold
+WIDE_STORES = '0 1 0 1 2\n1 1 0 1 2\n1 1 0 100000000000000000000 5\n8 2 0\n'
+
+
+def write_source(directory: str, name: str, source: str | None = None) -> str:
+    path = os.path.join(directory, f'{name}.ns')
+    with open(path, 'w') as f:
+        f.write(SAMPLES[name][0] if source is None else source)
+    return path
+
+
+def fail(*args) -> None:
+    raise AssertionError('Cached scripts are not checked again')
+
+
+def run_script(script: Script, engine: Engine, input_data: bytes) -> bytes:
+    stream = BytesIO()
+    make_vm(engine, stream, input_data).run(script)
+    return stream.getvalue()
+
+
+@pytest.mark.parametrize('name', sorted(SAMPLES))
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_cached_script_runs_like_its_source(tmp_path, name: str, engine: Engine, level: int) -> None:
+    path = write_source(tmp_path, name)
+    cache.load_script(path, os.path.join(tmp_path, 'cache'))
+    # Loaded from the cache, with its tokens and literal arrays as views of the file
+    script = cache.load_script(path, os.path.join(tmp_path, 'cache'), level=level)
+    assert script.verified
+    assert script.optimization == level
+    source, input_data = SAMPLES[name]
+    assert run_script(script, engine, input_data) == run(source, engine, level, input_data).output
+
+
+@pytest.mark.parametrize('level', LEVELS)
+def test_cached_script_is_neither_verified_nor_optimized_again(tmp_path, monkeypatch, level: int) -> None:
+    path = write_source(tmp_path, 'superinstructions')
+    directory = os.path.join(tmp_path, 'cache')
+    cache.load_script(path, directory, level=optimizer.NONE)
+    expected = prepare(SAMPLES['superinstructions'][0], Engine.DECODED, level)
+
+    monkeypatch.setattr(verifier, 'verify', fail)
+    monkeypatch.setattr(optimizer, 'optimize', fail)
+    script = cache.load_script(path, directory, level=level)
+    assert (script.verified, script.optimization) == (True, level)
+    assert [handler for handler, _ in script.instructions] == [handler for handler, _ in expected.instructions]
+
+
+def test_unverified_script_is_verified_once(tmp_path, monkeypatch) -> None:
+    path = write_source(tmp_path, 'strings')
+    directory = os.path.join(tmp_path, 'cache')
+    cache.load_script(path, directory, verify=False)
+    assert not cache.load_script(path, directory, verify=False).verified
+    assert cache.load_script(path, directory).verified
+
+    monkeypatch.setattr(verifier, 'verify', fail)
+    assert cache.load_script(path, directory).verified
+
+
+@pytest.mark.parametrize('level', LEVELS)
+def test_instructions_that_cant_be_cached_are_optimized_at_load(tmp_path, level: int) -> None:
+    path = write_source(tmp_path, 'wide_stores', WIDE_STORES)
+    directory = os.path.join(tmp_path, 'cache')
+    cache.load_script(path, directory, level=level)
+    script = cache.load_script(path, directory, level=level)
+    assert script.optimization == level
+    assert run_script(script, Engine.DECODED, b'') == run(WIDE_STORES, Engine.DECODED, level).output == b'100000000000000000000 5\n'
+
+
+def test_script_of_another_format_is_recompiled(tmp_path) -> None:
+    path = write_source(tmp_path, 'strings')
+    directory = os.path.join(tmp_path, 'cache')
+    cache.load_script(path, directory)
+    [entry] = os.listdir(directory)
+    with open(os.path.join(directory, entry), 'rb') as f:
+        data = bytearray(f.read())
+    assert binary.load(memoryview(data)) is not None
+
+    # The format version follows the magic number
+    data[4:8] = (binary.FORMAT_VERSION - 1).to_bytes(4, sys.byteorder)
+    assert binary.load(memoryview(data)) is None
+    with open(os.path.join(directory, entry), 'wb') as f:
+        f.write(data)
+    script = cache.load_script(path, directory)
+    source, input_data = SAMPLES['strings']
+    assert run_script(script, Engine.DECODED, input_data) == run(source, Engine.DECODED, 0, input_data).output
+    with open(os.path.join(directory, entry), 'rb') as f:
+        assert binary.load(memoryview(f.read())) is not None
+
+
+def test_generated_code_of_another_transpiler_is_regenerated(tmp_path, monkeypatch) -> None:
+    # Only the code cached on disk
+    monkeypatch.setattr(transpiler, 'compiled_code', {})
+    path = write_source(tmp_path, 'superinstructions')
+    directory = os.path.join(tmp_path, 'cache')
+    script = cache.load_script(path, directory)
+    optimizer.optimize(script, optimizer.FOLD)
+    digest = transpiler.script_digest(script)
+    script.blocks = transpiler.compile_blocks(script, directory)
+    assert os.path.exists(os.path.join(directory, digest + cache.CODE_SUFFIX))
+
+    monkeypatch.setattr(transpiler, 'TRANSPILER_VERSION', transpiler.TRANSPILER_VERSION + 1)
+    assert transpiler.script_digest(script) != digest
+    assert transpiler.load_code(transpiler.script_digest(script), directory) is None
+    script.blocks = transpiler.compile_blocks(script, directory)
+    assert os.path.exists(os.path.join(directory, transpiler.script_digest(script) + cache.CODE_SUFFIX))
+    source = SAMPLES['superinstructions'][0]
+    assert run_script(script, Engine.COMPILED, b'') == run(source, Engine.COMPILED, optimizer.FOLD).output
@@ -0,0 +1,78 @@
+from io import BytesIO
+import os
+import pytest
+from benchmarks import corpus
+from numscript import checkpoint
+from numscript.code import Engine
+from numscript.errors import ErrorCode, ScriptError
+from numscript.governor import Limits
+from numscript.io import InputSource, OutputSink
+from numscript.object import represent
+from numscript.vm import VM
+from tests.helpers import CONFIGURATIONS, prepare, run
+
+
+PROGRAM = corpus.input_heavy(20)
+# Loop reading input in a subroutine, holding ints and arrays that don't fit in 64 bits
+SOURCE = '\n'.join((
+    f'0 1 0 {corpus.countdown_table(20)}',
+    '0 0 1 20',
+    '0 0 2 0',
+    '0 0 3 0',
+    '0 0 4 100000000000000000000',
+    '0 1 5 1 100000000000000000000',
+    '3 9',
+    '8 2 5',
+    '5 0 0',
+    '2 9',
+    '2 1',
+    '12 0 2',
+    '12 1 3',
+    '12 3 3',
+    '8 2 2',
+    '9 2 3',
+    '8 2 4',
+    '10 3 1 1 0',
+    '11 1 1 1',
+    '4',
+))
+
+
+def interrupted_run(path: str, engine: Engine, level: int, max_statements: int) -> bytes:
+    """
+        Run the program with a checkpoint after every slice, until it exceeds the statement limit.
+    """
+    stream = BytesIO()
+    checkpointer = checkpoint.Checkpointer(path, checkpoint.script_digest(SOURCE.encode()), 0)
+    limits = Limits(max_statements=max_statements, check_interval=5)
+    vm = VM(engine, OutputSink(stream), InputSource(None, data=bytearray(PROGRAM.input)), limits=limits, checkpointer=checkpointer)
+    assert vm.run(prepare(SOURCE, engine, level)) == ErrorCode.STATEMENT_LIMIT
+    checkpointer.close()
+    return stream.getvalue()
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+@pytest.mark.parametrize('max_statements', [7, 48, 101])
+def test_resumed_run_matches_an_uninterrupted_run(tmp_path, engine: Engine, level: int, max_statements: int) -> None:
+    path = os.path.join(tmp_path, 'state.nsk')
+    written = interrupted_run(path, engine, level, max_statements)
+    saved = checkpoint.load(path, checkpoint.script_digest(SOURCE.encode()))
+    assert 0 < saved.executed < max_statements
+
+    stream = BytesIO()
+    input_source = InputSource(None, data=bytearray(PROGRAM.input))
+    input_source.skip(saved.input_position)
+    vm = VM(engine, OutputSink(stream), input_source)
+    status = vm.run(prepare(SOURCE, engine, level), saved)
+
+    expected = run(SOURCE, engine, level, PROGRAM.input)
+    assert written[:saved.output_size] + stream.getvalue() == expected.output
+    assert status == expected.status
+    assert list(map(represent, vm.stack)) == list(map(represent, expected.vm.stack))
+
+
+def test_checkpoint_of_another_script_is_rejected(tmp_path) -> None:
+    path = os.path.join(tmp_path, 'state.nsk')
+    interrupted_run(path, Engine.DECODED, 0, 20)
+    with pytest.raises(ScriptError):
+        checkpoint.load(path, checkpoint.script_digest(b'5 0 0\n'))
@@ -0,0 +1,176 @@
+import random
+from typing import Dict, Tuple
+import pytest
+from benchmarks import corpus
+from numscript.api import Program
+from numscript.code import Engine
+from numscript.errors import ErrorCode
+from numscript.governor import Limits
+from tests.helpers import CONFIGURATIONS, LEVELS, run
+
+
+# Scripts run by every engine at every optimization level, with their input
+SAMPLES: Dict[str, Tuple[str, bytes]] = {
+    program.name: (program.source, program.input) for program in (
+        corpus.counted_loop(50),
+        corpus.label_calls(20),
+        corpus.array_indexing(10, 40),
+        corpus.print_heavy(10),
+        corpus.input_heavy(10),
+        corpus.bulk_arrays(3, 40),
+        corpus.generated(200),
+        corpus.hello(),
+    )
+}
+SAMPLES['superinstructions'] = ('\n'.join((
+    '0 1 0 3 2 1 0',
+    '0 0 1 3',
+    '0 0 2 0',
+    '2 1',
+    '10 3 1 2 0',
+    '8 2 2',
+    '9 0 104',
+    '9 0 105',
+    '10 3 1 1 0',
+    '11 1 1 1',
+    '10 3 2 2 0',
+    '11 3 2 3',
+    '9 1 120',
+    '2 3',
+    '3 2',
+    '5 0 0',
+    '2 2',
+    '9 1 114 101 116',
+    '4',
+)), b'')
+SAMPLES['strings'] = ('\n'.join((
+    '0 0 0 0',
+    '0 1 1 0',
+    '12 3 1',
+    '12 2 0',
+    '9 2 1',
+    '9 2 0',
+    '8 2 1',
+    '13 8 0 1 0',
+    '8 2 0',
+    '13 0 1 1 0 0',
+    '8 2 1',
+    '7 0 0',
+    '5 1 0',
+)), 'héllo wörld\nxyz\n'.encode())
+
+# Scripts that pass verification and fail when executed, with the line they fail on
+FAILURES: Dict[str, Tuple[str, int]] = {
+    'index out of range': ('0 1 0 1 2 3\n0 0 1 9\n10 3 1 1 0\n', 3),
+    'literal array index out of range': ('0 0 0 -9\n10 1 0 0 1 2 3\n', 2),
+    'identifier array index out of range': ('0 1 0 1 2\n0 0 1 0\n10 2 2 1 0\n', 3),
+    'index resolved before the array': ('10 3 7 0 8\n', 1),
+    'negative sleep': ('0 0 0 -5\n7 1 0\n', 2),
+    'sleep too long': ('0 0 0 1000000000000000\n7 1 0\n', 2),
+    'surrogate code point': ('0 0 0 55296\n9 2 0\n', 2),
+    'code point out of range': ('0 1 0 104 1114112\n9 2 0\n', 2),
+    'negative code point': ('0 1 0 104 -1\n8 0 1\n9 2 0\n', 3),
+    'negative identifier on an empty stack': ('8 2 -1\n', 1),
+    'negative array length': ('0 0 0 1\n0 0 1 -1\n13 2 2 0 1\n', 3),
+    'array too long': ('0 0 0 1\n0 0 1 1000000000000\n13 2 2 0 1\n', 3),
+}
+# Scripts with literals rejected by the verifier, which fail when the statement is reached without verification
+UNVERIFIED_FAILURES: Dict[str, Tuple[str, int]] = {
+    'literal index out of range': ('0 0 0 0\n10 0 5 0 1 2 3\n', 2),
+    'literal negative sleep': ('8 0 1\n7 0 -5\n', 2),
+    'literal surrogate code point': ('8 0 1\n9 0 56000\n', 2),
+}
+
+
+def random_script(rng: random.Random) -> str:
+    # Statements of every kind over a few slots and labels, not necessarily valid
+    slot = lambda: rng.choice((0, 1, 2, 3, rng.randint(-2, 5)))
+    array = lambda: ' '.join(str(rng.randint(-1, 120)) for _ in range(rng.randint(0, 4)))
+    label = lambda: rng.randint(1, 4)
+    templates = (
+        lambda: f'0 {rng.randint(0, 2)} {slot()} {rng.choice((str(rng.randint(-1, 3)), array()))}',
+        lambda: f'1 {rng.randint(0, 2)} {slot()} {rng.choice((str(rng.randint(-1, 3)), array()))}',
+        lambda: f'2 {label()}',
+        lambda: f'3 {label()}',
+        lambda: '4',
+        lambda: f'5 {rng.randint(0, 1)} {slot()}',
+        lambda: '6',
+        lambda: f'8 {rng.randint(0, 2)} {rng.choice((str(slot()), array()))}',
+        lambda: f'9 {rng.randint(0, 2)} {rng.choice((str(slot()), array()))}',
+        lambda: f'10 {rng.randint(0, 3)} {rng.randint(-1, 4)} {slot()} {rng.choice((str(slot()), array()))}',
+        lambda: f'11 {rng.randint(0, 3)} {rng.choice((0, 1, slot()))} {label()}',
+        lambda: f'12 {rng.randint(0, 3)} {slot()}',
+        lambda: f'13 {rng.randint(0, 8)} ' + ' '.join(str(slot()) for _ in range(rng.randint(2, 4))),
+    )
+    declarations = ['0 0 0 2', '0 1 1 1 2 3', '0 0 2 1']
+    statements = [rng.choice(templates)() for _ in range(rng.randint(1, 20))]
+    return '\n'.join(declarations[:rng.randint(0, 3)] + statements)
+
+
+@pytest.mark.parametrize('name', sorted(SAMPLES))
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_sample_matches_match_engine(name: str, engine: Engine, level: int) -> None:
+    source, input_data = SAMPLES[name]
+    expected = run(source, Engine.MATCH, 0, input_data)
+    assert expected.error is None
+    assert run(source, engine, level, input_data).outcome() == expected.outcome()
+
+
+@pytest.mark.parametrize('name', sorted(FAILURES))
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_runtime_error_is_reported_on_its_line(name: str, engine: Engine, level: int) -> None:
+    source, line_number = FAILURES[name]
+    result = run(source, engine, level)
+    assert result.error is not None
+    assert result.error.line_number == line_number
+    assert result.outcome() == run(source, Engine.MATCH, 0).outcome()
+
+
+@pytest.mark.parametrize('name', sorted(UNVERIFIED_FAILURES))
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_unverified_error_is_reported_on_its_line(name: str, engine: Engine, level: int) -> None:
+    source, line_number = UNVERIFIED_FAILURES[name]
+    result = run(source, engine, level, verify=False)
+    assert result.error is not None
+    assert result.error.line_number == line_number
+    assert result.outcome() == run(source, Engine.MATCH, 0, verify=False).outcome()
+
+
+@pytest.mark.parametrize('name', sorted(FAILURES))
+@pytest.mark.parametrize('engine', list(Engine))
+def test_runtime_error_is_returned_by_the_api(name: str, engine: Engine) -> None:
+    source, line_number = FAILURES[name]
+    result = Program.compile(source, engine).run()
+    assert result.status is None
+    assert result.error.line_number == line_number
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_invalid_input_is_a_status_of_the_api(engine: Engine) -> None:
+    result = Program.compile('0 0 0 0\n12 0 0\n8 2 0\n', engine).run(b'abc\n')
+    assert (result.status, result.error) == (ErrorCode.INVALID_INPUT, None)
+
+
+def test_index_error_names_the_index() -> None:
+    result = run('0 0 0 0\n10 0 5 0 1 2 3\n', Engine.DECODED, 0, verify=False)
+    assert 'Index 5 out of range for an array of length 3' in result.error.message
+    result = run('10 3 7 0 8\n', Engine.COMPILED, 0)
+    assert 'Symbol 7 not found' in result.error.message
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_random_scripts_match_across_engines(seed: int) -> None:
+    rng = random.Random(seed)
+    limits = Limits(max_statements=500, check_interval=7)
+    for _ in range(100):
+        source = random_script(rng)
+        input_data = b'3\n1 2 3\nabc\n'
+        # Unverified, so that invalid statements are reported when reached, by every engine alike.
+        # Optimizations change the statements executed, so results are compared at the same level
+        expected = run(source, Engine.MATCH, 0, input_data, limits, verify=False)
+        for level in LEVELS:
+            decoded = run(source, Engine.DECODED, level, input_data, limits, verify=False)
+            compiled = run(source, Engine.COMPILED, level, input_data, limits, verify=False)
+            assert compiled.outcome() == decoded.outcome(), source
+            if level == LEVELS[0]:
+                assert decoded.outcome() == expected.outcome(), source
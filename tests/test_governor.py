@@ -0,0 +1,116 @@
+import asyncio
+from io import BytesIO
+import time
+import pytest
+from benchmarks import corpus
+from numscript import optimizer
+from numscript.code import Engine
+from numscript.errors import ErrorCode, ScriptError
+from numscript.governor import Limits
+from numscript.vm import VM
+from tests.helpers import CONFIGURATIONS, make_vm, prepare, run
+from tests.test_engines import SAMPLES
+
+
+# Loops of statements fused into superinstructions at the highest level
+FUSED_LOOPS = [SAMPLES['superinstructions'][0], corpus.counted_loop(20).source]
+# Gotos to a label that never returns
+RECURSION = '2 1\n3 1\n'
+
+
+@pytest.mark.parametrize('source', FUSED_LOOPS)
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+@pytest.mark.parametrize('check_interval', [1, 3, 1000])
+def test_statement_limit_is_exact(source: str, engine: Engine, level: int, check_interval: int) -> None:
+    for max_statements in range(1, 40):
+        limits = Limits(max_statements=max_statements, check_interval=check_interval)
+        expected = run(source, Engine.MATCH, 0, limits=limits)
+        result = run(source, engine, level, limits=limits)
+        assert result.outcome() == expected.outcome()
+        assert result.vm.program_counter == expected.vm.program_counter
+        assert result.vm.governor.executed == expected.vm.governor.executed
+        if result.status == ErrorCode.STATEMENT_LIMIT:
+            assert result.vm.governor.executed == max_statements
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_statements_of_a_finished_run_are_counted(engine: Engine, level: int) -> None:
+    # The run ends in the middle of a slice
+    limits = Limits(max_statements=10 ** 6, check_interval=1000)
+    source = SAMPLES['superinstructions'][0]
+    expected = run(source, Engine.MATCH, 0, limits=limits)
+    assert expected.status == ErrorCode.NO_ERROR
+    assert run(source, engine, level, limits=limits).vm.governor.executed == expected.vm.governor.executed
+
+
+@pytest.mark.parametrize('quantum', [1, 2, 5])
+def test_asynchronous_statement_limit_is_exact(quantum: int) -> None:
+    source = FUSED_LOOPS[0]
+    for max_statements in range(1, 40):
+        limits = Limits(max_statements=max_statements, check_interval=4)
+        expected = run(source, Engine.MATCH, 0, limits=limits)
+        stream = BytesIO()
+        vm = make_vm(Engine.DECODED, stream, limits=limits)
+        status = asyncio.run(vm.run_async(prepare(source, Engine.DECODED, optimizer.FUSE), quantum))
+        assert (stream.getvalue(), int(status)) == expected.outcome()[:2]
+        assert vm.governor.executed == expected.vm.governor.executed
+
+
+def test_limits_are_checked_before_an_asynchronous_sleep() -> None:
+    # The slice ends on the sleep, with every statement of the limit executed
+    source = '6\n7 0 10000\n6\n'
+    stream = BytesIO()
+    vm = make_vm(Engine.DECODED, stream, limits=Limits(max_statements=2, check_interval=1000))
+    start = time.monotonic()
+    status = asyncio.run(vm.run_async(prepare(source, Engine.DECODED, optimizer.NONE)))
+    assert status == ErrorCode.STATEMENT_LIMIT
+    assert time.monotonic() - start < 5
+
+
+def test_check_interval_must_be_positive() -> None:
+    with pytest.raises(ValueError):
+        Limits(max_statements=100, check_interval=0)
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_call_depth_limit_stops_the_run(engine: Engine) -> None:
+    result = run(RECURSION, engine, optimizer.NONE, limits=Limits(max_call_depth=10))
+    assert result.status == ErrorCode.CALL_DEPTH_LIMIT
+    assert len(result.vm.goto_stack) == 10
+
+
+def test_call_depth_is_not_capped_by_default() -> None:
+    # More return addresses than the goto stack was once capped at, which only the gotos of O0 keep
+    max_statements = (1 << 20) + 10
+    expected = run(RECURSION, Engine.MATCH, optimizer.NONE, limits=Limits(max_statements=max_statements))
+    assert expected.status == ErrorCode.STATEMENT_LIMIT
+    assert len(expected.vm.goto_stack) > 1 << 20
+    for engine, level in CONFIGURATIONS[1:]:
+        result = run(RECURSION, engine, level, limits=Limits(max_statements=max_statements))
+        assert result.outcome() == expected.outcome()
+        assert result.vm.program_counter == expected.vm.program_counter
+
+
+@pytest.mark.parametrize('engine', list(Engine))
+def test_call_depth_without_limits_is_an_error(engine: Engine) -> None:
+    vm = VM(engine, max_call_depth=10)
+    with pytest.raises(ScriptError) as error:
+        vm.run(prepare(RECURSION, engine, optimizer.NONE))
+    assert error.value.line_number == 2
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_fill_is_checked_before_allocating(engine: Engine, level: int) -> None:
+    source = '0 0 0 7\n0 0 1 1000000000000\n13 2 2 0 1\n8 0 0\n'
+    result = run(source, engine, level, limits=Limits(max_array_elements=1000))
+    assert result.status == ErrorCode.MEMORY_LIMIT
+    assert len(result.vm.stack) == 2
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_concatenation_is_checked_before_allocating(engine: Engine, level: int) -> None:
+    # Doubles an array within a single slice of statements
+    source = '0 0 0 7\n0 0 1 1\n0 0 2 0\n13 2 2 0 1\n2 1\n13 1 2 2 2\n3 1\n'
+    result = run(source, engine, level, limits=Limits(max_array_elements=1000, check_interval=10 ** 6))
+    assert result.status == ErrorCode.MEMORY_LIMIT
+    assert len(result.vm.stack[2].value) <= 1000
@@ -0,0 +1,74 @@
+from io import BytesIO
+import os
+import pytest
+from numscript.code import Engine
+from numscript.errors import ErrorCode
+from numscript.io import InputSource
+from numscript.object import represent
+from tests.helpers import CONFIGURATIONS, run
+
+
+DATA = b'12\r\n\n1 2 3\nh\xc3\xa9llo\n-5\n100000000000000000000 1\nlast'
+LINES = [b'12', b'', b'1 2 3', 'héllo'.encode(), b'-5', b'100000000000000000000 1', b'last']
+
+
+def read_lines(source: InputSource) -> list:
+    lines = []
+    while True:
+        try:
+            lines.append(bytes(source.read_line()))
+        except EOFError:
+            return lines
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1 << 16])
+def test_chunked_reads_split_lines_across_chunks(chunk_size: int) -> None:
+    assert read_lines(InputSource(BytesIO(DATA), chunk_size)) == LINES
+
+
+def test_memory_mapped_file(tmp_path) -> None:
+    path = os.path.join(tmp_path, 'input')
+    with open(path, 'wb') as f:
+        f.write(DATA)
+    assert read_lines(InputSource.from_file(path, memory_map=True)) == LINES
+    assert read_lines(InputSource.from_file(path, chunk_size=4)) == LINES
+
+    with open(path, 'wb'):
+        pass
+    assert read_lines(InputSource.from_file(path, memory_map=True)) == []
+
+
+def test_values_are_parsed_from_lines() -> None:
+    source = InputSource(BytesIO(DATA), 4)
+    assert source.read_int() == 12
+    with pytest.raises(ValueError):
+        source.read_int()
+    assert represent(source.read_array()) == '1 2 3'
+    assert represent(source.read_string()) == ' '.join(map(str, map(ord, 'héllo')))
+    assert source.read_int() == -5
+    assert list(source.read_array().value) == [10 ** 20, 1]
+    assert InputSource(None, data=bytearray('é\n'.encode())).read_char() == ord('é')
+
+
+def test_skip_resumes_after_the_consumed_input() -> None:
+    source = InputSource(BytesIO(DATA), 3)
+    source.read_line()
+    source.read_line()
+    resumed = InputSource(BytesIO(DATA), 5)
+    resumed.skip(source.consumed())
+    assert read_lines(resumed) == LINES[2:]
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+@pytest.mark.parametrize('source, input_data, status, output', [
+    # A failed read leaves the slot unchanged and the program goes on
+    ('0 0 0 7\n12 0 0\n8 2 0\n', b'abc\n', ErrorCode.INVALID_INPUT, b'7\n'),
+    ('0 0 0 7\n12 2 0\n8 2 0\n', b'ab\n', ErrorCode.INVALID_INPUT, b'7\n'),
+    ('0 0 0 7\n12 1 0\n8 2 0\n', b'1 x\n', ErrorCode.INVALID_INPUT, b'7\n'),
+    ('0 0 0 7\n12 0 0\n8 2 0\n', b'', ErrorCode.EOF, b'7\n'),
+    ('0 0 0 7\n12 0 0\n12 0 0\n8 2 0\n', b'3', ErrorCode.EOF, b'3\n'),
+    ('0 0 0 7\n12 2 0\n12 3 0\n8 2 0\n', b'x\nhi\n', ErrorCode.NO_ERROR, b'104 105\n'),
+])
+def test_input_errors_set_the_status(engine: Engine, level: int, source: str, input_data: bytes, status: ErrorCode, output: bytes) -> None:
+    result = run(source, engine, level, input_data)
+    assert (result.output, result.status, result.error) == (output, status, None)
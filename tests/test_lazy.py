@@ -0,0 +1,60 @@
+from io import BytesIO
+import os
+import pytest
+from numscript import lazy
+from numscript import optimizer
+from numscript.code import Engine
+from numscript.errors import ScriptError
+from numscript.io import InputSource, OutputSink
+from numscript.vm import VM
+from tests.helpers import Run, run
+from tests.test_engines import SAMPLES
+
+
+ENGINES = (Engine.MATCH, Engine.DECODED)
+
+
+def run_lazily(tmp_path, source: str, engine: Engine, input_data: bytes = b'', cache_entries: int = lazy.DEFAULT_CACHE_ENTRIES) -> Run:
+    path = os.path.join(tmp_path, 'script.ns')
+    with open(path, 'w') as f:
+        f.write(source)
+    stream = BytesIO()
+    vm = VM(engine, OutputSink(stream), InputSource(None, data=bytearray(input_data)))
+    try:
+        status = vm.run(lazy.load(path, cache_entries))
+    except ScriptError as error:
+        return Run(stream.getvalue(), 1, error, vm)
+    return Run(stream.getvalue(), int(status), None, vm)
+
+
+@pytest.mark.parametrize('cache_entries', [1, 3, lazy.DEFAULT_CACHE_ENTRIES])
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('name', SAMPLES)
+def test_lazy_script_runs_like_the_parsed_one(tmp_path, name: str, engine: Engine, cache_entries: int) -> None:
+    source, input_data = SAMPLES[name]
+    # Lazily loaded scripts are neither verified nor optimized
+    expected = run(source, engine, optimizer.NONE, input_data, verify=False)
+    assert run_lazily(tmp_path, source, engine, input_data, cache_entries).outcome() == expected.outcome()
+
+
+@pytest.mark.parametrize('cache_entries', [1, lazy.DEFAULT_CACHE_ENTRIES])
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('source, line_number', [
+    # Reported when the statement is reached, after the output before it
+    ('8 0 1\n\n  \n8 0 x\n', 4),
+    ('8 0 1\n\n3 7\n', 3),
+    # Reported after the statements of the label were evicted and decoded again
+    ('8 0 1\n3 2\n3 2\n\n8 0 x\n2 2\n8 0 2\n4\n', 5),
+])
+def test_errors_are_reported_on_their_line(tmp_path, source: str, line_number: int, engine: Engine, cache_entries: int) -> None:
+    result = run_lazily(tmp_path, source, engine, cache_entries=cache_entries)
+    assert result.error is not None and result.error.line_number == line_number
+    assert result.output.startswith(b'1\n')
+    # The message is the one the parser or the label index reports before execution
+    expected = run(source, engine, optimizer.NONE, verify=False).error
+    assert (expected.line_number, expected.message) == (line_number, result.error.message)
+
+
+def test_redeclared_label_is_reported_before_execution(tmp_path) -> None:
+    result = run_lazily(tmp_path, '8 0 1\n2 1\n\n2 1\n', Engine.DECODED)
+    assert (result.output, result.error.line_number) == (b'', 4)
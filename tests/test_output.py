@@ -0,0 +1,60 @@
+from io import BytesIO
+from typing import List
+import pytest
+from numscript.code import Engine
+from numscript.io import FlushPoint, InputSource, OutputSink
+from numscript.vm import VM
+from tests.helpers import CONFIGURATIONS, prepare
+
+
+# Prints before reading input, before sleeping and before exiting
+SOURCE = '0 0 0 0\n8 0 1\n12 0 0\n8 0 2\n7 0 0\n8 2 0\n'
+
+
+class RecordingStream:
+    """
+        Records every write reaching the stream.
+    """
+
+    def __init__(self) -> None:
+        self.writes: List[bytes] = []
+
+    def write(self, data: bytes) -> None:
+        self.writes.append(bytes(data))
+
+    def flush(self) -> None:
+        pass
+
+
+@pytest.mark.parametrize('flush_points, buffer_size, writes', [
+    (FlushPoint.EXIT, 1 << 16, [b'1\n2\n5\n']),
+    (FlushPoint.INPUT | FlushPoint.EXIT, 1 << 16, [b'1\n', b'2\n5\n']),
+    (FlushPoint.SLEEP | FlushPoint.EXIT, 1 << 16, [b'1\n2\n', b'5\n']),
+    (FlushPoint.SIZE, 2, [b'1\n', b'2\n', b'5\n']),
+    (FlushPoint.SIZE, 4, [b'1\n2\n']),
+    (FlushPoint.ALL, 1 << 16, [b'1\n', b'2\n', b'5\n']),
+])
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_output_is_flushed_at_its_flush_points(engine: Engine, level: int, flush_points: FlushPoint, buffer_size: int, writes: List[bytes]) -> None:
+    stream = RecordingStream()
+    output = OutputSink(stream, buffer_size, flush_points)
+    vm = VM(engine, output, InputSource(None, data=bytearray(b'5\n')))
+    vm.run(prepare(SOURCE, engine, level))
+    assert stream.writes == writes
+    assert output.size() == len(b'1\n2\n5\n')
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_strings_are_encoded_as_utf8(engine: Engine, level: int) -> None:
+    stream = BytesIO()
+    # ASCII strings take the fast path, the others are encoded character by character
+    source = '0 1 0 104 105\n0 1 1 1 2 3\n9 2 0\n9 1 104 233 8364 128512\n9 0 955\n8 2 1\n'
+    VM(engine, OutputSink(stream)).run(prepare(source, engine, level))
+    assert stream.getvalue() == 'hi\nhé€😀\nλ\n1 2 3\n'.encode()
+
+
+def test_output_to_a_file(tmp_path) -> None:
+    path = tmp_path / 'out.txt'
+    with open(path, 'wb') as f:
+        VM(Engine.DECODED, OutputSink(f, 4, FlushPoint.SIZE | FlushPoint.EXIT)).run(prepare('8 0 12\n8 0 345\n', Engine.DECODED, 0))
+    assert path.read_bytes() == b'12\n345\n'
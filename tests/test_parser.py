@@ -0,0 +1,69 @@
+import os
+from typing import List, Tuple
+import pytest
+from numscript import io
+from numscript import lazy
+from numscript import parser
+from numscript.code import Script
+from numscript.errors import ScriptError
+
+
+def statements(script: Script) -> List[Tuple[int, Tuple[int, ...]]]:
+    return [(statement.line_number, tuple(statement.tokens)) for statement in script.statements]
+
+
+def load_lazily(tmp_path, source: bytes) -> Script:
+    path = os.path.join(tmp_path, 'script.ns')
+    with open(path, 'wb') as f:
+        f.write(source)
+    return lazy.load(path)
+
+
+def test_blank_lines_are_dropped() -> None:
+    script = parser.parse(b'\n0 0 0 5\n   \r\n8 2 0\r5 0 0\n\n')
+    assert statements(script) == [(2, (0, 0, 0, 5)), (4, (8, 2, 0)), (5, (5, 0, 0))]
+
+
+def test_tokens_are_separated_by_spaces() -> None:
+    # Other whitespace is accepted around a token, like int() does
+    assert statements(parser.parse(b'  8  2\t 0 \n')) == [(1, (8, 2, 0))]
+    with pytest.raises(ScriptError) as error:
+        parser.parse(b'0 0 0 5\n8\t2 0\n')
+    assert error.value.line_number == 2
+    assert "Invalid token '8\t2'" in error.value.message
+
+
+def test_invalid_token_is_reported_on_its_line() -> None:
+    with pytest.raises(ScriptError) as error:
+        parser.parse(b'0 0 0 5\n\n\n8 2 x\n9 0 y\n')
+    assert error.value.line_number == 4
+    assert "Invalid token 'x'" in error.value.message
+
+
+def test_tokens_beyond_64_bits() -> None:
+    script = parser.parse('0 1 0 1 100000000000000000000\n8 2 0\n')
+    assert statements(script) == [(1, (0, 1, 0, 1, 10 ** 20)), (2, (8, 2, 0))]
+
+
+@pytest.mark.parametrize('source', [
+    b'\n0 0 0 5\n   \r\n8 2 0\r5 0 0\n\n',
+    b'  2\t 1 \n\n3 1\n 0 1 0 1 100000000000000000000\n',
+    b'0 0 0 5\n8\t2 0\n',
+])
+def test_lazy_statements_match_the_parser(tmp_path, source: bytes) -> None:
+    try:
+        expected = statements(parser.parse(source))
+    except ScriptError as error:
+        with pytest.raises(ScriptError) as lazy_error:
+            statements(load_lazily(tmp_path, source))
+        assert (lazy_error.value.line_number, lazy_error.value.message) == (error.line_number, error.message)
+        return
+    assert statements(load_lazily(tmp_path, source)) == expected
+
+
+def test_load_file_returns_text(tmp_path) -> None:
+    path = os.path.join(tmp_path, 'script.ns')
+    with open(path, 'wb') as f:
+        f.write(b'8 1 104 105\n')
+    assert io.load_file(path) == '8 1 104 105\n'
+    assert io.load_file_bytes(path) == b'8 1 104 105\n'
@@ -0,0 +1,65 @@
+from io import BytesIO, StringIO
+import json
+import os
+from typing import Dict
+import pytest
+from benchmarks import corpus
+from numscript.code import Engine
+from numscript.io import OutputSink
+from numscript.profiler import Profiler
+from numscript.vm import VM
+from tests.helpers import CONFIGURATIONS, prepare
+from tests.test_engines import SAMPLES
+
+
+# Three calls of label 2 from label 3, and three iterations of the loop calling label 3
+LABEL_CALLS = corpus.label_calls(3).source
+LINE_COUNTS = {1: 1, 2: 1, 3: 1, 4: 1, 6: 9, 7: 9, 9: 3, 10: 3, 11: 3, 12: 3, 13: 3, 14: 1}
+OPERATION_COUNTS = {
+    'DECALRE_LOCAL 0': 2, 'DECALRE_LOCAL 1': 1, 'GOTO_LABEL': 10, 'SET 2': 9, 'RETURN_FROM_LABEL': 9,
+    'ACCESS_INDEX 3': 3, 'IF_JUMP 1': 3, 'EXIT 0': 1,
+}
+LABEL_COUNTS = {'start': 4, 'label 2': 18, 'label 3': 16}
+
+
+def profile(source: str, engine: Engine, level: int) -> Profiler:
+    profiler = Profiler()
+    VM(engine, OutputSink(BytesIO()), profiler=profiler).run(prepare(source, engine, level))
+    return profiler
+
+
+def counts(totals: Dict) -> Dict:
+    return {key: total['count'] for key, total in totals.items()}
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_executions_are_counted_per_line_operation_and_label(engine: Engine, level: int) -> None:
+    results = profile(LABEL_CALLS, engine, level).results()
+    assert counts(results['lines']) == LINE_COUNTS
+    assert counts(results['operations']) == OPERATION_COUNTS
+    assert counts(results['labels']) == LABEL_COUNTS
+    assert all(total['time_ns'] >= 0 for total in results['lines'].values())
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_superinstructions_are_counted_per_statement(engine: Engine, level: int) -> None:
+    source = SAMPLES['superinstructions'][0]
+    expected = profile(source, Engine.MATCH, 0).results()
+    assert counts(profile(source, engine, level).results()['lines']) == counts(expected['lines'])
+
+
+def test_report_and_json(tmp_path) -> None:
+    profiler = profile(LABEL_CALLS, Engine.DECODED, 2)
+    stream = StringIO()
+    profiler.report(stream, 2)
+    sections = stream.getvalue().strip().split('\n\n')
+    assert [section.split()[0] for section in sections] == ['Line', 'Operation', 'Label']
+    # A header and the two hottest entries of every section
+    assert [len(section.splitlines()) for section in sections] == [3, 3, 3]
+
+    path = os.path.join(tmp_path, 'profile.json')
+    profiler.write_json(path)
+    with open(path) as f:
+        written = json.load(f)
+    assert counts(written['lines']) == {str(line): count for line, count in LINE_COUNTS.items()}
+    assert counts(written['labels']) == LABEL_COUNTS
@@ -0,0 +1,57 @@
+from io import BytesIO
+import os
+import subprocess
+import sys
+import time
+from typing import List
+import pytest
+from numscript.code import Engine
+from numscript.io import InputSource, OutputSink
+from numscript.vm import VM
+from tests.helpers import CONFIGURATIONS, prepare
+
+
+# Reads and prints two numbers, sleeping after each one
+SOURCE = '0 0 0 0\n12 0 0\n8 2 0\n7 0 {}\n12 0 0\n8 2 0\n7 0 {}\n'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_virtual_clock_doesnt_block(engine: Engine, level: int) -> None:
+    stream = BytesIO()
+    vm = VM(engine, OutputSink(stream), InputSource(None, data=bytearray(b'1\n2\n')), virtual_clock=True)
+    started = time.monotonic()
+    vm.run(prepare(SOURCE.format(1000, 2500), engine, level))
+    assert time.monotonic() - started < 1
+    assert vm.virtual_time == 3500
+    assert stream.getvalue() == b'1\n2\n'
+
+
+def test_recorded_input_is_the_lines_read() -> None:
+    source = InputSource(None, data=bytearray(b'12\r\n-3\nunread\n'))
+    source.log = BytesIO()
+    VM(Engine.DECODED, OutputSink(BytesIO()), source, virtual_clock=True).run(prepare(SOURCE.format(1, 1), Engine.DECODED, 0))
+    assert source.log.getvalue() == b'12\n-3\n'
+
+
+def numscript(arguments: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, '-m', 'numscript', '--no-cache'] + arguments, cwd=ROOT, capture_output=True, check=True)
+
+
+def test_recorded_session_is_replayed(tmp_path) -> None:
+    script = os.path.join(tmp_path, 'script.ns')
+    input_path = os.path.join(tmp_path, 'input')
+    recording = os.path.join(tmp_path, 'recording')
+    with open(script, 'w') as f:
+        f.write(SOURCE.format(20, 30))
+    with open(input_path, 'wb') as f:
+        f.write(b'12\r\n-3\nunread\n')
+
+    recorded = numscript(['--input', input_path, '--record-input', recording, script])
+    with open(recording, 'rb') as f:
+        assert f.read() == b'12\n-3\n'
+    replayed = numscript(['--replay', recording, script])
+    assert replayed.stdout == recorded.stdout
+    assert replayed.stdout.startswith(b'12\n-3\n')
+    assert b'Virtual time elapsed: 50 ms' in replayed.stderr
+    assert b'Virtual time' not in recorded.stderr
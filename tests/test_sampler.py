@@ -0,0 +1,39 @@
+from io import BytesIO, StringIO
+import pytest
+from numscript.code import Engine
+from numscript.io import OutputSink
+from numscript.profiler import SamplingProfiler
+from numscript.vm import VM
+from tests.helpers import CONFIGURATIONS, prepare
+
+
+# Label 3 calls label 2, which sleeps on line 7
+NESTED_SLEEP = '3 3\n5 0 0\n2 3\n3 2\n4\n2 2\n7 0 150\n4\n'
+
+
+def sample(source: str, engine: Engine, level: int) -> SamplingProfiler:
+    vm = VM(engine, OutputSink(BytesIO()))
+    sampler = SamplingProfiler(vm, 1)
+    sampler.start()
+    try:
+        vm.run(prepare(source, engine, level))
+    finally:
+        sampler.stop()
+    return sampler
+
+
+@pytest.mark.parametrize('engine, level', CONFIGURATIONS)
+def test_sleeps_are_sampled_on_their_call_stack(engine: Engine, level: int) -> None:
+    stacks = sample(NESTED_SLEEP, engine, level).collapsed_stacks()
+    assert list(stacks) == ['start;label 3;label 2;line 7']
+    # Samples are taken on wall time, leaving room for a slow machine
+    assert stacks['start;label 3;label 2;line 7'] > 20
+
+
+def test_collapsed_stacks_are_written_with_their_counts() -> None:
+    sampler = sample('7 0 50\n' + NESTED_SLEEP, Engine.DECODED, 2)
+    stream = StringIO()
+    sampler.write_collapsed(stream)
+    lines = stream.getvalue().splitlines()
+    assert [line.rsplit(' ', 1)[0] for line in lines] == ['start;label 3;label 2;line 8', 'start;line 1']
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
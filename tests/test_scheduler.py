@@ -0,0 +1,95 @@
+import asyncio
+from io import BytesIO
+from typing import List, Tuple
+from benchmarks import corpus
+from numscript import optimizer
+from numscript.code import Engine
+from numscript.errors import ErrorCode
+from numscript.io import AsyncInputSource, OutputSink
+from numscript.scheduler import Scheduler
+from numscript.vm import VM
+from tests.helpers import prepare, run
+
+
+# Loops forever without keeping return addresses
+ENDLESS = '2 1\n3 1\n'
+
+
+class SharedStream:
+    """
+        Records the writes of several VMs in the order they happen.
+    """
+
+    def __init__(self, writes: List[Tuple[str, bytes]], name: str) -> None:
+        self.writes = writes
+        self.name = name
+
+    def write(self, data: bytes) -> None:
+        self.writes.append((self.name, bytes(data)))
+
+    def flush(self) -> None:
+        pass
+
+
+def make_vm(stream, input_data: bytes = b'', reader: asyncio.StreamReader | None = None) -> VM:
+    # Every write is flushed, to observe the order the VMs run in
+    return VM(Engine.DECODED, OutputSink(stream, 1), AsyncInputSource(reader, data=bytearray(input_data)))
+
+
+def test_vms_are_interleaved() -> None:
+    program = corpus.print_heavy(20)
+    writes: List[Tuple[str, bytes]] = []
+
+    async def main() -> List[ErrorCode]:
+        scheduler = Scheduler(quantum=10)
+        tasks = [scheduler.start(make_vm(SharedStream(writes, name)), prepare(program.source, Engine.DECODED, optimizer.FUSE)) for name in 'ab']
+        return await scheduler.wait(tasks)
+
+    assert asyncio.run(main()) == [ErrorCode.NO_ERROR, ErrorCode.NO_ERROR]
+    expected = run(program.source, Engine.DECODED, optimizer.FUSE).output
+    for name in 'ab':
+        assert b''.join(data for writer, data in writes if writer == name) == expected
+    names = [writer for writer, _ in writes]
+    # Each VM writes again after the other one wrote
+    assert names.index('b') < len(names) - 1 - names[::-1].index('a')
+    assert names.index('a') < len(names) - 1 - names[::-1].index('b')
+
+
+def test_sleeps_and_input_dont_block_the_other_vms() -> None:
+    writes: List[Tuple[str, bytes]] = []
+
+    async def main() -> List[ErrorCode]:
+        reader = asyncio.StreamReader()
+        scheduler = Scheduler(quantum=10)
+        sleeping = scheduler.start(make_vm(SharedStream(writes, 'sleeping')), prepare('7 0 200\n8 0 1\n', Engine.DECODED, optimizer.NONE))
+        reading = scheduler.start(make_vm(SharedStream(writes, 'reading'), reader=reader), prepare('0 0 0 0\n12 0 0\n8 2 0\n', Engine.DECODED, optimizer.NONE))
+        printing = scheduler.start(make_vm(SharedStream(writes, 'printing')), prepare('8 0 3\n', Engine.DECODED, optimizer.NONE))
+        await asyncio.sleep(0.05)
+        reader.feed_data(b'2\n')
+        reader.feed_eof()
+        return await scheduler.wait([sleeping, reading, printing])
+
+    assert asyncio.run(main()) == [ErrorCode.NO_ERROR] * 3
+    assert writes == [('printing', b'3\n'), ('reading', b'2\n'), ('sleeping', b'1\n')]
+
+
+def test_cancelled_vm_flushes_its_output_and_stops() -> None:
+    stream = BytesIO()
+
+    async def main() -> list:
+        scheduler = Scheduler(quantum=100)
+        # Buffered until the VM stops
+        endless_vm = VM(Engine.DECODED, OutputSink(stream), AsyncInputSource(None))
+        endless = scheduler.start(endless_vm, prepare('9 1 104 105\n' + ENDLESS, Engine.DECODED, optimizer.FUSE))
+        finishing = scheduler.start(make_vm(BytesIO()), prepare(corpus.counted_loop(200).source, Engine.DECODED, optimizer.FUSE))
+        await asyncio.sleep(0.02)
+        endless.cancel()
+        results = await scheduler.wait([endless, finishing])
+        return results + [endless_vm.running, len(scheduler.tasks)]
+
+    endless, finishing, running, remaining = asyncio.run(main())
+    assert isinstance(endless, asyncio.CancelledError)
+    assert finishing == ErrorCode.NO_ERROR
+    assert not running
+    assert remaining == 0
+    assert stream.getvalue() == b'hi\n'
@@ -0,0 +1,67 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Iterator
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def server(tmp_path) -> Iterator[str]:
+    path = os.path.join(tmp_path, 'numscript.sock')
+    process = subprocess.Popen([sys.executable, '-m', 'numscript', 'serve', '--socket', path, '--workers', '1'], cwd=ROOT, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while not os.path.exists(path):
+        assert process.poll() is None and time.monotonic() < deadline
+        time.sleep(0.01)
+    try:
+        yield path
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(10) == 0
+        assert not os.path.exists(path)
+
+
+def client(socket_path: str, script: str, input_data: bytes = b'', *arguments: str) -> subprocess.CompletedProcess:
+    command = [sys.executable, '-m', 'numscript.client', '--socket', socket_path, *arguments, script]
+    return subprocess.run(command, cwd=ROOT, input=input_data, capture_output=True, timeout=30)
+
+
+def write_script(directory, source: str) -> str:
+    path = os.path.join(directory, 'script.ns')
+    with open(path, 'w') as f:
+        f.write(source)
+    return path
+
+
+@pytest.mark.parametrize('arguments', [(), ('--engine', 'match'), ('--engine', 'compiled', '-O', '2')])
+def test_script_runs_on_the_daemon(server: str, tmp_path, arguments: tuple) -> None:
+    # Prints the number read from the input, then exits with 3
+    script = write_script(tmp_path, '0 0 0 0\n12 0 0\n8 2 0\n5 0 3\n')
+    result = client(server, script, b'42\n', *arguments)
+    assert (result.returncode, result.stdout, result.stderr) == (0, b'42\n\nProgram finished with status code 3\n', b'')
+
+
+def test_errors_are_reported_by_the_client(server: str, tmp_path) -> None:
+    result = client(server, write_script(tmp_path, '8 0 1\n8 2 5\n'))
+    assert result.returncode == 1
+    # The output written before the error is kept
+    assert result.stdout == b'1\n'
+    assert result.stderr
+
+    assert client(server, os.path.join(tmp_path, 'missing.ns')).returncode == 1
+    assert client(server, write_script(tmp_path, '8 0 x\n')).returncode == 1
+
+
+def test_modified_script_is_compiled_again(server: str, tmp_path) -> None:
+    script = write_script(tmp_path, '8 0 1\n')
+    assert client(server, script).stdout.startswith(b'1\n')
+    write_script(tmp_path, '8 0 2\n')
+    # The compiled script is keyed on the modification time
+    modified = os.stat(script).st_mtime_ns + 1_000_000
+    os.utime(script, ns=(modified, modified))
+    assert client(server, script).stdout.startswith(b'2\n')